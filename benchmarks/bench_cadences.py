@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+"""Benchmarks the cadence counts via non-rectangular convolutions against the direct evaluation.
+
+The first convolution call of a length compiles its plans ("cold"), further
+calls take them from the plan cache ("warm").  The direct evaluation with
+NumPy takes quadratic time, so the ratio of warm to direct times falls with the
+length.  It is still above 4 at a length of 3 * 10^5, which is why
+count_cadences evaluates directly by default.
+
+Run with:  python -m benchmarks.bench_cadences --lengths 1000 10000 100000
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from cadences.counting import count_cadences
+
+
+def time_counts(list_string: List[int], partial: List[int], by, method: str) -> float:
+    start = time.perf_counter()
+    count_cadences(list_string, 1, 4, partial, by, method)
+    return time.perf_counter() - start
+
+
+def main(arguments: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1000, 3000, 10000, 30000])
+    parser.add_argument("--partial", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--by", default="1", help='"start", "distance" or a position')
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(arguments)
+
+    by = int(args.by) if args.by.isdigit() else args.by
+    rng = random.Random(args.seed)
+    count_cadences([1] * 10, 1, 4, args.partial, by, "direct")  # imports NumPy outside of the timings
+    print(f"{'length':>8} {'cold [s]':>10} {'warm [s]':>10} {'direct [s]':>11} {'warm / direct':>14}")
+    for length in args.lengths:
+        list_string = [rng.randint(0, 1) for _ in range(length)]
+        cold = time_counts(list_string, args.partial, by, "convolution")
+        warm = time_counts(list_string, args.partial, by, "convolution")
+        direct = time_counts(list_string, args.partial, by, "direct")
+        print(f"{length:>8} {cold:>10.3f} {warm:>10.3f} {direct:>11.3f} {warm / direct:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
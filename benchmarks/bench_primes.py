@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+"""Benchmarks the sieve-based prime search against plain trial of every candidate.
+
+Run with:  python -m benchmarks.bench_primes
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import sympy
+
+import nrconv
+
+
+def create_mod_prime_sequential(base: int, mod: int, min_prime: int = 0) -> int:
+    """The previous create_mod_prime: tests the candidates one at a time with sympy."""
+    prime_candidate = base + mod
+    if prime_candidate < min_prime:
+        diff_number_bases = (min_prime - prime_candidate + base - 1) // base
+        prime_candidate = prime_candidate + diff_number_bases * base
+    while not sympy.ntheory.primetest.isprime(prime_candidate):
+        prime_candidate = prime_candidate + base
+    return prime_candidate
+
+
+def time_prime_search(function: Callable[[int, int, int], int], base: int, bits: int, repetitions: int) -> float:
+    """Returns the mean time of function for repetitions different bounds of the given bit size."""
+    start = time.perf_counter()
+    for repetition in range(repetitions):
+        function(base, 1, 2 ** bits + repetition * base * 1021)
+    return (time.perf_counter() - start) / repetitions
+
+
+def main(arguments: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--log-length", type=int, default=21, help="base = 2^log_length")
+    parser.add_argument("--bits", type=int, nargs="+", default=[32, 64, 128, 256, 512])
+    parser.add_argument("--repetitions", type=int, default=20)
+    args = parser.parse_args(arguments)
+
+    base = 2 ** args.log_length
+    print(f"{'bits':>6} {'sequential [ms]':>16} {'sieve [ms]':>12} {'speedup':>8}")
+    for bits in args.bits:
+        sequential = time_prime_search(create_mod_prime_sequential, base, bits, args.repetitions)
+        sieve = time_prime_search(nrconv.create_mod_prime, base, bits, args.repetitions)
+        print(f"{bits:>6} {1000 * sequential:>16.3f} {1000 * sieve:>12.3f} {sequential / sieve:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
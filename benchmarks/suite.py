@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+"""A reproducible benchmark suite for the entry points of the non-rectangular convolution.
+
+Run the suite and store the results:
+    python -m benchmarks.suite run --output results.json --lengths 100 1000 10000 100000 1000000
+
+Compare two runs and flag slowdowns (exit code 1 if any):
+    python -m benchmarks.suite compare baseline.json results.json --threshold 1.1
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from fractions import Fraction
+from typing import Any, Callable, Dict, List, Optional
+
+import nrconv
+from nrconv.geometry import Point
+
+RESULTS_VERSION = 1
+
+DEFAULT_LENGTHS = [10 ** 2, 10 ** 3]
+ALL_LENGTHS = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+
+# The 12-gon and the 13-gon of tests/test_convolution.py on the grid [0, 7]^2.
+POLYGON_12 = [(3, 0), (4, 0), (6, 1), (7, 3), (7, 4), (6, 6), (4, 7), (3, 7), (1, 6), (0, 4), (0, 3), (1, 1)]
+POLYGON_13 = [(3, 0), (4, 0), (Fraction(11, 2), 1), (6, Fraction(3, 2)), (7, 3), (7, 4), (6, 6), (4, 7), (3, 7),
+              (1, 6), (0, 4), (0, 3), (1, 1)]
+
+
+def _points(coordinates) -> List[Point]:
+    return [(Fraction(x), Fraction(y)) for x, y in coordinates]
+
+
+def _scaled(polygon, length: int) -> List[Point]:
+    scale = Fraction(length - 1, 7)
+    return [(x * scale, y * scale) for x, y in _points(polygon)]
+
+
+# family name -> geometry for lists of the given length
+FAMILIES: Dict[str, Callable[[int], List[Point]]] = {
+    "triangle_axis_aligned": lambda n: _points([(0, 0), (n - 1, 0), (0, n - 1)]),
+    "triangle_lemma12_case1": lambda n: _points([(0, 0), (2 * (n - 1) // 3, (n - 1) // 3), (n - 1, n - 1)]),
+    "triangle_lemma12_case2_1": lambda n: _points([(0, 0), ((n - 1) // 2, n - 1), (n - 1, 0)]),
+    "triangle_lemma12_case2_2": lambda n: _points([(0, 0), (n - 1, (n - 1) // 2), ((n - 1) // 2, n - 1)]),
+    "thin_sliver": lambda n: _points([(0, 0), (n - 1, n - 2), (n - 2, n - 1)]),
+    "polygon_12": lambda n: _scaled(POLYGON_12, n),
+    "polygon_13": lambda n: _scaled(POLYGON_13, n),
+    "rational_quadrilateral": lambda n: _points([(Fraction(1, 3), Fraction(1, 7)),
+                                                (Fraction(2 * n - 2, 3), Fraction(n - 1, 5)),
+                                                (Fraction(n - 1, 1), Fraction(5 * n - 5, 6)),
+                                                (Fraction(n - 1, 4), Fraction(n - 1, 1))]),
+}
+
+
+# entry point name -> convolution function taking (list1, list2, geometry, ntt_prime)
+ENTRY_POINTS: Dict[str, Callable] = {
+    "recursive": nrconv.non_rectangular_convolution_convex_polygon,
+    "plan": nrconv.non_rectangular_convolution,
+}
+
+
+def create_inputs(length: int, seed: int) -> List[List[int]]:
+    """Creates two reproducible random lists of the given length."""
+    rng = random.Random(seed * 1000003 + length)
+    return [[rng.randrange(1000) for _ in range(length)] for _ in range(2)]
+
+
+def run_case(family: str, length: int, seed: int = 0, repeats: int = 3,
+             leaf_counts: bool = True, entry_point: str = "recursive") -> Dict[str, Any]:
+    """Runs a single benchmark case and returns its measurements.
+
+    The time is the minimum over repeats.  The peak memory and the leaf
+    counts are measured in separate runs, since tracemalloc and tracing
+    slow the convolution down.
+    """
+
+    list1, list2 = create_inputs(length, seed)
+    geometry = FAMILIES[family](length)
+
+    start = time.perf_counter()
+    prime = nrconv.create_ntt_prime(list1, list2)
+    setup_seconds = time.perf_counter() - start
+
+    def convolve():
+        return ENTRY_POINTS[entry_point](list1, list2, geometry, prime)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        convolve()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    convolve()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "family": family,
+        "entry_point": entry_point,
+        "length": length,
+        "seed": seed,
+        "seconds": min(timings),
+        "setup_seconds": setup_seconds,
+        "peak_bytes": peak_bytes,
+    }
+    if leaf_counts:
+        with nrconv.trace() as tracer:
+            convolve()
+        kinds = tracer.summary()["kinds"]
+        result["leaves"] = {kind: kinds.get(kind, {"count": 0})["count"] for kind in ("rectangle", "edge")}
+    return result
+
+
+def run_suite(families: List[str], lengths: List[int], seed: int = 0, repeats: int = 3,
+              leaf_counts: bool = True, log: Optional[Callable[[str], None]] = None,
+              entry_points: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Runs all combinations of entry points, families and lengths."""
+    results = []
+    for entry_point in entry_points or list(ENTRY_POINTS):
+        for length in lengths:
+            for family in families:
+                result = run_case(family, length, seed, repeats, leaf_counts, entry_point)
+                if log is not None:
+                    log(f"{entry_point:>10} {family:>26} {length:>8} "
+                        f"{result['seconds']:>10.4f}s {result['peak_bytes']:>12}B")
+                results.append(result)
+    return {
+        "version": RESULTS_VERSION,
+        "metadata": {
+            "python": sys.version,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": seed,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = 1.1) -> List[Dict[str, Any]]:
+    """Compares two result sets case by case.
+
+    Returns:
+        One entry per case present in both runs with the time ratio
+        current / baseline and whether it exceeds the threshold.
+    """
+
+    def key(result):
+        return result.get("entry_point", "recursive"), result["family"], result["length"], result["seed"]
+
+    baseline_by_key = {key(result): result for result in baseline["results"]}
+    comparisons = []
+    for result in current["results"]:
+        if key(result) not in baseline_by_key:
+            continue
+        before = baseline_by_key[key(result)]
+        ratio = result["seconds"] / before["seconds"] if before["seconds"] > 0 else float("inf")
+        comparisons.append({
+            "entry_point": result.get("entry_point", "recursive"),
+            "family": result["family"],
+            "length": result["length"],
+            "seed": result["seed"],
+            "baseline_seconds": before["seconds"],
+            "seconds": result["seconds"],
+            "ratio": ratio,
+            "memory_ratio": result["peak_bytes"] / max(before["peak_bytes"], 1),
+            "slowdown": ratio > threshold,
+        })
+    return comparisons
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark suite")
+    run_parser.add_argument("--output", required=True, help="JSON file for the results")
+    run_parser.add_argument("--families", nargs="+", default=list(FAMILIES), choices=list(FAMILIES))
+    run_parser.add_argument("--entry-points", nargs="+", default=list(ENTRY_POINTS), choices=list(ENTRY_POINTS))
+    run_parser.add_argument("--lengths", nargs="+", type=int, default=DEFAULT_LENGTHS,
+                            help=f"list lengths (the full range is {ALL_LENGTHS})")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--no-leaf-counts", action="store_true", help="skip the traced run")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=1.1,
+                                help="flag cases whose time ratio exceeds this factor")
+
+    args = parser.parse_args(arguments)
+
+    if args.command == "run":
+        results = run_suite(args.families, args.lengths, args.seed, args.repeats,
+                            not args.no_leaf_counts, log=print, entry_points=args.entry_points)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=1)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, encoding="utf-8") as file:
+        current = json.load(file)
+    comparisons = compare_results(baseline, current, args.threshold)
+    for comparison in comparisons:
+        flag = "SLOWDOWN" if comparison["slowdown"] else ""
+        print(f"{comparison['entry_point']:>10} {comparison['family']:>26} {comparison['length']:>8} "
+              f"{comparison['baseline_seconds']:>10.4f}s {comparison['seconds']:>10.4f}s "
+              f"{comparison['ratio']:>6.2f}x {flag}")
+    return 1 if any(comparison["slowdown"] for comparison in comparisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,8 @@
 #!/usr/bin/python3
 
 from .generator import *
+from .vectorized import *
+from .counting import *
+from .bitsets import *
+from .repair import *
+from .general import *
@@ -0,0 +1,8 @@
+#!/usr/bin/python3
+"""Runs and plots sweeps of the cadence constructions, see cadences.experiments."""
+
+import sys
+
+from cadences.experiments import main
+
+sys.exit(main())
@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+"""This module runs the 4-cadence constructions on packed bitsets.
+
+A Bitset keeps a 0/1 string in NumPy uint64 words (bit i of the string is bit
+i % 64 of word i // 64).  All plausible starts of a distance are checked at
+once by AND-ing the words of the string shifted by the positions of the
+cadence, and the partial cadences of reduce_non_partial_4_cadences set bits in
+one flag plane per partial instead of flag bits within every entry.  Memory is
+a bit per position and plane, and counting the ones is a vectorized popcount.
+"""
+
+from random import Random, randrange
+from typing import Any, List, Optional, Sequence
+
+from .vectorized import PARTIALS_4
+
+WORD_BITS = 64
+
+
+class Bitset:
+    """A fixed-length string of bits stored in uint64 words.
+
+    The words are followed by at least one spare zero word, so that shifted
+    reads and writes never run past the end of the array.
+
+    Args:
+        length (int): The number of bits.
+    """
+
+    def __init__(self, length: int):
+        import numpy
+        self.length = length
+        self.words = numpy.zeros(length // WORD_BITS + 2, dtype=numpy.uint64)
+
+    @classmethod
+    def from_list(cls, values: Sequence[int], char: int = 1) -> "Bitset":
+        """Packs the positions of values equal to char."""
+        import numpy
+        bitset = cls(len(values))
+        packed = numpy.zeros(8 * len(bitset.words), dtype=numpy.uint8)
+        bits = numpy.packbits(numpy.asarray(values) == char, bitorder="little")
+        packed[:len(bits)] = bits
+        bitset.words[:] = packed.view("<u8")
+        return bitset
+
+    def to_list(self) -> List[int]:
+        """Returns the bits as a list of 0/1."""
+        import numpy
+        return numpy.unpackbits(self.words.astype("<u8").view(numpy.uint8), bitorder="little")[:self.length].tolist()
+
+    def copy(self) -> "Bitset":
+        bitset = Bitset(self.length)
+        bitset.words[:] = self.words
+        return bitset
+
+    def count(self) -> int:
+        """Counts the ones (a vectorized popcount)."""
+        return popcount(self.words)
+
+    def test(self, position: int) -> bool:
+        return bool(self.words[position // WORD_BITS] >> (position % WORD_BITS) & 1)
+
+    def clear(self, position: int):
+        import numpy
+        self.words[position // WORD_BITS] &= ~numpy.uint64(1 << (position % WORD_BITS))
+
+    def extract(self, offset: int, count: int) -> Any:
+        """Returns the bits offset to offset + count - 1 as words (bits past the end are zero)."""
+        import numpy
+        size = -(-count // WORD_BITS)
+        if offset >= self.length or count <= 0:
+            return numpy.zeros(size, dtype=numpy.uint64)
+        word, shift = divmod(offset, WORD_BITS)
+        part = numpy.zeros(size + 1, dtype=numpy.uint64)
+        available = self.words[word:word + size + 1]
+        part[:len(available)] = available
+        if shift:
+            part = (part[:-1] >> numpy.uint64(shift)) | (part[1:] << numpy.uint64(WORD_BITS - shift))
+        else:
+            part = part[:-1]
+        return _trim(part, count)
+
+    def deposit_or(self, offset: int, words: Any, count: int):
+        """ORs the first count bits of words onto the bits starting at offset."""
+        import numpy
+        words = _trim(words, count)
+        word, shift = divmod(offset, WORD_BITS)
+        size = len(words)
+        if shift:
+            self.words[word:word + size] |= words << numpy.uint64(shift)
+            self.words[word + 1:word + size + 1] |= words >> numpy.uint64(WORD_BITS - shift)
+        else:
+            self.words[word:word + size] |= words
+
+
+def _trim(words: Any, count: int) -> Any:
+    """Clears the bits from count on of a word array."""
+    import numpy
+    remainder = count % WORD_BITS
+    if remainder and len(words):
+        words = words.copy()
+        words[-1] &= numpy.uint64((1 << remainder) - 1)
+    return words
+
+
+def popcount(words: Any) -> int:
+    """Counts the ones of a word array."""
+    import numpy
+    if hasattr(numpy, "bitwise_count"):
+        return int(numpy.bitwise_count(words).sum())
+    return int(numpy.unpackbits(words.view(numpy.uint8)).sum())
+
+
+def set_positions(words: Any, count: int) -> List[int]:
+    """Returns the positions of the ones among the first count bits of a word array, in increasing order."""
+    import numpy
+    bits = numpy.unpackbits(words.astype("<u8").view(numpy.uint8), bitorder="little")[:count]
+    return bits.nonzero()[0].tolist()
+
+
+def plausible_starts(distance: int, length_cadence: int, length_list: int, length_block: int):
+    """Returns the first and last start below length_block of a plausible cadence with the given distance."""
+    low = max(0, length_list - length_cadence * distance)
+    high = min(distance - 1, length_list - 1 - (length_cadence - 1) * distance, length_block - 1)
+    return low, high
+
+
+def cadence_starts(bitset: Bitset, distance: int, partial: Sequence[int], low: int, high: int) -> Any:
+    """Returns the words whose bit t is set if the positions of partial of the cadence with
+    start low + t and the given distance are set (a shifted AND over whole words).
+    """
+
+    count = high - low + 1
+    found = bitset.extract(low + partial[0] * distance, count)
+    for position in partial[1:]:
+        found &= bitset.extract(low + position * distance, count)
+    return found
+
+
+def make_4_cadence_free_bitset(min_length: int, rng: Optional[Random] = None) -> Bitset:
+    """Like make_4_cadence_free, with the same result for the same state of the random module (or of rng)."""
+    import numpy
+    choose = randrange if rng is None else rng.randrange
+    length_list = min_length if min_length % 7 == 0 else (1 + (min_length // 7)) * 7
+    length_block = length_list // 7
+    ret = Bitset.from_list((numpy.arange(length_list) // length_block) % 2, 0)
+    for distance_raw in range(length_block):
+        # candidates of both distances in the order of the generator (by start, then distance)
+        candidates = []
+        for order, distance in enumerate([2 * length_block + distance_raw, 2 * length_block - distance_raw]):
+            low, high = plausible_starts(distance, 4, length_list, length_block)
+            if low <= high:
+                found = cadence_starts(ret, distance, [0, 1, 2], low, high)
+                candidates.extend((low + start, order, distance) for start in set_positions(found, high - low + 1))
+        # removals only invalidate later candidates, so the passing ones are checked again in order
+        for start, _, distance in sorted(candidates):
+            if ret.test(start) and ret.test(start + distance) and ret.test(start + 2 * distance):
+                ret.clear(start + choose(4) * distance)
+    return ret
+
+
+def reduce_non_partial_4_cadences_bitset(base: Bitset) -> Bitset:
+    """Like reduce_non_partial_4_cadences for a 0/1 string, returning a new bitset.
+
+    Each partial sets its positions in its own flag plane.  A position is kept if
+    exactly four of the string and the four flag planes are set, which is the
+    popcount condition of reduce_non_partial_4_cadences.
+    """
+
+    length_list = base.length
+    length_block = length_list // 7
+    planes = [Bitset(length_list) for _ in PARTIALS_4]
+    for distance_raw in range(length_block):
+        for distance in {2 * length_block + distance_raw, 2 * length_block - distance_raw}:
+            low, high = plausible_starts(distance, 4, length_list, length_block)
+            if low > high:
+                continue
+            for plane, partial in zip(planes, PARTIALS_4):
+                found = cadence_starts(base, distance, partial, low, high)
+                for position in partial:
+                    plane.deposit_or(low + position * distance, found, high - low + 1)
+
+    # the flag planes are zero past the end, so every term is as well
+    flags = [base.words] + [plane.words for plane in planes]
+    reduced = Bitset(length_list)
+    for missing in range(len(flags)):
+        term = ~flags[missing]
+        for index, words in enumerate(flags):
+            if index != missing:
+                term = term & words
+        reduced.words |= term
+    return reduced
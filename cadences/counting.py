@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+"""This module counts the cadences of a string for all starts or distances at once.
+
+A cadence of length k with start a and distance d is plausible in the sense of
+cadence_index_plausibility (0 <= a < d, a + (k - 1) * d < n <= a + k * d).
+Given the positions p_u = a + u * d and p_v = a + v * d of two of its
+characters, every other position a + m * d is a linear function of p_u and p_v.
+Splitting the string by the residue r of p_u and p_v modulo g = v - u, the
+plausible pairs (p_u, p_v) = (r + g * x, r + g * y) are the lattice points of
+a convex polygon, and counting them by a + m * d (or by d) is a non-rectangular
+convolution of two dilated (and possibly reversed) 0/1 sequences.
+
+Patterns of two characters are counted by distance, start or any position of
+the cadence.  Patterns of three characters are counted by one of their
+positions, whose character is then checked pointwise.  All other requests, in
+particular full cadences of four or more characters, are evaluated directly,
+which takes quadratic time: their counts can't be recovered pointwise from the
+counts of a pair or triple of their positions.
+
+The polygons only depend on the lengths of the string and the cadence, so their
+plans are taken from the plan cache of nrconv and reused for further strings.
+Even so, the direct evaluation with NumPy is faster for every length measured
+(up to 3 * 10^5, see benchmarks/bench_cadences.py), so count_cadences only
+takes the convolutions if asked to, or if NumPy is missing.
+"""
+
+from fractions import Fraction
+from typing import List, Optional, Sequence, Union
+
+from nrconv.geometry import Point, clip_half_plane, column_intervals
+from nrconv.plan import execute_plan, get_plan_cache
+
+By = Union[str, int]
+
+
+# ways of count_cadences to evaluate the counts
+METHODS = ("auto", "direct", "convolution")
+
+
+def _target(by: By, length_cadence: int) -> Optional[int]:
+    """Returns the counted position of the cadence (None for the distance)."""
+    if by == "distance":
+        return None
+    if by == "start":
+        return 0
+    if isinstance(by, int) and not isinstance(by, bool) and 0 <= by < length_cadence:
+        return by
+    raise ValueError(f"Cadences are counted by 'start', 'distance' or a position below {length_cadence}, got {by!r}")
+
+
+def pair_region(length_cadence: int, length_list: int, first: int, second: int, residue: int) -> List[Point]:
+    """Returns the polygon of the points (x, y) such that the positions first and second of a
+    plausible cadence are residue + (second - first) * x and residue + (second - first) * y.
+    """
+
+    gap = second - first
+    size = (length_list - residue + gap - 1) // gap
+    if size <= 0:
+        return []
+    polygon = [(Fraction(0), Fraction(0)), (Fraction(size - 1), Fraction(0)),
+               (Fraction(size - 1), Fraction(size - 1)), (Fraction(0), Fraction(size - 1))]
+    # start = residue + second * x - first * y and distance = y - x
+    for normal_x, normal_y, bound in ((-second, first, residue),
+                                      (second + 1, -first - 1, -1 - residue),
+                                      (second - length_cadence + 1, length_cadence - 1 - first,
+                                       length_list - 1 - residue),
+                                      (length_cadence - second, first - length_cadence, residue - length_list)):
+        polygon = clip_half_plane(polygon, Fraction(normal_x), Fraction(normal_y), Fraction(bound))
+        if not polygon:
+            break
+    return polygon
+
+
+def _dilate(values: List[int], factor: int) -> List[int]:
+    dilated = [0] * (factor * (len(values) - 1) + 1)
+    dilated[::factor] = values
+    return dilated
+
+
+def _count_pair(matches: List[int], length_cadence: int, first: int, second: int,
+                target: Optional[int], counts: List[int]):
+    """Adds the number of plausible cadences matching at first and second onto counts by target."""
+    gap = second - first
+    # target = offset + factor_x * x + factor_y * y
+    if target is None:
+        factor_x, factor_y = -1, 1
+    else:
+        factor_x, factor_y = second - target, target - first
+    for residue in range(gap):
+        polygon = pair_region(length_cadence, len(matches), first, second, residue)
+        if not polygon:
+            continue
+        values = matches[residue::gap]
+        offset = 0 if target is None else residue
+        if len(polygon) < 3 or factor_x == 0 or factor_y == 0:
+            for x_index, (y_low, y_high) in column_intervals(polygon).items():
+                if values[x_index]:
+                    for y_index in range(y_low, y_high + 1):
+                        if values[y_index]:
+                            counts[offset + factor_x * x_index + factor_y * y_index] += 1
+            continue
+
+        # reverse the sequences with negative factors and dilate them by the factors
+        size = len(values)
+
+        def axis(index: Fraction, factor: int) -> Fraction:
+            return factor * index if factor > 0 else -factor * (size - 1 - index)
+
+        lists = [_dilate(values if factor > 0 else values[::-1], abs(factor)) for factor in (factor_x, factor_y)]
+        offset += sum(factor * (size - 1) for factor in (factor_x, factor_y) if factor < 0)
+        geometry = [(axis(x_index, factor_x), axis(y_index, factor_y)) for x_index, y_index in polygon]
+        plan = get_plan_cache().plan(geometry)
+        conv, conv_min = execute_plan(lists[0], lists[1], plan, engine="boolean")
+        for index, count in enumerate(conv, conv_min + offset):
+            if count:
+                counts[index] += count
+
+
+def _plausible_starts(length_list: int, length_cadence: int, distance: int) -> range:
+    """Returns the starts of the plausible cadences with the given distance."""
+    low = max(0, length_list - length_cadence * distance)
+    high = min(distance - 1, length_list - 1 - (length_cadence - 1) * distance)
+    return range(low, high + 1)
+
+
+def _count_direct_python(list_string: List[int], char: int, length_cadence: int,
+                         partial: Sequence[int], target: Optional[int]) -> List[int]:
+    """Like count_cadences_direct without NumPy, checking the plausible cadences one by one."""
+    length_list = len(list_string)
+    counts = [0] * length_list
+    for distance in range(1, length_list):
+        for start in _plausible_starts(length_list, length_cadence, distance):
+            if all(list_string[start + position * distance] == char for position in partial):
+                counts[distance if target is None else start + target * distance] += 1
+    return counts
+
+
+def count_cadences_direct(list_string: List[int], char: int, length_cadence: int,
+                          partial: Optional[Sequence[int]] = None, by: By = "start") -> List[int]:
+    """Like count_cadences, evaluating every plausible start and distance (with NumPy if available)."""
+    target = _target(by, length_cadence)
+    partial = range(length_cadence) if partial is None else partial
+    try:
+        import numpy
+    except ImportError:
+        return _count_direct_python(list_string, char, length_cadence, partial, target)
+    length_list = len(list_string)
+    matches = numpy.array(list_string) == char
+    counts = numpy.zeros(length_list, dtype=numpy.int64)
+    for distance in range(1, length_list):
+        starts = _plausible_starts(length_list, length_cadence, distance)
+        if not starts:
+            continue
+        low, high = starts.start, starts.stop - 1
+        found = numpy.ones(high - low + 1, dtype=bool)
+        for position in partial:
+            found &= matches[low + position * distance:high + position * distance + 1]
+        if target is None:
+            counts[distance] += int(found.sum())
+        else:
+            counts[low + target * distance:high + target * distance + 1] += found
+    return counts.tolist()
+
+
+def count_cadences(list_string: List[int], char: int, length_cadence: int,
+                   partial: Optional[Sequence[int]] = None, by: By = "start",
+                   method: str = "auto") -> List[int]:
+    """
+    Counts the plausible cadences whose characters at the positions of partial equal char.
+
+    Args:
+        list_string (List[int]): The string.
+        char (int): The character of the cadences.
+        length_cadence (int): The length of the cadences.
+        partial (Optional[Sequence[int]]): The checked positions within a cadence
+            (default: all positions, see check_partial_cadence).
+        by (By): "start" or "distance" for counts per start or distance, or a
+            position m < length_cadence for counts per index start + m * distance.
+        method (str): "direct" for count_cadences_direct, "convolution" for the
+            non-rectangular convolutions (for pairs and triples, other patterns
+            are evaluated directly), or "auto" for "direct" if NumPy is
+            available and "convolution" otherwise.
+
+    Returns:
+        The list of the counts per start, distance or index (of the length of list_string).
+    """
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    target = _target(by, length_cadence)
+    positions = sorted(set(range(length_cadence) if partial is None else partial))
+    if positions and not 0 <= positions[0] <= positions[-1] < length_cadence:
+        raise ValueError(f"The positions of a partial cadence are below {length_cadence}, got {positions}")
+    if method == "auto":
+        try:
+            import numpy  # noqa: F401 (required by count_cadences_direct)
+            method = "direct"
+        except ImportError:
+            method = "convolution"
+    if method == "direct":
+        return count_cadences_direct(list_string, char, length_cadence, positions, by)
+    matches = [1 if value == char else 0 for value in list_string]
+    counts = [0] * len(list_string)
+
+    if len(positions) == 2:
+        _count_pair(matches, length_cadence, positions[0], positions[1], target, counts)
+        return counts
+    if len(positions) == 3 and target in positions:
+        first, second = [position for position in positions if position != target]
+        _count_pair(matches, length_cadence, first, second, target, counts)
+        return [count if match else 0 for count, match in zip(counts, matches)]
+    return count_cadences_direct(list_string, char, length_cadence, positions, by)
@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+"""Sweeps the cadence constructions over a grid of lengths and seeds.
+
+Every (length, seed) task builds a 4-cadence free list with its own random
+generator, seeded by task_seed(length, seed), and reduces its non-partial
+4-cadences a few times.  Tasks are spread over a pool of worker processes and
+their results are appended to a columnar result directory as they finish:
+one raw little-endian int64 file per column (length.i8, seed.i8, base.i8,
+reduced_1.i8, ...), readable with numpy.fromfile or numpy.memmap.
+An interrupted run resumes by skipping the tasks already in the directory:
+    python -m cadences run sweep --lengths 7 1393 --step 7 --seeds 0 1 2 --workers 8
+
+Plotting is a separate step, which imports matplotlib on demand and writes an
+image file (no window is opened):
+    python -m cadences plot sweep --output sweep.png
+"""
+
+import argparse
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from random import Random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .generator import make_4_cadence_free, reduce_non_partial_4_cadences
+from .vectorized import make_4_cadence_free_vectorized, reduce_non_partial_4_cadences_vectorized
+
+# number of reductions after the construction (as in generator.test)
+REDUCTIONS = 3
+
+# suffix of the column files of a result directory
+COLUMN_SUFFIX = ".i8"
+
+
+def columns(reductions: int = REDUCTIONS) -> List[str]:
+    """Returns the column names of a result directory."""
+    return ["length", "seed", "base"] + [f"reduced_{index}" for index in range(1, reductions + 1)]
+
+
+def task_seed(length: int, seed: int) -> int:
+    """Derives the seed of a single task, independent of the worker running it."""
+    return seed * 1000003 + length
+
+
+def run_task(length: int, seed: int, reductions: int = REDUCTIONS) -> Dict[str, int]:
+    """Builds and reduces a 4-cadence free list and returns the number of ones after each step."""
+    try:
+        import numpy  # noqa: F401 (required by the vectorized versions, which give the same results)
+        make, reduce = make_4_cadence_free_vectorized, reduce_non_partial_4_cadences_vectorized
+    except ImportError:
+        make, reduce = make_4_cadence_free, reduce_non_partial_4_cadences
+
+    base = make(length, Random(task_seed(length, seed)))
+    result = {"length": length, "seed": seed, "base": sum(base)}
+    for index in range(1, reductions + 1):
+        base = reduce(base)
+        result[f"reduced_{index}"] = sum(base)
+    return result
+
+
+def _column_path(directory: str, name: str) -> str:
+    return os.path.join(directory, name + COLUMN_SUFFIX)
+
+
+def _read_column(path: str) -> List[int]:
+    values = array("q")
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            data = file.read()
+        values.frombytes(data[:len(data) - len(data) % values.itemsize])
+        if sys.byteorder == "big":
+            values.byteswap()
+    return values.tolist()
+
+
+def check_columns(directory: str, reductions: int = REDUCTIONS):
+    """Raises a ValueError if the columns of an existing result directory differ from columns(reductions)."""
+    if not os.path.isdir(directory):
+        return
+    present = sorted(name[:-len(COLUMN_SUFFIX)] for name in os.listdir(directory) if name.endswith(COLUMN_SUFFIX))
+    if present and present != sorted(columns(reductions)):
+        raise ValueError(f"The result directory {directory!r} has the columns {present}, "
+                         f"not those of {reductions} reductions")
+
+
+def load_results(directory: str, reductions: int = REDUCTIONS) -> Dict[str, List[int]]:
+    """Reads the complete rows of a result directory column by column."""
+    loaded = {name: _read_column(_column_path(directory, name)) for name in columns(reductions)}
+    rows = min(len(values) for values in loaded.values())
+    return {name: values[:rows] for name, values in loaded.items()}
+
+
+class ResultWriter:
+    """Appends rows to the column files of a result directory.
+
+    The trailing row of an interrupted write (present in some columns only) is
+    truncated when the directory is opened.  A directory written with another
+    number of reductions is refused instead (see check_columns).
+    """
+
+    def __init__(self, directory: str, reductions: int = REDUCTIONS):
+        check_columns(directory, reductions)
+        os.makedirs(directory, exist_ok=True)
+        self.names = columns(reductions)
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0
+                 for path in (_column_path(directory, name) for name in self.names)]
+        itemsize = array("q").itemsize
+        self.rows = min(sizes) // itemsize
+        if max(sizes) > (self.rows + 1) * itemsize:
+            raise ValueError(f"The columns of the result directory {directory!r} differ by more than one row")
+        self.files = {}
+        for name in self.names:
+            path = _column_path(directory, name)
+            file = open(path, "r+b" if os.path.exists(path) else "w+b")
+            file.truncate(self.rows * itemsize)
+            file.seek(0, os.SEEK_END)
+            self.files[name] = file
+
+    def append(self, row: Dict[str, int]):
+        for name in self.names:
+            value = array("q", [row[name]])
+            if sys.byteorder == "big":
+                value.byteswap()
+            self.files[name].write(value.tobytes())
+        for file in self.files.values():
+            file.flush()
+        self.rows += 1
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def pending_tasks(directory: str, lengths: List[int], seeds: List[int],
+                  reductions: int = REDUCTIONS) -> List[Tuple[int, int]]:
+    """Returns the (length, seed) tasks of the grid without a row in the result directory."""
+    check_columns(directory, reductions)
+    results = load_results(directory, reductions) if os.path.isdir(directory) else {"length": [], "seed": []}
+    done = set(zip(results["length"], results["seed"]))
+    return [(length, seed) for length in lengths for seed in seeds if (length, seed) not in done]
+
+
+def run_sweep(directory: str, lengths: List[int], seeds: List[int], workers: int = 1,
+              reductions: int = REDUCTIONS) -> Iterator[Dict[str, int]]:
+    """Runs the pending tasks of the grid and appends every result as soon as it is available.
+
+    Rows are written in the order of completion.  Since every task has its own
+    seed, the results don't depend on the number of workers or on interruptions.
+    """
+
+    tasks = pending_tasks(directory, lengths, seeds, reductions)
+    with ResultWriter(directory, reductions) as writer:
+        if workers <= 1:
+            for length, seed in tasks:
+                row = run_task(length, seed, reductions)
+                writer.append(row)
+                yield row
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # the largest tasks first, so that no worker idles at the end
+            futures = [executor.submit(run_task, length, seed, reductions)
+                       for length, seed in sorted(tasks, reverse=True)]
+            for future in as_completed(futures):
+                row = future.result()
+                writer.append(row)
+                yield row
+
+
+def plot_results(directory: str, output: str, reductions: int = REDUCTIONS):
+    """Plots every column over the length into an image file (imports matplotlib on demand)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    results = load_results(directory, reductions)
+    names = columns(reductions)[2:]
+    figure, axes = plt.subplots(len(names), 1, figsize=(8, 3 * len(names)), sharex=True, squeeze=False)
+    for axis, name in zip(axes[:, 0], names):
+        axis.scatter(results["length"], results[name], s=4)
+        axis.set_ylabel(name)
+    axes[-1, 0].set_xlabel("length")
+    figure.tight_layout()
+    figure.savefig(output)
+    plt.close(figure)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m cadences", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run (or resume) a sweep")
+    run_parser.add_argument("directory", help="result directory")
+    run_parser.add_argument("--lengths", nargs=2, type=int, default=[7, 1393], metavar=("FIRST", "LAST"),
+                            help="the first and last length of the sweep")
+    run_parser.add_argument("--step", type=int, default=7)
+    run_parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    run_parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    run_parser.add_argument("--reductions", type=int, default=REDUCTIONS)
+    run_parser.add_argument("--quiet", action="store_true", help="don't print a line per task")
+
+    plot_parser = commands.add_parser("plot", help="plot a result directory")
+    plot_parser.add_argument("directory", help="result directory")
+    plot_parser.add_argument("--output", required=True, help="image file")
+    plot_parser.add_argument("--reductions", type=int, default=REDUCTIONS)
+
+    args = parser.parse_args(arguments)
+    if args.command == "plot":
+        plot_results(args.directory, args.output, args.reductions)
+        return 0
+
+    lengths = list(range(args.lengths[0], args.lengths[1] + 1, args.step))
+    try:
+        for row in run_sweep(args.directory, lengths, args.seeds, args.workers, args.reductions):
+            if not args.quiet:
+                print(" ".join(f"{name}={row[name]}" for name in columns(args.reductions)), flush=True)
+    except ValueError as error:
+        parser.error(str(error))
+    return 0
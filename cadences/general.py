@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""This module generalizes the construction of make_4_cadence_free to k-cadences.
+
+The string consists of `blocks` blocks of equal length, where every block whose
+index is a multiple of `period` starts out as ones.  Cadences with a start in
+the first block and a distance period * length_block +- distance_raw hit one
+ones-block per position, and one random position of every such cadence that is
+still present is cleared.  With length_cadence = 4, period = 2 and 7 blocks,
+this is the construction of make_4_cadence_free, except that a cadence is
+present if all of its positions are ones (check_cadence only checks the first
+k - 1 of them) and that only checked positions are cleared, such that the
+result is free of these cadences.
+
+Since cadences with the same distance but different starts (below the
+distance) share no position, all starts of a distance are handled at once.
+Clearing characters never creates a cadence, so the order of the distances
+doesn't affect that the result avoids them.  make_k_cadence_free_batch builds
+many strings in the same vectorized pass, drawing its random numbers from an
+explicit numpy.random.Generator.
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+from .vectorized import cadence_plausibility_mask
+
+
+def block_structure(min_length: int, length_cadence: int, period: int = 2,
+                    blocks: Optional[int] = None) -> Tuple[int, int, int]:
+    """Returns the number of blocks, the length of the string and the length of a block."""
+    if length_cadence < 2:
+        raise ValueError(f"Cadences have a length of at least 2, got {length_cadence}")
+    if period < 1:
+        raise ValueError(f"The period of the blocks is positive, got {period}")
+    blocks = period * (length_cadence - 1) + 1 if blocks is None else blocks
+    if blocks < 1:
+        raise ValueError(f"The number of blocks is positive, got {blocks}")
+    length_list = min_length if min_length % blocks == 0 else (1 + (min_length // blocks)) * blocks
+    return blocks, length_list, length_list // blocks
+
+
+def make_k_cadence_free_batch(count: int, min_length: int, length_cadence: int = 4,
+                              rng: Optional[Any] = None, period: int = 2, blocks: Optional[int] = None,
+                              partial: Optional[Sequence[int]] = None) -> Any:
+    """
+    Builds count strings avoiding the cadences of the block construction.
+
+    Args:
+        count (int): The number of strings.
+        min_length (int): The minimal length of the strings (rounded up to a multiple of blocks).
+        length_cadence (int): The length k of the cadences.
+        rng (Optional[numpy.random.Generator]): The source of the removed positions
+            (default: a freshly seeded numpy.random.default_rng()).
+        period (int): Every period-th block starts out as ones.
+        blocks (Optional[int]): The number of blocks (default: period * (k - 1) + 1).
+        partial (Optional[Sequence[int]]): The positions of a cadence that have to be
+            ones for it to be present, one of which is cleared (default: all k).
+
+    Returns:
+        A NumPy uint8 array of shape (count, length) with one string per row.
+    """
+
+    import numpy
+    rng = numpy.random.default_rng() if rng is None else rng
+    blocks, length_list, length_block = block_structure(min_length, length_cadence, period, blocks)
+    steps = numpy.array(range(length_cadence) if partial is None else sorted(set(partial)), dtype=numpy.int64)
+    if not len(steps) or not 0 <= steps.min() <= steps.max() < length_cadence:
+        raise ValueError(f"The positions of a partial cadence are below {length_cadence}, got {steps.tolist()}")
+
+    pattern = (numpy.arange(length_list) // max(length_block, 1)) % period == 0
+    ret = numpy.repeat(pattern[None, :].astype(numpy.uint8), count, axis=0)
+    starts_all = numpy.arange(length_block)
+    for distance_raw in range(length_block):
+        for distance in dict.fromkeys([period * length_block + distance_raw, period * length_block - distance_raw]):
+            starts = starts_all[cadence_plausibility_mask(starts_all, distance, length_cadence, length_list)]
+            if len(starts) == 0:
+                continue
+            # live[b, s] tells if the cadence with start starts[s] is present in string b
+            live = ret[:, starts[:, None] + steps * distance].all(axis=2)
+            choice = steps[rng.integers(len(steps), size=live.shape)]
+            rows, columns = live.nonzero()
+            ret[rows, starts[columns] + choice[rows, columns] * distance] = 0
+    return ret
+
+
+def make_k_cadence_free(min_length: int, length_cadence: int = 4, rng: Optional[Any] = None,
+                        period: int = 2, blocks: Optional[int] = None,
+                        partial: Optional[Sequence[int]] = None) -> List[int]:
+    """Builds a single string like make_k_cadence_free_batch (with count 1) and returns it as a list."""
+    return make_k_cadence_free_batch(1, min_length, length_cadence, rng, period, blocks, partial)[0].tolist()
@@ -2,10 +2,8 @@
 """This module calculates lists whose underlying string have or avoid certain cadence patterns.
 """
 
-from random import randrange
-from typing import List
-
-import matplotlib.pyplot as plt
+from random import Random, randrange
+from typing import List, Optional
 
 
 def cadence_index_plausibility(start: int, distance: int, length_cadence: int, length_list: int) -> bool:
@@ -41,7 +39,8 @@ def check_partial_cadence(list_string: List[int], start: int, distance: int, len
     return True
 
 
-def make_4_cadence_free(min_length: int) -> List[int]:
+def make_4_cadence_free(min_length: int, rng: Optional[Random] = None) -> List[int]:
+    choose = randrange if rng is None else rng.randrange
     length_list = min_length if min_length % 7 == 0 else (1 + (min_length // 7)) * 7
     length_block = length_list // 7
     ret = [1 if (i // length_block) % 2 == 0 else 0 for i in range(length_list)]
@@ -49,7 +48,7 @@ def make_4_cadence_free(min_length: int) -> List[int]:
         for start in range(length_block):
             for distance in [2 * length_block + distance_raw, 2 * length_block - distance_raw]:
                 if check_cadence(ret, 1, start, distance, 4):
-                    ret[start + randrange(4) * distance] = 0
+                    ret[start + choose(4) * distance] = 0
     return ret
 
 
@@ -71,6 +70,8 @@ def reduce_non_partial_4_cadences(base: List[int]) -> List[int]:
     return base
 
 def test():
+    import matplotlib.pyplot as plt
+
     a = []
     b = []
     c = []
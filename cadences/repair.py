@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+"""This module repairs strings incrementally until a set of cadences is gone.
+
+A CadenceIndex maps every position to the cadences through it and keeps, for
+every cadence, the number of its positions holding the character.  Setting a
+position only updates the cadences through it, so whether a cadence is still
+live (all of its positions hold the character) is known without checking the
+string again.  On top of the index, repair_in_order removes the live cadences
+in a fixed order (as make_4_cadence_free does), and repair_greedy repeatedly
+clears the position hitting the most live cadences.
+"""
+
+from heapq import heappop, heappush
+from random import Random, randrange
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from .generator import cadence_index_plausibility
+
+
+def block_cadences(length_list: int, length_cadence: int = 4) -> List[Tuple[int, int]]:
+    """Returns the plausible (start, distance) pairs checked by make_4_cadence_free, in its order."""
+    length_block = length_list // 7
+    return [(start, distance)
+            for distance_raw in range(length_block)
+            for start in range(length_block)
+            for distance in [2 * length_block + distance_raw, 2 * length_block - distance_raw]
+            if cadence_index_plausibility(start, distance, length_cadence, length_list)]
+
+
+class CadenceIndex:
+    """
+    Tracks which cadences of a string are live while single positions are set.
+
+    Args:
+        list_string (List[int]): The string (updated in place by set).
+        cadences (Sequence[Tuple[int, int]]): The (start, distance) pairs of the cadences.
+        partial (Sequence[int]): The positions within a cadence that are checked
+            (as in check_partial_cadence).
+        char (int): The character of the cadences.
+        live_only (bool): Only index the cadences that are live initially, which
+            suffices as long as positions are only cleared.
+    """
+
+    def __init__(self, list_string: List[int], cadences: Sequence[Tuple[int, int]],
+                 partial: Sequence[int], char: int = 1, live_only: bool = False):
+        self.list_string = list_string
+        self.char = char
+        self.pairs = []
+        self.cadences = []
+        for start, distance in cadences:
+            positions = tuple(start + i * distance for i in partial)
+            if not live_only or all(list_string[position] == char for position in positions):
+                self.pairs.append((start, distance))
+                self.cadences.append(positions)
+        self.through = [[] for _ in list_string]
+        # missing[c] is the number of positions of cadence c without the character
+        self.missing = []
+        # hits[p] is the number of live cadences through position p
+        self.hits = [0] * len(list_string)
+        for index, positions in enumerate(self.cadences):
+            missing = 0
+            for position in positions:
+                self.through[position].append(index)
+                if list_string[position] != char:
+                    missing += 1
+            self.missing.append(missing)
+            if not missing:
+                for position in positions:
+                    self.hits[position] += 1
+        self.live_count = self.missing.count(0)
+        self.flips = 0
+        self.updates = 0
+
+    def is_live(self, index: int) -> bool:
+        return not self.missing[index]
+
+    def set(self, position: int, value: int) -> List[int]:
+        """Sets a position of the string and returns the cadences that died or came alive."""
+        before = self.list_string[position] == self.char
+        self.list_string[position] = value
+        after = value == self.char
+        if before == after:
+            return []
+        self.flips += 1
+        step = -1 if after else 1
+        missing, hits = self.missing, self.hits
+        changed = []
+        for index in self.through[position]:
+            missing[index] += step
+            # the cadence died (1 missing now) or came alive (0 missing now)
+            if missing[index] == (1 if step > 0 else 0):
+                changed.append(index)
+                for other in self.cadences[index]:
+                    hits[other] -= step
+        self.updates += len(self.through[position])
+        self.live_count -= step * len(changed)
+        return changed
+
+    def repair_in_order(self, remove: Callable[[int, int], int], value: int = 0):
+        """Visits the cadences in order and sets position remove(start, distance) of each live one to value."""
+        for index, (start, distance) in enumerate(self.pairs):
+            if self.is_live(index):
+                self.set(remove(start, distance), value)
+
+    def repair_greedy(self, value: int = 0):
+        """Sets the position through the most live cadences to value until none is left.
+
+        Ties are broken by the smallest position.  The candidates are kept in a heap
+        whose outdated entries are skipped when popped.
+        """
+
+        heap = [(-hits, position) for position, hits in enumerate(self.hits) if hits]
+        heap.sort()
+        while self.live_count:
+            hits, position = heappop(heap)
+            if -hits != self.hits[position]:
+                continue
+            for index in self.set(position, value):
+                for other in self.cadences[index]:
+                    if self.hits[other]:
+                        heappush(heap, (-self.hits[other], other))
+
+
+def make_4_cadence_free_incremental(min_length: int, rng: Optional[Random] = None) -> List[int]:
+    """Like make_4_cadence_free (with the same result for the same random state), using a CadenceIndex."""
+    choose = randrange if rng is None else rng.randrange
+    length_list = min_length if min_length % 7 == 0 else (1 + (min_length // 7)) * 7
+    length_block = length_list // 7
+    ret = [1 if (i // length_block) % 2 == 0 else 0 for i in range(length_list)]
+    # check_cadence only checks the first three positions, but removes any of the four
+    index = CadenceIndex(ret, block_cadences(length_list), [0, 1, 2], live_only=True)
+    index.repair_in_order(lambda start, distance: start + choose(4) * distance)
+    return ret
+
+
+def make_4_cadence_free_greedy(min_length: int) -> List[int]:
+    """Removes the cadences of make_4_cadence_free greedily, which keeps more ones (deterministic)."""
+    length_list = min_length if min_length % 7 == 0 else (1 + (min_length // 7)) * 7
+    length_block = length_list // 7
+    ret = [1 if (i // length_block) % 2 == 0 else 0 for i in range(length_list)]
+    CadenceIndex(ret, block_cadences(length_list), [0, 1, 2], live_only=True).repair_greedy()
+    return ret
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""This module contains NumPy versions of the 4-cadence constructions of the generator.
+
+All (start, distance) candidates sharing a raw distance are checked at once
+with strided index arrays.  make_4_cadence_free_vectorized replays only the
+candidates passing this check in the original order, since removing a
+character can only invalidate later candidates, so that both versions draw
+the same random numbers and return the same list.
+"""
+
+from random import Random, randrange
+from typing import Any, List, Optional, Tuple
+
+# the partial 4-cadences of reduce_non_partial_4_cadences, in the order of their bits
+PARTIALS_4 = [[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]]
+
+
+def cadence_plausibility_mask(starts: Any, distances: Any, length_cadence: int, length_list: int) -> Any:
+    """Vectorized cadence_index_plausibility for arrays of starts and distances."""
+    return ((starts < distances) & (starts >= 0)
+            & (starts + (length_cadence - 1) * distances < length_list)
+            & (starts + length_cadence * distances >= length_list))
+
+
+def plausible_candidates(length_block: int, distance_raw: int, length_cadence: int,
+                         length_list: int) -> Tuple[Any, Any]:
+    """Returns the plausible starts and distances of a raw distance in the loop order of the generator.
+
+    The generator iterates over all starts of a block and, for each start, over
+    the distances 2 * length_block + distance_raw and 2 * length_block - distance_raw.
+    """
+
+    import numpy
+    starts = numpy.repeat(numpy.arange(length_block), 2)
+    distances = numpy.tile(numpy.array([2 * length_block + distance_raw, 2 * length_block - distance_raw]),
+                           length_block)
+    plausible = cadence_plausibility_mask(starts, distances, length_cadence, length_list)
+    return starts[plausible], distances[plausible]
+
+
+def make_4_cadence_free_vectorized(min_length: int, rng: Optional[Random] = None) -> List[int]:
+    """Like make_4_cadence_free, with the same result for the same state of the random module (or of rng)."""
+    import numpy
+    choose = randrange if rng is None else rng.randrange
+    length_list = min_length if min_length % 7 == 0 else (1 + (min_length // 7)) * 7
+    length_block = length_list // 7
+    # the replay updates the bytearray, and the array view shares its memory
+    ret = bytearray(((numpy.arange(length_list) // length_block) % 2 == 0).astype(numpy.uint8).tobytes())
+    view = numpy.frombuffer(ret, dtype=numpy.uint8)
+    steps = numpy.arange(3)
+    for distance_raw in range(length_block):
+        starts, distances = plausible_candidates(length_block, distance_raw, 4, length_list)
+        positions = starts[:, None] + steps * distances[:, None]
+        passing = view[positions].all(axis=1)
+        for start, distance in zip(starts[passing].tolist(), distances[passing].tolist()):
+            if ret[start] and ret[start + distance] and ret[start + 2 * distance]:
+                ret[start + choose(4) * distance] = 0
+    return list(ret)
+
+
+def reduce_non_partial_4_cadences_vectorized(base: List[int]) -> List[int]:
+    """Like reduce_non_partial_4_cadences (including updating base in place)."""
+    import numpy
+    length_list = len(base)
+    length_block = length_list // 7
+    values = numpy.array(base, dtype=numpy.int64)
+    partials = numpy.array(PARTIALS_4)
+    bits = 1 << (numpy.arange(len(PARTIALS_4)) + 1)
+    for distance_raw in range(length_block):
+        starts, distances = plausible_candidates(length_block, distance_raw, 4, length_list)
+        # positions[c, p, i] is the i-th index of partial p of candidate c
+        positions = starts[:, None, None] + partials * distances[:, None, None]
+        found = (values[positions] != 0).all(axis=2)
+        masks = numpy.broadcast_to(bits, found.shape)[found]
+        numpy.bitwise_or.at(values, positions[found].ravel(), numpy.repeat(masks, partials.shape[1]))
+    if hasattr(numpy, "bitwise_count"):
+        counts = numpy.bitwise_count(values).tolist()
+    else:
+        counts = [bin(value).count('1') for value in values.tolist()]
+    base[:] = [1 if count == 4 else 0 for count in counts]
+    return base
@@ -1,5 +1,130 @@
 #!/usr/bin/python3
+"""Non-rectangular convolution.
 
-from .primes import *
-from .convolution import *
-from .geometry import *
\ No newline at end of file
+The public names of the submodules are resolved on first access, so that
+``import nrconv`` stays cheap.  Heavy dependencies such as sympy are only
+imported by the functions which need them.
+"""
+
+from importlib import import_module
+
+_SUBMODULES = ["buffers", "primes", "ntt", "convolution", "geometry", "tracing", "plan", "verify", "sparse", "boolean", "fixed", "cli", "service", "vectorized", "moments", "cache"]
+
+# public name -> submodule defining it
+_EXPORTS = {
+    "accumulate": "buffers",
+    "as_sequence": "buffers",
+    "max_abs": "buffers",
+    "read_slice": "buffers",
+    "zero_slice": "buffers",
+    "NTT_PRIMES": "primes",
+    "SIEVE_PRIMES": "primes",
+    "PrimeCache": "primes",
+    "create_mod_prime": "primes",
+    "create_mod_primes": "primes",
+    "create_ntt_prime": "primes",
+    "create_power_of_two": "primes",
+    "get_prime_cache": "primes",
+    "miller_rabin": "primes",
+    "random_prime": "primes",
+    "convolution_ntt": "ntt",
+    "number_theoretic_transform": "ntt",
+    "ConvolutionStep": "convolution",
+    "add_convolution": "convolution",
+    "add_subslice": "convolution",
+    "apply_steps": "convolution",
+    "is_integer": "convolution",
+    "non_rectangular_convolution_convex_polygon": "convolution",
+    "non_rectangular_convolution_edge": "convolution",
+    "non_rectangular_convolution_rectangle": "convolution",
+    "non_rectangular_convolution_triangle": "convolution",
+    "non_rectangular_convolution_triangle_axis_aligned": "convolution",
+    "retrieve_convolution_size": "convolution",
+    "split_convex_polygon": "convolution",
+    "split_triangle": "convolution",
+    "split_triangle_axis_aligned": "convolution",
+    "sub_subslice": "convolution",
+    "Point": "geometry",
+    "canonical_geometry": "geometry",
+    "clip_half_plane": "geometry",
+    "closer_point": "geometry",
+    "column_intervals": "geometry",
+    "geometry_hash": "geometry",
+    "is_convex": "geometry",
+    "is_diagonal_symmetric": "geometry",
+    "opposing_rect_vertex": "geometry",
+    "polygon_intersection": "geometry",
+    "polygon_pieces": "geometry",
+    "rectangle_inscribed": "geometry",
+    "rectangle_inscribed_int": "geometry",
+    "signed_columns": "geometry",
+    "region_pieces": "geometry",
+    "simplify_polygon": "geometry",
+    "triangulate_polygon": "geometry",
+    "union_pieces": "geometry",
+    "Span": "tracing",
+    "Tracer": "tracing",
+    "active_tracer": "tracing",
+    "trace": "tracing",
+    "ENGINES": "plan",
+    "EdgeLeaf": "plan",
+    "Plan": "plan",
+    "PlanCache": "plan",
+    "RectangleLeaf": "plan",
+    "compile_plan": "plan",
+    "compile_polygon_plan": "plan",
+    "compile_region_plan": "plan",
+    "compile_signed_plan": "plan",
+    "compile_symmetric_plan": "plan",
+    "deserialize_plan": "plan",
+    "execute_pieces": "plan",
+    "execute_plan": "plan",
+    "get_plan_cache": "plan",
+    "merge_leaves": "plan",
+    "non_rectangular_convolution": "plan",
+    "non_rectangular_convolution_region": "plan",
+    "serialize_plan": "plan",
+    "SPARSE_DENSITY": "sparse",
+    "SparseIndex": "sparse",
+    "sparse_convolution": "sparse",
+    "BitPackedSequence": "boolean",
+    "boolean_product": "boolean",
+    "INT64_MAX": "fixed",
+    "INT64_MIN": "fixed",
+    "as_int64": "fixed",
+    "fft_is_exact": "fixed",
+    "int64_convolution": "fixed",
+    "as_rational_arrays": "vectorized",
+    "closer_point_arrays": "vectorized",
+    "compile_plans": "vectorized",
+    "opposing_rect_vertex_arrays": "vectorized",
+    "rectangle_inscribed_arrays": "vectorized",
+    "rectangle_inscribed_int_arrays": "vectorized",
+    "ConvolutionClient": "service",
+    "ConvolutionServer": "service",
+    "execute_moment_plan": "moments",
+    "ResultCache": "cache",
+    "content_hash": "cache",
+    "result_key": "cache",
+    "moment_convolutions": "moments",
+    "VERIFY_ROUNDS": "verify",
+    "VerificationError": "verify",
+    "verify_convolution": "verify",
+    "verify_pieces": "verify",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return import_module(f".{name}", __name__)
+    if name in _EXPORTS:
+        value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_SUBMODULES))
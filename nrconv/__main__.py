@@ -0,0 +1,8 @@
+#!/usr/bin/python3
+"""Runs batch jobs of non-rectangular convolutions, see nrconv.cli."""
+
+import sys
+
+from nrconv.cli import main
+
+sys.exit(main())
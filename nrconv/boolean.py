@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+"""This module counts lattice-point coincidences of 0/1 sequences with bit operations.
+
+Both inputs are packed into Python integers with one bit per entry, which
+takes 64 times less memory than a list of machine words.  A rectangle leaf
+spreads its two slices into slots of k bytes and multiplies the resulting
+integers (Kronecker substitution), so that the k-byte slots of the product
+hold the counts.  An edge leaf is a single bitwise AND of its two slices.
+"""
+
+import sys
+from array import array
+from typing import List, Sequence
+
+# 0/1 bytes <-> ASCII digits of a binary literal
+_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+_FROM_DIGITS = bytes.maketrans(b"01", b"\x00\x01")
+
+# slot width in bytes -> array type code of that width
+_SLOT_TYPES = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+class BitPackedSequence:
+    """A 0/1 sequence packed into the bits of a Python integer (bit i is entry i).
+
+    Args:
+        values (Sequence[int]): The 0/1 sequence (list, NumPy array, memory map or buffer).
+
+    Raises:
+        ValueError: If an entry is neither 0 nor 1.
+    """
+
+    def __init__(self, values: Sequence[int]):
+        self.length = len(values)
+        if hasattr(values, "tobytes") and hasattr(values, "dtype"):
+            if not ((values == 0) | (values == 1)).all():
+                raise ValueError("The boolean mode requires 0/1 inputs")
+            data = values.astype("u1").tobytes()
+        else:
+            try:
+                data = bytes(values)
+            except (TypeError, ValueError):
+                raise ValueError("The boolean mode requires 0/1 inputs") from None
+            if data.translate(None, b"\x00\x01"):
+                raise ValueError("The boolean mode requires 0/1 inputs")
+        self.bits = int(data[::-1].translate(_TO_DIGITS), 2) if data else 0
+
+    def range_bytes(self, low: int, high: int) -> bytes:
+        """Returns the entries low to high (inclusive) as 0/1 bytes."""
+        count = high - low + 1
+        if count <= 0:
+            return b""
+        chunk = (self.bits >> low) & ((1 << count) - 1)
+        return format(chunk, f"0{count}b").encode("ascii")[::-1].translate(_FROM_DIGITS)
+
+    def slice_bytes(self, start: int, count: int, step: int = 1) -> bytes:
+        """Returns the entries start + t * step for 0 <= t < count as 0/1 bytes."""
+        if count <= 0:
+            return b""
+        if step == 0:
+            return bytes([self.bits >> start & 1]) * count
+        end = start + (count - 1) * step
+        if step > 0:
+            return self.range_bytes(start, end)[::step]
+        return self.range_bytes(end, start)[::-1][::-step]
+
+
+def slot_width(max_count: int) -> int:
+    """Returns the smallest slot width in bytes holding counts up to max_count."""
+    for width in _SLOT_TYPES:
+        if max_count < 1 << (8 * width):
+            return width
+    raise OverflowError(f"Counts up to {max_count} don't fit into 64-bit slots")
+
+
+def boolean_product(values1: bytes, values2: bytes) -> List[int]:
+    """Counts sum_{i + j = s} values1[i] * values2[j] for 0/1 bytes via a single integer product."""
+    if not values1 or not values2:
+        return []
+    width = slot_width(min(len(values1), len(values2)))
+    spread1, spread2 = bytearray(width * len(values1)), bytearray(width * len(values2))
+    spread1[::width], spread2[::width] = values1, values2
+    product = int.from_bytes(spread1, "little") * int.from_bytes(spread2, "little")
+    size = len(values1) + len(values2) - 1
+    counts = array(_SLOT_TYPES[width], product.to_bytes(width * size, "little"))
+    if sys.byteorder == "big":
+        counts.byteswap()
+    return counts.tolist()
+
+
+def boolean_and(values1: bytes, values2: bytes) -> List[int]:
+    """Returns values1[t] & values2[t] for 0/1 bytes of equal length."""
+    conjunction = int.from_bytes(values1, "little") & int.from_bytes(values2, "little")
+    return list(conjunction.to_bytes(len(values1), "little"))
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+"""This module reads and writes the sequences of a convolution without materializing them.
+
+Inputs may be lists, NumPy arrays (including np.memmap) or any object
+supporting the buffer protocol.  Only the slices needed by a leaf are
+converted into lists of Python ints.
+"""
+
+from typing import Any, List, Sequence
+
+
+def as_sequence(data: Any) -> Sequence[int]:
+    """Returns an indexable and sliceable view of data without copying it."""
+    if hasattr(data, "__getitem__") and hasattr(data, "__len__"):
+        return data
+    return memoryview(data)
+
+
+def read_slice(data: Sequence[int], start: int, count: int, step: int = 1) -> List[int]:
+    """Reads the values data[start + t * step] for 0 <= t < count as Python ints."""
+    if count <= 0:
+        return []
+    if step == 0:
+        return [int(data[start])] * count
+    end = start + (count - 1) * step
+    if step > 0:
+        part = data[start:end + 1:step]
+    else:
+        part = data[end:start + 1:-step][::-1]
+    return part.tolist() if hasattr(part, "tolist") else [int(value) for value in part]
+
+
+def max_abs(data: Sequence[int]) -> int:
+    """Returns the maximal absolute value of data as a Python int."""
+    if hasattr(data, "max") and hasattr(data, "min"):
+        return max(abs(int(data.max())), abs(int(data.min())))
+    return max(abs(int(max(data))), abs(int(min(data))))
+
+
+def zero_slice(conv: Any, size: int):
+    """Sets the first size entries of the output conv to zero."""
+    if isinstance(conv, list):
+        conv[:size] = [0] * size
+    else:
+        conv[:size] = 0
+
+
+def accumulate(conv: Any, offset: int, values: List[int], stride: int = 1):
+    """Adds values onto conv[offset + t * stride] for 0 <= t < len(values).
+
+    Lists are updated in place.  Other outputs (e.g. NumPy arrays or
+    memory-mapped files) are updated with a single vectorized operation.
+    """
+
+    if isinstance(conv, list):
+        for value in values:
+            conv[offset] += value
+            offset = offset + stride
+        return
+
+    import numpy
+    positions = offset + stride * numpy.arange(len(values))
+    numpy.add.at(conv, positions, numpy.array(values, dtype=conv.dtype))
+
+
+def scatter(conv: Any, positions: List[int], values: List[int]):
+    """Adds values[t] onto conv[positions[t]] for all t (positions may repeat)."""
+    if isinstance(conv, list):
+        for position, value in zip(positions, values):
+            conv[position] += value
+        return
+
+    import numpy
+    numpy.add.at(conv, numpy.array(positions, dtype=numpy.int64), numpy.array(values, dtype=conv.dtype))
@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+"""This module caches the results of convolutions by the content of their inputs.
+
+A result is keyed by fast content hashes of both lists and the canonical hash
+of the geometry, so identical requests are answered without evaluating the
+geometry again, no matter whether the lists are passed as lists or arrays.
+Results are kept in memory in least-recently-used order up to a budget in
+bytes and, if a directory is given, also written to disk, where they outlive
+the process and the memory budget.
+
+With leaves set, a miss evaluates the plan of the geometry leaf by leaf and
+caches the convolutions of large rectangle leaves by the content of their
+slices.  Queries whose decompositions share such a rectangle (e.g. overlapping
+polygons over the same lists) reuse its convolution.
+"""
+
+import json
+import os
+import sys
+from array import array
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from nrconv.buffers import accumulate, as_sequence, read_slice
+from nrconv.geometry import Point, geometry_hash
+from nrconv.ntt import convolution_ntt
+from nrconv.plan import Plan, get_plan_cache, non_rectangular_convolution
+from nrconv.primes import create_ntt_prime
+
+# Default budget of the in-memory tier in bytes.
+MAX_BYTES = 64 << 20
+
+# Rectangle leaves with smaller convolutions are recomputed, which is cheaper
+# than hashing their slices and looking them up.
+LEAF_MIN_SIZE = 64
+
+
+def content_hash(data: Sequence[int]) -> str:
+    """Returns a hex digest of the values of a list, array or buffer.
+
+    Equal values give equal digests regardless of the container and its dtype.
+    """
+    digest = blake2b(digest_size=16)
+    if hasattr(data, "dtype"):
+        import numpy
+        if data.dtype.kind in "iub" and (data.dtype != numpy.uint64 or not len(data)
+                                         or int(data.max()) < 1 << 63):
+            digest.update(numpy.ascontiguousarray(data, dtype="<i8").data)
+            return digest.hexdigest()
+        data = data.tolist()
+    try:
+        values = array("q", data)
+        if sys.byteorder == "big":
+            values.byteswap()
+        digest.update(values.tobytes())
+    except OverflowError:
+        digest.update(b"int:" + ",".join(str(int(value)) for value in data).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _combine(*digests: str) -> str:
+    return blake2b("-".join(digests).encode("ascii"), digest_size=16).hexdigest()
+
+
+def result_key(list1: Sequence[int], list2: Sequence[int], geometry: List[Point]) -> str:
+    """Returns the cache key of the convolution of two lists with a geometry."""
+    return _combine(content_hash(list1), content_hash(list2), geometry_hash(geometry))
+
+
+def result_bytes(conv: List[int]) -> int:
+    """Estimates the bytes held by a list of Python ints."""
+    return sys.getsizeof(conv) + sum(sys.getsizeof(value) for value in conv)
+
+
+class ResultCache:
+    """Content-addressed results of convolutions with an LRU memory tier and an optional disk tier.
+
+    Args:
+        max_bytes (int): The budget of the memory tier (see result_bytes);
+            larger results are only written to disk.
+        directory (Optional[str]): The directory of the disk tier (none if omitted).
+        leaves (bool): Whether misses cache the convolutions of rectangle leaves too.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES, directory: Optional[str] = None, leaves: bool = False):
+        if max_bytes < 0:
+            raise ValueError(f"The memory budget is nonnegative, got {max_bytes}")
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.leaves = leaves
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[List[int], int, int]]" = OrderedDict()
+        self._stats = dict.fromkeys(["hits", "disk_hits", "misses", "leaf_hits", "leaf_misses", "evictions"], 0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def path(self, key: str) -> str:
+        """Returns the file of the result with the given key."""
+        return os.path.join(self.directory, f"{key}.result")
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit, miss and eviction counts, and the entries and bytes of the memory tier.
+
+        Lookups of whole results count as hits or misses, those of leaves as
+        leaf_hits or leaf_misses, and disk_hits counts the lookups of either
+        kind answered by the disk tier.
+        """
+        return {**self._stats, "entries": len(self._entries), "bytes": self.bytes}
+
+    def clear(self):
+        """Drops the memory tier (the disk tier is kept)."""
+        self._entries.clear()
+        self.bytes = 0
+
+    def lookup(self, key: str) -> Optional[Tuple[List[int], int]]:
+        """Returns a copy of a cached convolution and its offset, or None on a miss."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            conv, conv_min, _ = self._entries[key]
+            return list(conv), conv_min
+        if self.directory is None or not os.path.exists(self.path(key)):
+            return None
+        try:
+            with open(self.path(key), "r", encoding="ascii") as file:
+                data = json.load(file)
+            conv, conv_min = data["conv"], data["conv_min"]
+        except (ValueError, KeyError):
+            return None  # damaged or stale file, compute again
+        self._stats["disk_hits"] += 1
+        self._remember(key, conv, conv_min)
+        return list(conv), conv_min
+
+    def store(self, key: str, conv: List[int], conv_min: int):
+        """Caches a copy of a convolution and its offset in both tiers."""
+        conv = [int(value) for value in conv]
+        self._remember(key, conv, conv_min)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{self.path(key)}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="ascii") as file:
+                json.dump({"conv_min": conv_min, "conv": conv}, file)
+            os.replace(temporary, self.path(key))
+
+    def _remember(self, key: str, conv: List[int], conv_min: int):
+        """Adds an entry to the memory tier, evicting the least recently used entries beyond the budget."""
+        size = result_bytes(conv)
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[2]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (conv, conv_min, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self._stats["evictions"] += 1
+
+    def convolve(self, list1: Sequence[int], list2: Sequence[int], geometry: List[Point],
+                 compute: Optional[Callable[[], Tuple[Any, int]]] = None,
+                 ntt_prime: Optional[int] = None) -> Tuple[List[int], int]:
+        """Returns the convolution of two lists with a geometry, computing it on a miss.
+
+        On a miss, the plan of the geometry is evaluated leaf by leaf if leaves
+        is set (see execute_plan), otherwise compute is called (by default
+        non_rectangular_convolution).
+        """
+        key = result_key(list1, list2, geometry)
+        cached = self.lookup(key)
+        if cached is not None:
+            self._stats["hits"] += 1
+            return cached
+        self._stats["misses"] += 1
+        if self.leaves:
+            conv, conv_min = self.execute_plan(list1, list2, get_plan_cache().plan(geometry), ntt_prime)
+        elif compute is not None:
+            conv, conv_min = compute()
+        else:
+            conv, conv_min = non_rectangular_convolution(list1, list2, geometry, ntt_prime)
+        self.store(key, conv, conv_min)
+        return conv, conv_min
+
+    def execute_plan(self, list1: Sequence[int], list2: Sequence[int], plan: Plan,
+                     ntt_prime: Optional[int] = None) -> Tuple[List[int], int]:
+        """Evaluates a plan like execute_plan with the dense engine, caching the convolutions of rectangle leaves."""
+        list1, list2 = as_sequence(list1), as_sequence(list2)
+        if ntt_prime is None:
+            ntt_prime = create_ntt_prime(list1, list2)
+        conv = [0] * plan.conv_size
+        for leaf in plan.leaves:
+            if leaf.kind != "rectangle" or leaf.conv_size < LEAF_MIN_SIZE:
+                leaf.apply(list1, list2, conv, plan.conv_min, ntt_prime)
+                continue
+            values1 = read_slice(list1, leaf.x_min, leaf.x_max - leaf.x_min + 1)
+            values2 = read_slice(list2, leaf.y_min, leaf.y_max - leaf.y_min + 1)
+            # the convolution of a rectangle only depends on the values of its slices
+            key = "leaf-" + _combine(content_hash(values1), content_hash(values2))
+            cached = self.lookup(key)
+            if cached is None:
+                self._stats["leaf_misses"] += 1
+                part = [value - ntt_prime if 2 * value > ntt_prime else value
+                        for value in convolution_ntt(values1, values2, ntt_prime)]
+                self.store(key, part, 0)
+            else:
+                self._stats["leaf_hits"] += 1
+                part, _ = cached
+            accumulate(conv, leaf.conv_min - plan.conv_min, [leaf.weight * value for value in part])
+        return conv, plan.conv_min
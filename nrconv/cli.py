@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+"""Batch jobs of non-rectangular convolutions with binary input and output.
+
+Every line of a JSONL job file (or every entry of a JSON list) describes one job:
+    {"id": "a", "list1": "x.npy", "list2": "y.bin", "dtype": "<i8",
+     "geometry": [[0, 0], ["7/2", 0], [0, "7/3"]], "output": "a.npy"}
+
+Inputs are .npy files or raw binary files of the given dtype (default <i8),
+both opened memory-mapped.  Vertices are integers or rational strings.
+Relative paths are resolved against the directory of the job file.  The
+convolution is written as .npy (int64 if it fits, otherwise an object array)
+and a JSON line with the output path and conv_min is printed per job:
+    python -m nrconv jobs.jsonl --workers 4 --profile
+
+Primes and compiled plans are cached per process and reused across jobs.
+Jobs convolving a file with itself over a polygon symmetric about x = y use
+the symmetric fast path.
+Plans are also stored in the directory given by --plan-cache (default: the
+environment variable NRCONV_PLAN_CACHE), so that later runs load them.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from fractions import Fraction
+from typing import Any, Dict, Iterator, List, Optional
+
+from nrconv.fixed import INT64_MAX, INT64_MIN
+from nrconv.geometry import Point, is_convex, is_diagonal_symmetric
+from nrconv.plan import PlanCache, execute_plan, get_plan_cache
+from nrconv.primes import create_ntt_prime
+from nrconv.tracing import Tracer, trace
+
+# plan caches of this process by directory
+_PLAN_CACHES: Dict[str, PlanCache] = {}
+
+
+def parse_geometry(vertices: List[List[Any]]) -> List[Point]:
+    """Parses vertices given as pairs of integers or rational strings like "7/2"."""
+    geometry = []
+    for vertex in vertices:
+        if len(vertex) != 2:
+            raise ValueError(f"A vertex needs two coordinates, got {vertex!r}")
+        coordinates = []
+        for coordinate in vertex:
+            if isinstance(coordinate, bool) or not isinstance(coordinate, (int, str)):
+                raise ValueError(f"Coordinates are integers or rational strings, got {coordinate!r}")
+            coordinates.append(Fraction(coordinate))
+        geometry.append((coordinates[0], coordinates[1]))
+    return geometry
+
+
+def read_jobs(path: str) -> List[Dict[str, Any]]:
+    """Reads the jobs of a JSON or JSONL file and resolves their paths."""
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        jobs = json.loads(stripped)
+    else:
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    for index, job in enumerate(jobs):
+        for key in ("list1", "list2", "geometry", "output"):
+            if key not in job:
+                raise ValueError(f"Job {index} of {path} has no {key!r}")
+        for key in ("list1", "list2", "output"):
+            job[key] = os.path.join(directory, job[key])
+        job.setdefault("id", f"{path}:{index}")
+    return jobs
+
+
+def load_list(path: str, dtype: str = "<i8"):
+    """Opens a .npy file or a raw binary file of the given dtype memory-mapped."""
+    import numpy
+    if path.endswith(".npy"):
+        return numpy.load(path, mmap_mode="r")
+    if os.path.getsize(path) == 0:
+        return numpy.zeros(0, dtype=dtype)
+    return numpy.memmap(path, dtype=dtype, mode="r")
+
+
+def save_list(path: str, values: List[int]):
+    """Saves values as .npy, as int64 if they fit and as an object array otherwise."""
+    import numpy
+    if all(INT64_MIN <= value <= INT64_MAX for value in values):
+        array = numpy.array(values, dtype=numpy.int64)
+    else:
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+    with open(path, "wb") as file:
+        numpy.save(file, array)
+
+
+def plan_cache(directory: Optional[str] = None) -> PlanCache:
+    """Returns the plan cache of a directory (default: the process-wide plan cache)."""
+    if directory is None:
+        return get_plan_cache()
+    if directory not in _PLAN_CACHES:
+        _PLAN_CACHES[directory] = PlanCache(directory)
+    return _PLAN_CACHES[directory]
+
+
+def _phase(tracer: Optional[Tracer], kind: str):
+    return nullcontext() if tracer is None else tracer.span(kind)
+
+
+def run_job(job: Dict[str, Any], profile: bool = False, plan_directory: Optional[str] = None) -> Dict[str, Any]:
+    """Runs a single job and returns its summary (with a trace summary if profile is set)."""
+    start = time.perf_counter()
+    tracer = Tracer() if profile else None
+    with trace(tracer) if profile else nullcontext():
+        with _phase(tracer, "load"):
+            dtype = job.get("dtype", "<i8")
+            list1 = load_list(job["list1"], dtype)
+            list2 = list1 if job["list2"] == job["list1"] else load_list(job["list2"], dtype)
+        with _phase(tracer, "compile"):
+            geometry = parse_geometry(job["geometry"])
+            symmetric = list1 is list2 and is_convex(geometry) and is_diagonal_symmetric(geometry)
+            plan = plan_cache(plan_directory).plan(geometry, symmetric)
+        if len(list1) == 0 or len(list2) == 0:
+            conv, conv_min = [], plan.conv_min
+        else:
+            with _phase(tracer, "execute"):
+                conv, conv_min = execute_plan(list1, list2, plan, create_ntt_prime(list1, list2),
+                                              job.get("max_memory"))
+        with _phase(tracer, "save"):
+            save_list(job["output"], conv)
+
+    summary = {"id": job["id"], "output": job["output"], "conv_min": conv_min, "size": len(conv),
+               "seconds": time.perf_counter() - start}
+    if tracer is not None:
+        summary["profile"] = tracer.summary()
+    return summary
+
+
+def _run_chunk(jobs: List[Dict[str, Any]], profile: bool, plan_directory: Optional[str]) -> List[Dict[str, Any]]:
+    return [run_job(job, profile, plan_directory) for job in jobs]
+
+
+def run_jobs(jobs: List[Dict[str, Any]], workers: int = 1, profile: bool = False,
+             plan_directory: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Runs jobs in order, in this process or spread over a pool of worker processes.
+
+    Jobs are grouped by geometry before they are split into one chunk per worker,
+    so that each worker compiles few plans.
+    """
+
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield run_job(job, profile, plan_directory)
+        return
+
+    ordered = sorted(jobs, key=lambda job: json.dumps(job["geometry"]))
+    chunk_size = -(-len(ordered) // workers)
+    chunks = [ordered[start:start + chunk_size] for start in range(0, len(ordered), chunk_size)]
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in executor.map(_run_chunk, chunks, [profile] * len(chunks),
+                                  [plan_directory] * len(chunks)):
+            for summary in chunk:
+                summaries[summary["id"]] = summary
+    for job in jobs:
+        yield summaries[job["id"]]
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m nrconv", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", nargs="+", help="JSON or JSONL job files")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--profile", action="store_true", help="add a trace summary to every job")
+    parser.add_argument("--plan-cache", help="directory of the on-disk plan cache")
+    parser.add_argument("--summary", help="write the JSON lines to this file instead of stdout")
+    args = parser.parse_args(arguments)
+
+    jobs = [job for path in args.jobs for job in read_jobs(path)]
+    if len({job["id"] for job in jobs}) != len(jobs):
+        parser.error("job ids must be unique")
+
+    output = open(args.summary, "w", encoding="utf-8") if args.summary else sys.stdout
+    try:
+        for summary in run_jobs(jobs, args.workers, args.profile, args.plan_cache):
+            output.write(json.dumps(summary) + "\n")
+            output.flush()
+    finally:
+        if args.summary:
+            output.close()
+    return 0
@@ -2,14 +2,17 @@
 """This module calculates convolutions with non-rectangular geometry.
 """
 
+import sys
 from dataclasses import dataclass
 from fractions import Fraction
 from math import ceil
-from typing import List, Tuple, Callable
-
-import sympy
+from typing import Any, List, Optional, Tuple, Callable
 
+from nrconv.buffers import read_slice
 from nrconv.geometry import rectangle_inscribed_int, rectangle_inscribed, opposing_rect_vertex, closer_point
+from nrconv.ntt import convolution_ntt
+from nrconv.primes import create_power_of_two
+from nrconv.tracing import Tracer, active_tracer
 
 Point = Tuple[Fraction, Fraction]
 
@@ -81,6 +84,10 @@ def add_convolution(
         Second, the offset of the first index of the convolution.
     """
 
+    tracer = active_tracer()
+    if tracer is not None:
+        return traced_add_convolution(tracer, list1, list2, conv, conv_min, steps, ntt_prime)
+
     for step in steps:
         conv_part, conv_part_min = step.function(list1, list2, step.geometry, ntt_prime)
 
@@ -91,6 +98,36 @@ def add_convolution(
 
     return conv, conv_min
 
+def traced_add_convolution(
+        tracer: Tracer,
+        list1: List[int], list2: List[int],
+        conv: List[int], conv_min: int,
+        steps: List[ConvolutionStep], ntt_prime: int
+) -> Tuple[List[int], int]:
+    """Applies a sequence of convolution steps like add_convolution and records a span per step.
+
+    The span of a step holds the kind of the step, the integer bounds of its geometry,
+    the size of its slice, its sign, the elapsed time and the bytes of the returned slice.
+    The accumulation into conv is recorded as a child span of kind "add_subslice".
+    """
+
+    for step in steps:
+        kind = step.function.__name__.replace("non_rectangular_convolution_", "")
+        conv_size, _ = retrieve_convolution_size(step.geometry)
+        with tracer.span(kind, rectangle_inscribed_int(step.geometry), conv_size,
+                         1 if step.is_positive else -1) as span:
+            conv_part, conv_part_min = step.function(list1, list2, step.geometry, ntt_prime)
+            span.allocated_bytes += sys.getsizeof(conv_part)
+
+            with tracer.span("add_subslice", size=len(conv_part)) as accumulation:
+                if step.is_positive:
+                    conv, _ = add_subslice((conv, conv_min), (conv_part, conv_part_min))
+                else:
+                    conv, _ = sub_subslice((conv, conv_min), (conv_part, conv_part_min))
+                accumulation.allocated_bytes += sys.getsizeof(conv)
+
+    return conv, conv_min
+
 def non_rectangular_convolution_edge(list1: List[int], list2: List[int],
                                      geometry: List[Point],
                                      _ntt_prime: int) -> Tuple[List[int], int]:
@@ -127,7 +164,7 @@ def non_rectangular_convolution_edge(list1: List[int], list2: List[int],
         # x_min==x_max==start[0]
         # edge from y_min to y_max (of length conv_size)
         for index in range(conv_size):
-            conv[index] = list1[x_min] * list2[y_min + index]
+            conv[index] = int(list1[x_min]) * int(list2[y_min + index])
         return conv, conv_min
 
     # make start -> end increase in x-direction.
@@ -142,7 +179,7 @@ def non_rectangular_convolution_edge(list1: List[int], list2: List[int],
         if is_integer(y_index):
             y_index = ceil(y_index)
             conv[x_index + y_index - conv_min] \
-                = conv[x_index + y_index - conv_min] + list1[x_index] * list2[y_index]
+                = conv[x_index + y_index - conv_min] + int(list1[x_index]) * int(list2[y_index])
     return conv, conv_min
 
 def non_rectangular_convolution_rectangle(
@@ -172,21 +209,27 @@ def non_rectangular_convolution_rectangle(
         return [], conv_min
 
     (x_min, y_min), (x_max, y_max) = rectangle_inscribed_int([start, end])
-    return sympy.discrete.convolutions.convolution_ntt(
-        list1[x_min:x_max + 1], list2[y_min:y_max + 1],
-        ntt_prime), conv_min
+    tracer = active_tracer()
+    if tracer is not None:
+        tracer.annotate(ntt_length=create_power_of_two(conv_size))
+    conv = convolution_ntt(read_slice(list1, x_min, x_max - x_min + 1),
+                           read_slice(list2, y_min, y_max - y_min + 1), ntt_prime)
 
-def non_rectangular_convolution_triangle_axis_aligned(
-        list1: List[int], list2: List[int], geometry: List[Point],
-        ntt_prime: int) -> Tuple[List[int], int]:
-    """Non-Rectangular Convolution -- Base Case 3: Axis-aligned triangles.
-    All edges are included.
+    # map the residues back to the symmetric range, which restores negative values
+    return [value - ntt_prime if 2 * value > ntt_prime else value for value in conv], conv_min
+
+def apply_steps(list1: List[int], list2: List[int], geometry: List[Point],
+                steps: List[ConvolutionStep], ntt_prime: int) -> Tuple[List[int], int]:
+    """Applies the steps decomposing geometry onto an empty convolution slice.
+
+    Without any steps, the convolution is empty.  A single positive step
+    is evaluated directly without an intermediate slice.
 
     Args:
         list1 (List[int]): The first list.
         list2 (List[int]): The second list.
-        geometry (List[Point]): The three vertices defining the
-            underlying triangle.
+        geometry (List[Point]): The vertices of the decomposed geometry.
+        steps (List[ConvolutionStep]): The convolution steps.
         ntt_prime (int): The prime for the number theoretic transform.
 
     Returns:
@@ -196,10 +239,29 @@ def non_rectangular_convolution_triangle_axis_aligned(
         Second, the offset of the first index of the convolution.
     """
 
+    conv_size, conv_min = retrieve_convolution_size(geometry)
+    if not steps:
+        return [], conv_min
+    if len(steps) == 1 and steps[0].is_positive:
+        return steps[0].function(list1, list2, steps[0].geometry, ntt_prime)
+    return add_convolution(list1, list2, [0] * conv_size, conv_min, steps, ntt_prime)
+
+def split_triangle_axis_aligned(geometry: List[Point]) -> List[ConvolutionStep]:
+    """Decomposes an axis-aligned triangle into convolution steps.
+    All edges are included.
+
+    Args:
+        geometry (List[Point]): The three vertices defining the
+            underlying triangle.
+
+    Returns:
+        The convolution steps, whose sum is the convolution with the triangle.
+    """
+
     A, B, C = geometry[0], geometry[1], geometry[2]
     (x_min, y_min), (x_max, y_max) = rectangle_inscribed([A, B, C])
     x_average, y_average = (x_min + x_max) / 2, (y_min + y_max) / 2
-    conv_size, conv_min = retrieve_convolution_size([A, B, C])
+    conv_size, _ = retrieve_convolution_size([A, B, C])
 
     x_cathetus = A[0] + B[0] + C[0] - x_min - x_max
     y_cathetus = A[1] + B[1] + C[1] - y_min - y_max
@@ -208,11 +270,15 @@ def non_rectangular_convolution_triangle_axis_aligned(
 
     # Case 0: Degenerated triangle:
     if (x_min == x_max) or (y_min == y_max):
-        return non_rectangular_convolution_edge(list1, list2, [(x_min, y_min), (x_max, y_max)], ntt_prime)
+        return [ConvolutionStep(
+            geometry=[(x_min, y_min), (x_max, y_max)],
+            function=non_rectangular_convolution_edge,
+            is_positive=True
+        )]
 
     # Case 1: Small triangle:
     if conv_size == 0:
-        return [], conv_min
+        return []
     if conv_size == 1:
         x_I, y_I = ceil(x_min), ceil(y_min)
         x_quotient = abs(x_I - x_cathetus) / (x_max - x_min)
@@ -220,14 +286,16 @@ def non_rectangular_convolution_triangle_axis_aligned(
         # the relative distances from the catheti have to be at most 1
         # for the point to be in the triangle
         if x_quotient + y_quotient > 1:
-            return [], conv_min
-        return [list1[x_I] * list2[y_I]], conv_min
+            return []
+        point = (Fraction(x_I), Fraction(y_I))
+        return [ConvolutionStep(
+            geometry=[point, point],
+            function=non_rectangular_convolution_rectangle,
+            is_positive=True
+        )]
 
     # Case 2: Large triangle:
-    conv = [0] * conv_size
-
-    # Define all steps in a single list
-    steps = [
+    return [
         ConvolutionStep(
             geometry=[(x_cathetus, y_cathetus), (x_average, y_average)],
             function=non_rectangular_convolution_rectangle,
@@ -255,17 +323,12 @@ def non_rectangular_convolution_triangle_axis_aligned(
         )
     ]
 
-    # Apply all convolution steps in a structured way
-    conv, conv_min = add_convolution(list1, list2, conv, conv_min, steps, ntt_prime)
-
-    return conv, conv_min
-
-def non_rectangular_convolution_triangle(
+def non_rectangular_convolution_triangle_axis_aligned(
         list1: List[int], list2: List[int], geometry: List[Point],
         ntt_prime: int) -> Tuple[List[int], int]:
-    """Non-Rectangular Convolution -- Base Case 4: arbitrary Triangles.
+    """Non-Rectangular Convolution -- Base Case 3: Axis-aligned triangles.
     All edges are included.
-    
+
     Args:
         list1 (List[int]): The first list.
         list2 (List[int]): The second list.
@@ -276,18 +339,34 @@ def non_rectangular_convolution_triangle(
     Returns:
         First, the convolution of the two lists with the given
             base geometry as a list of integers.
-        
+
         Second, the offset of the first index of the convolution.
     """
+
+    steps = split_triangle_axis_aligned(geometry)
+    return apply_steps(list1, list2, geometry, steps, ntt_prime)
+
+def split_triangle(geometry: List[Point]) -> List[ConvolutionStep]:
+    """Decomposes an arbitrary triangle into convolution steps.
+    All edges are included.
+
+    Args:
+        geometry (List[Point]): The three vertices defining the
+            underlying triangle.
+
+    Returns:
+        The convolution steps, whose sum is the convolution with the triangle.
+    """
     A, B, C = geometry[0], geometry[1], geometry[2]
     (x_min, y_min), (x_max, y_max) = rectangle_inscribed([A, B, C])
-    conv_size, conv_min = retrieve_convolution_size([A, B, C])
 
     # Case 0.1: Degenerated triangle:
     if (x_min == x_max) or (y_min == y_max):
-        return non_rectangular_convolution_edge(list1, list2, [(x_min, y_min), (x_max, y_max)], ntt_prime)
-
-    conv = [0] * conv_size
+        return [ConvolutionStep(
+            geometry=[(x_min, y_min), (x_max, y_max)],
+            function=non_rectangular_convolution_edge,
+            is_positive=True
+        )]
 
     vertex_collisions = []
     vertex_non_collisions = []
@@ -300,7 +379,11 @@ def non_rectangular_convolution_triangle(
 
     # Case 0.2: Axis-aligned triangle:
     if len(vertex_collisions) == 3:
-        return non_rectangular_convolution_triangle_axis_aligned(list1, list2, geometry, ntt_prime)
+        return [ConvolutionStep(
+            geometry=geometry,
+            function=non_rectangular_convolution_triangle_axis_aligned,
+            is_positive=True
+        )]
 
     if len(vertex_collisions) == 2:
         # Lemma 12, Case 1: Two vertices are on opposing vertices of the surrounding rectangle.
@@ -344,37 +427,32 @@ def non_rectangular_convolution_triangle(
                 is_positive=True)
 
             # Store in steps list
-            steps = [add_rectangle,
-                     add_first_triangle, sub_first_edge,
-                     add_second_triangle, sub_second_edge,
-                     sub_third_triangle, add_hypotenuse_edge]
+            return [add_rectangle,
+                    add_first_triangle, sub_first_edge,
+                    add_second_triangle, sub_second_edge,
+                    sub_third_triangle, add_hypotenuse_edge]
 
         # Case 2.1: Two vertices are on the same edge of the surrounding rectangle.
+        # calculate base point on the common edge
+        if vertex_collisions[0][0] == vertex_collisions[1][0]:
+            base_point = (vertex_collisions[0][0], vertex_non_collisions[0][1])
         else:
-            # calculate base point on the common edge
-            if vertex_collisions[0][0] == vertex_collisions[1][0]:
-                base_point = (vertex_collisions[0][0], vertex_non_collisions[0][1])
-            else:
-                base_point = (vertex_non_collisions[0][0], vertex_collisions[0][1])
-
-            add_first_triangle = ConvolutionStep(
-                geometry=[vertex_collisions[0], base_point, vertex_non_collisions[0]],
-                function=non_rectangular_convolution_triangle_axis_aligned,
-                is_positive=True)
-            add_second_triangle = ConvolutionStep(
-                geometry=[vertex_collisions[1], base_point, vertex_non_collisions[0]],
-                function=non_rectangular_convolution_triangle_axis_aligned,
-                is_positive=True)
-            sub_common_edge = ConvolutionStep(
-                geometry=[base_point, vertex_non_collisions[0]],
-                function=non_rectangular_convolution_edge,
-                is_positive=False)
+            base_point = (vertex_non_collisions[0][0], vertex_collisions[0][1])
 
-            steps = [add_first_triangle, add_second_triangle, sub_common_edge]
+        add_first_triangle = ConvolutionStep(
+            geometry=[vertex_collisions[0], base_point, vertex_non_collisions[0]],
+            function=non_rectangular_convolution_triangle_axis_aligned,
+            is_positive=True)
+        add_second_triangle = ConvolutionStep(
+            geometry=[vertex_collisions[1], base_point, vertex_non_collisions[0]],
+            function=non_rectangular_convolution_triangle_axis_aligned,
+            is_positive=True)
+        sub_common_edge = ConvolutionStep(
+            geometry=[base_point, vertex_non_collisions[0]],
+            function=non_rectangular_convolution_edge,
+            is_positive=False)
 
-        conv, conv_min = add_convolution(list1, list2, conv, conv_min, steps, ntt_prime)
-
-        return conv, conv_min
+        return [add_first_triangle, add_second_triangle, sub_common_edge]
 
     # Case 2.2: Only one vertex of the triangle coincides with the surrounding rectangle.
     opposite_collision = (x_min + x_max - vertex_collisions[0][0], y_min + y_max - vertex_collisions[0][1])
@@ -411,26 +489,22 @@ def non_rectangular_convolution_triangle(
         function=non_rectangular_convolution_edge,
         is_positive=True)
 
-    steps = [add_rectangle,
-             sub_first_triangle, add_first_edge,
-             sub_second_triangle, add_second_edge,
-             sub_third_triangle, add_third_edge]
-
-    conv, conv_min = add_convolution(list1, list2, conv, conv_min, steps, ntt_prime)
-
-    return conv, conv_min
+    return [add_rectangle,
+            sub_first_triangle, add_first_edge,
+            sub_second_triangle, add_second_edge,
+            sub_third_triangle, add_third_edge]
 
-def non_rectangular_convolution_convex_polygon(
+def non_rectangular_convolution_triangle(
         list1: List[int], list2: List[int], geometry: List[Point],
         ntt_prime: int) -> Tuple[List[int], int]:
-    """Non-Rectangular Convolution -- Base Case 5: Arbitrary convex polygons.
+    """Non-Rectangular Convolution -- Base Case 4: arbitrary Triangles.
     All edges are included.
     
     Args:
         list1 (List[int]): The first list.
         list2 (List[int]): The second list.
-        geometry (List[Point]): The vertices defining the
-            underlying polygon.
+        geometry (List[Point]): The three vertices defining the
+            underlying triangle.
         ntt_prime (int): The prime for the number theoretic transform.
 
     Returns:
@@ -439,23 +513,49 @@ def non_rectangular_convolution_convex_polygon(
         
         Second, the offset of the first index of the convolution.
     """
+
+    steps = split_triangle(geometry)
+    return apply_steps(list1, list2, geometry, steps, ntt_prime)
+
+def split_convex_polygon(geometry: List[Point]) -> List[ConvolutionStep]:
+    """Decomposes an arbitrary convex polygon into convolution steps.
+    All edges are included.
+
+    Args:
+        geometry (List[Point]): The vertices defining the
+            underlying polygon.
+
+    Returns:
+        The convolution steps, whose sum is the convolution with the polygon.
+    """
     number_vertices = len(geometry)
 
+    if number_vertices == 1:
+        return [ConvolutionStep(
+            geometry=[geometry[0], geometry[0]],
+            function=non_rectangular_convolution_rectangle,
+            is_positive=True
+        )]
+
     if number_vertices == 2:
-        return non_rectangular_convolution_edge(list1, list2, geometry, ntt_prime)
+        return [ConvolutionStep(
+            geometry=geometry,
+            function=non_rectangular_convolution_edge,
+            is_positive=True
+        )]
 
     if number_vertices == 3:
-        return non_rectangular_convolution_triangle(list1, list2, geometry, ntt_prime)
-
-    conv_size, conv_min = retrieve_convolution_size(geometry)
-
-    conv = [0] * conv_size
+        return [ConvolutionStep(
+            geometry=geometry,
+            function=non_rectangular_convolution_triangle,
+            is_positive=True
+        )]
 
     if number_vertices == 4:
         # Add first triangle.
         # Add second triangle.
         # Subtract edge between the two triangles, which was counted twice.
-        steps = [
+        return [
             ConvolutionStep(
                 geometry=[geometry[0], geometry[1], geometry[2]],
                 function=non_rectangular_convolution_triangle,
@@ -473,10 +573,6 @@ def non_rectangular_convolution_convex_polygon(
             )
         ]
 
-        conv, conv_min = add_convolution(list1, list2, conv, conv_min, steps, ntt_prime)
-
-        return conv, conv_min
-
     # Polygon v_{0} - v{2} - v{4} - v_{6} - ... - v_{2*floor(k/2)}:
     steps = [
         ConvolutionStep(
@@ -507,7 +603,40 @@ def non_rectangular_convolution_convex_polygon(
             function=non_rectangular_convolution_edge,
             is_positive=False
         ))
+    return steps
+
+def non_rectangular_convolution_convex_polygon(
+        list1: List[int], list2: List[int], geometry: List[Point],
+        ntt_prime: int, cache: Optional[Any] = None) -> Tuple[List[int], int]:
+    """Non-Rectangular Convolution -- Base Case 5: Arbitrary convex polygons.
+    All edges are included.
+    
+    Args:
+        list1 (List[int]): The first list.
+        list2 (List[int]): The second list.
+        geometry (List[Point]): The vertices defining the
+            underlying polygon.
+        ntt_prime (int): The prime for the number theoretic transform.
+        cache (Optional[ResultCache]): A cache answering repeated requests,
+            see nrconv.cache.ResultCache.
 
-    conv, conv_min = add_convolution(list1, list2, conv, conv_min, steps, ntt_prime)
+    Returns:
+        First, the convolution of the two lists with the given
+            base geometry as a list of integers.
+        
+        Second, the offset of the first index of the convolution.
+    """
 
-    return conv, conv_min
+    if cache is not None:
+        return cache.convolve(list1, list2, geometry,
+                              lambda: non_rectangular_convolution_convex_polygon(list1, list2, geometry, ntt_prime),
+                              ntt_prime)
+    steps = split_convex_polygon(geometry)
+    return apply_steps(list1, list2, geometry, steps, ntt_prime)
+
+# The decomposition of every composite convolution function into steps.
+SPLITTERS = {
+    non_rectangular_convolution_triangle_axis_aligned: split_triangle_axis_aligned,
+    non_rectangular_convolution_triangle: split_triangle,
+    non_rectangular_convolution_convex_polygon: split_convex_polygon,
+}
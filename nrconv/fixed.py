@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+"""This module evaluates leaves in fixed-width int64 arithmetic with NumPy.
+
+The int64 engine only runs a query if a magnitude bound guarantees that no
+entry of the output (and no partial sum of it) overflows.  Every leaf is then
+convolved directly, or by a floating-point FFT if a rounding bound proves the
+result exact.  Leaves where neither applies are promoted to the exact NTT.
+"""
+
+from math import sqrt
+from typing import Any, Optional, Sequence
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+# Rectangle leaves with at most this many lattice points are convolved directly.
+DIRECT_POINTS = 1 << 14
+
+# Relative rounding error per doubling of the transform length accepted for
+# FFT-based products (a conservative multiple of the double precision epsilon).
+FFT_ERROR_SCALE = 2.0 ** -50
+
+
+def as_int64(values: Sequence[int]) -> Optional[Any]:
+    """Returns values as a NumPy int64 array, or None if an entry does not fit.
+
+    The minimum -2^63 is rejected as well, such that absolute values fit.
+    """
+
+    import numpy
+    if hasattr(values, "dtype"):
+        if values.dtype.kind not in "biu":
+            return None
+        if values.dtype.kind == "u" and len(values) and int(values.max()) > INT64_MAX:
+            return None
+        array = numpy.asarray(values, dtype=numpy.int64)
+    else:
+        try:
+            array = numpy.array(values, dtype=numpy.int64)
+        except OverflowError:
+            return None
+    if len(array) and int(array.min()) == INT64_MIN:
+        return None
+    return array
+
+
+def slice_int64(array: Any, start: int, count: int, step: int = 1) -> Any:
+    """Returns the view array[start + t * step] for 0 <= t < count (step 0 repeats an entry)."""
+    import numpy
+    if count <= 0:
+        return array[:0]
+    if step == 0:
+        return numpy.full(count, array[start], dtype=numpy.int64)
+    end = start + (count - 1) * step
+    return array[start:end + 1:step] if step > 0 else array[end:start + 1:-step][::-1]
+
+
+def slice_max_abs(values: Any) -> int:
+    """Returns the maximal absolute value of an int64 array as a Python int."""
+    if len(values) == 0:
+        return 0
+    return max(abs(int(values.max())), abs(int(values.min())))
+
+
+def fft_is_exact(max1: int, max2: int, length1: int, length2: int) -> bool:
+    """Checks if rounding an FFT-based product of the two slices restores it exactly.
+
+    The rounding error of a floating-point convolution is bounded by the product
+    of the 2-norms of its inputs times the relative error of the transform.
+    """
+
+    fft_length = 1 << (length1 + length2 - 2).bit_length()
+    error = max1 * max2 * sqrt(length1 * length2) * fft_length.bit_length() * FFT_ERROR_SCALE
+    return error < 0.25
+
+
+def int64_convolution(values1: Any, values2: Any, max1: int, max2: int) -> Optional[Any]:
+    """Convolves two int64 slices whose convolution is known to fit into int64.
+
+    Returns:
+        The convolution as an int64 array, or None if it can't be computed exactly
+        in fixed width (small enough for neither a direct product nor an exact FFT).
+    """
+
+    import numpy
+    length1, length2 = len(values1), len(values2)
+    if length1 * length2 <= DIRECT_POINTS:
+        return numpy.convolve(values1, values2)
+    if not fft_is_exact(max1, max2, length1, length2):
+        return None
+    fft_length = 1 << (length1 + length2 - 2).bit_length()
+    product = numpy.fft.irfft(numpy.fft.rfft(values1, fft_length) * numpy.fft.rfft(values2, fft_length), fft_length)
+    return numpy.rint(product[:length1 + length2 - 1]).astype(numpy.int64)
@@ -2,17 +2,20 @@
 """This module handles geometry calculation.
 """
 
+from hashlib import sha256
 from math import ceil, floor
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from fractions import Fraction
 
 Point = Tuple[Fraction, Fraction]
 
+
 def rectangle_inscribed_int(coordinates: List[Point]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
     """Retrieves bounds for the minimal and maximal integer coordinates of the given polygon"""
     (x_min, y_min), (x_max, y_max) = rectangle_inscribed(coordinates)
     return (ceil(x_min), ceil(y_min)), (floor(x_max), floor(y_max))
 
+
 def rectangle_inscribed(coordinates: List[Point]) -> Tuple[Point, Point]:
     """Retrieves bounds for the minimal and maximal coordinates of the given polygon"""
     x_min = min(coordinate[0] for coordinate in coordinates)
@@ -21,6 +24,7 @@ def rectangle_inscribed(coordinates: List[Point]) -> Tuple[Point, Point]:
     y_max = max(coordinate[1] for coordinate in coordinates)
     return (x_min, y_min), (x_max, y_max)
 
+
 def closer_point(reference: Point, option_a: Point, option_b: Point) -> Point:
     """
     Returns the point closer to the reference.
@@ -37,6 +41,7 @@ def closer_point(reference: Point, option_a: Point, option_b: Point) -> Point:
     b_squared_distance = sum((ref - b) ** 2 for ref, b in zip(reference, option_b))
     return option_a if a_squared_distance <= b_squared_distance else option_b
 
+
 def opposing_rect_vertex(reference: Point, diag_start: Point, diag_end: Point) -> Point:
     """Determines the opposite rectangle vertex relative to the reference point.
 
@@ -59,4 +64,296 @@ def opposing_rect_vertex(reference: Point, diag_start: Point, diag_end: Point) -
     other_a, other_b = (diag_end[0], diag_start[1]), (diag_start[0], diag_end[1])
     weight_ax, weight_ay = abs(other_a[0] - diag_start[0]), abs(other_a[1] - diag_end[1])
     part_ax, part_ay = abs(other_a[0] - reference[0]), abs(other_a[1] - reference[1])
-    return other_a if (part_ax / weight_ax) + (part_ay / weight_ay) > 1 else other_b
\ No newline at end of file
+    return other_a if (part_ax / weight_ax) + (part_ay / weight_ay) > 1 else other_b
+
+
+def canonical_geometry(coordinates: List[Point]) -> List[Point]:
+    """
+    Returns a canonical vertex sequence of the given polygon.
+
+    The vertices are rotated to start at the lexicographically smallest one,
+    and the smaller one of both traversal directions is chosen, so that every
+    rotation and reflection of the vertex list yields the same sequence.
+    """
+    vertices = [(Fraction(x), Fraction(y)) for x, y in coordinates]
+    if not vertices:
+        return vertices
+    first = min(range(len(vertices)), key=lambda index: vertices[index])
+    forward = vertices[first:] + vertices[:first]
+    backward = [forward[0]] + forward[:0:-1]
+    return min(forward, backward)
+
+
+def geometry_hash(coordinates: List[Point]) -> str:
+    """Returns a hex digest identifying the polygon independent of its vertex order."""
+    text = ";".join(f"{x.numerator}/{x.denominator},{y.numerator}/{y.denominator}"
+                    for x, y in canonical_geometry(coordinates))
+    return sha256(text.encode("ascii")).hexdigest()
+
+
+def column_intervals(coordinates: List[Point]) -> Dict[int, Tuple[int, int]]:
+    """
+    Retrieves the lattice points of a convex polygon column by column.
+
+    Args:
+        coordinates (List[Point]): The vertices of the convex polygon.
+
+    Returns:
+        A dictionary mapping every integer x, whose vertical line meets a lattice
+        point of the polygon, to the minimal and maximal integer y on that line.
+    """
+    bounds: Dict[int, List[int]] = {}
+
+    def update(x_index: int, y_low: int, y_high: int):
+        if x_index in bounds:
+            bounds[x_index][0] = min(bounds[x_index][0], y_low)
+            bounds[x_index][1] = max(bounds[x_index][1], y_high)
+        else:
+            bounds[x_index] = [y_low, y_high]
+
+    count = len(coordinates)
+    for index in range(count):
+        (x_start, y_start), (x_end, y_end) = coordinates[index], coordinates[(index + 1) % count]
+        x_start, y_start, x_end, y_end = Fraction(x_start), Fraction(y_start), Fraction(x_end), Fraction(y_end)
+        if x_start == x_end:
+            if x_start.denominator == 1:
+                update(int(x_start), ceil(min(y_start, y_end)), floor(max(y_start, y_end)))
+            continue
+        if x_start > x_end:
+            x_start, y_start, x_end, y_end = x_end, y_end, x_start, y_start
+        # y = (slope * x + intercept) / denominator with integers only
+        slope = (y_end - y_start) / (x_end - x_start)
+        offset = y_start - x_start * slope
+        denominator = slope.denominator * offset.denominator
+        slope_numerator = slope.numerator * offset.denominator
+        offset_numerator = offset.numerator * slope.denominator
+        for x_index in range(ceil(x_start), floor(x_end) + 1):
+            numerator = slope_numerator * x_index + offset_numerator
+            update(x_index, -(-numerator // denominator), numerator // denominator)
+
+    return {x_index: (y_low, y_high) for x_index, (y_low, y_high) in bounds.items() if y_low <= y_high}
+
+
+def is_diagonal_symmetric(coordinates: List[Point]) -> bool:
+    """Checks if the polygon is its own mirror image at the diagonal x = y."""
+    vertices = {(Fraction(x), Fraction(y)) for x, y in coordinates}
+    return vertices == {(y, x) for x, y in vertices}
+
+
+def clip_half_plane(coordinates: List[Point], normal_x: Fraction, normal_y: Fraction,
+                    bound: Fraction) -> List[Point]:
+    """
+    Clips a convex polygon to the half-plane normal_x * x + normal_y * y <= bound.
+
+    Args:
+        coordinates (List[Point]): The vertices of the convex polygon.
+        normal_x (Fraction): The x-coordinate of the normal of the half-plane.
+        normal_y (Fraction): The y-coordinate of the normal of the half-plane.
+        bound (Fraction): The bound of the half-plane.
+
+    Returns:
+        The vertices of the clipped polygon without repeated or collinear
+        vertices (a single point or two points for degenerate results),
+        or an empty list if the polygon misses the half-plane.
+    """
+    vertices = [(Fraction(x), Fraction(y)) for x, y in coordinates]
+    clipped: List[Point] = []
+    count = len(vertices)
+    for index in range(count):
+        start, end = vertices[index], vertices[(index + 1) % count]
+        start_value = normal_x * start[0] + normal_y * start[1] - bound
+        end_value = normal_x * end[0] + normal_y * end[1] - bound
+        if start_value <= 0:
+            clipped.append(start)
+        if (start_value < 0 < end_value) or (end_value < 0 < start_value):
+            ratio = start_value / (start_value - end_value)
+            clipped.append((start[0] + ratio * (end[0] - start[0]), start[1] + ratio * (end[1] - start[1])))
+    return simplify_polygon(clipped)
+
+
+def _cross(origin: Point, first: Point, second: Point) -> Fraction:
+    return (first[0] - origin[0]) * (second[1] - origin[1]) - (first[1] - origin[1]) * (second[0] - origin[0])
+
+
+def simplify_polygon(coordinates: List[Point]) -> List[Point]:
+    """Removes repeated vertices and vertices in the middle of a straight boundary of a convex polygon."""
+    vertices: List[Point] = []
+    for vertex in coordinates:
+        if vertex not in vertices:
+            vertices.append(vertex)
+
+    if len(vertices) < 3:
+        return sorted(vertices)
+    # degenerate polygons shrink to the end points of their segment
+    if all(_cross(vertices[0], vertices[1], vertex) == 0 for vertex in vertices[2:]):
+        return [min(vertices), max(vertices)]
+
+    index = 0
+    while index < len(vertices):
+        if _cross(vertices[index - 1], vertices[index], vertices[(index + 1) % len(vertices)]) == 0:
+            del vertices[index]
+        else:
+            index += 1
+    return vertices
+
+
+def is_convex(coordinates: List[Point]) -> bool:
+    """Checks if the vertices form a convex polygon (collinear vertices are allowed)."""
+    count = len(coordinates)
+    if count < 4:
+        return True
+    turns = [_cross(coordinates[index - 1], coordinates[index], coordinates[(index + 1) % count])
+             for index in range(count)]
+    if not (all(turn >= 0 for turn in turns) or all(turn <= 0 for turn in turns)):
+        return False
+    # a star polygon turns consistently, but changes its x-direction more than twice
+    directions = [coordinates[(index + 1) % count][0] - coordinates[index][0] for index in range(count)]
+    directions = [direction > 0 for direction in directions if direction != 0]
+    return sum(directions[index - 1] != directions[index] for index in range(len(directions))) <= 2
+
+
+def triangulate_polygon(coordinates: List[Point]) -> Tuple[List[List[Point]], List[List[Point]]]:
+    """
+    Triangulates a simple polygon by ear clipping.
+
+    Args:
+        coordinates (List[Point]): The vertices of the simple polygon.
+
+    Returns:
+        First, the triangles.
+
+        Second, the diagonals between two triangles.  Every lattice point of the
+        polygon lies in exactly one more triangle than diagonal.
+    """
+    vertices = simplify_polygon([(Fraction(x), Fraction(y)) for x, y in coordinates])
+    if len(vertices) < 3:
+        return [vertices] if vertices else [], []
+    area = sum(vertices[index - 1][0] * vertices[index][1] - vertices[index][0] * vertices[index - 1][1]
+               for index in range(len(vertices)))
+    if area < 0:
+        vertices.reverse()
+
+    triangles: List[List[Point]] = []
+    diagonals: List[List[Point]] = []
+    while len(vertices) > 3:
+        count = len(vertices)
+        for index in range(count):
+            before, vertex, after = vertices[index - 1], vertices[index], vertices[(index + 1) % count]
+            if _cross(before, vertex, after) <= 0:
+                continue
+            # no other vertex may lie in the (closed) ear
+            if any(_cross(before, vertex, other) >= 0 and _cross(vertex, after, other) >= 0
+                   and _cross(after, before, other) >= 0
+                   for other in vertices if other not in (before, vertex, after)):
+                continue
+            triangles.append([before, vertex, after])
+            diagonals.append([before, after])
+            del vertices[index]
+            break
+        else:
+            raise ValueError("The polygon is not simple")
+    triangles.append(vertices)
+    return triangles, diagonals
+
+
+def polygon_pieces(coordinates: List[Point]) -> List[Tuple[List[Point], int]]:
+    """Decomposes a simple polygon into signed convex pieces (convex polygons stay whole)."""
+    if is_convex(coordinates):
+        return [(list(coordinates), 1)]
+    triangles, diagonals = triangulate_polygon(coordinates)
+    return [(triangle, 1) for triangle in triangles] + [(diagonal, -1) for diagonal in diagonals]
+
+
+def polygon_intersection(first: List[Point], second: List[Point]) -> List[Point]:
+    """Intersects two convex polygons (including degenerate ones) by clipping at the edges of the second."""
+    second = simplify_polygon([(Fraction(x), Fraction(y)) for x, y in second])
+    result = simplify_polygon([(Fraction(x), Fraction(y)) for x, y in first])
+    if not second or not result:
+        return []
+    if len(second) == 1:
+        if len(result) == 1:
+            return result if result == second else []
+        return polygon_intersection(second, result)
+    if len(second) == 2:
+        # the segment lies on the line through it, between its end points
+        (x_start, y_start), (x_end, y_end) = second
+        normal_x, normal_y = y_end - y_start, x_start - x_end
+        bound = normal_x * x_start + normal_y * y_start
+        for clip in ((normal_x, normal_y, bound), (-normal_x, -normal_y, -bound),
+                     (x_end - x_start, y_end - y_start, (x_end - x_start) * x_end + (y_end - y_start) * y_end),
+                     (x_start - x_end, y_start - y_end, (x_start - x_end) * x_start + (y_start - y_end) * y_start)):
+            result = clip_half_plane(result, *clip)
+        return result
+    orientation = 1 if _cross(second[0], second[1], second[2]) > 0 else -1
+    for index in range(len(second)):
+        (x_start, y_start), (x_end, y_end) = second[index], second[(index + 1) % len(second)]
+        # keep the side of the edge facing the interior
+        normal_x, normal_y = orientation * (y_end - y_start), orientation * (x_start - x_end)
+        result = clip_half_plane(result, normal_x, normal_y, normal_x * x_start + normal_y * y_start)
+        if not result:
+            break
+    return result
+
+
+def union_pieces(polygons: List[List[Point]], sign: int = 1) -> List[Tuple[List[Point], int]]:
+    """Decomposes the union of convex polygons into signed convex pieces by inclusion-exclusion."""
+    pieces: List[Tuple[List[Point], int]] = []
+
+    def extend(intersection: List[Point], start: int, piece_sign: int):
+        for index in range(start, len(polygons)):
+            next_intersection = polygon_intersection(intersection, polygons[index])
+            if next_intersection:
+                pieces.append((next_intersection, piece_sign))
+                extend(next_intersection, index + 1, -piece_sign)
+
+    for index, polygon in enumerate(polygons):
+        polygon = simplify_polygon([(Fraction(x), Fraction(y)) for x, y in polygon])
+        if polygon:
+            pieces.append((polygon, sign))
+            extend(polygon, index + 1, -sign)
+    return pieces
+
+
+def region_pieces(union: List[List[Point]], difference: Optional[List[List[Point]]] = None) -> List[Tuple[List[Point], int]]:
+    """
+    Decomposes the region of the union of convex polygons without the union
+    of other convex polygons into signed convex pieces.
+
+    Args:
+        union (List[List[Point]]): The convex polygons whose lattice points are included.
+        difference (Optional[List[List[Point]]]): The convex polygons whose lattice points
+            (including their boundary) are excluded.
+
+    Returns:
+        The pieces with signs +1 or -1, whose signed indicator functions sum up
+        to the indicator function of the region.
+    """
+    pieces = union_pieces(union)
+    if not difference:
+        return pieces
+    for piece, sign in list(pieces):
+        clipped = [polygon_intersection(piece, polygon) for polygon in difference]
+        pieces.extend(union_pieces([part for part in clipped if part], -sign))
+    return pieces
+
+
+def signed_columns(pieces: List[Tuple[List[Point], int]], length1: int,
+                   length2: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Retrieves the columns of signed convex pieces within the index ranges of two lists.
+
+    Args:
+        pieces (List[Tuple[List[Point], int]]): The convex pieces with their signs.
+        length1 (int): The length of the first list (bounding x).
+        length2 (int): The length of the second list (bounding y).
+
+    Returns:
+        The tuples (x, y_min, y_max, sign) of all non-empty columns of the pieces.
+    """
+    columns = []
+    for piece, sign in pieces:
+        for x_index, (y_low, y_high) in sorted(column_intervals(piece).items()):
+            y_low, y_high = max(y_low, 0), min(y_high, length2 - 1)
+            if 0 <= x_index < length1 and y_low <= y_high:
+                columns.append((x_index, y_low, y_high, sign))
+    return columns
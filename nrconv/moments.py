@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+"""This module evaluates weighted convolutions with polynomial weights in one pass.
+
+A weight is a polynomial in the indices x and y of both lists, given either as
+a single monomial (j, k), standing for x^j * y^k, or as a dict mapping
+monomials to integer coefficients.  The output for a weight p is
+
+    conv[s] = sum of list1[x] * list2[y] * p(x, y) over the lattice points (x, y)
+              of the geometry with x + y = s,
+
+which gives moments such as centroids and variances of the geometry.  All
+weights share a single plan: every leaf reads its slices once, transforms each
+weighted slice x^j * list1[x] and y^k * list2[y] once, and combines the
+transforms per monomial, instead of running one full convolution per weight.
+"""
+
+from typing import Dict, List, Sequence, Tuple, Union
+
+from nrconv.buffers import accumulate, as_sequence, max_abs, read_slice
+from nrconv.geometry import Point
+from nrconv.ntt import number_theoretic_transform
+from nrconv.plan import Plan, get_plan_cache
+from nrconv.primes import create_power_of_two, get_prime_cache
+
+Monomial = Tuple[int, int]
+Weight = Union[Monomial, Dict[Monomial, int]]
+
+
+def weight_terms(weight: Weight) -> Dict[Monomial, int]:
+    """Returns the monomials of a weight with their coefficients."""
+    terms = weight if isinstance(weight, dict) else {tuple(weight): 1}
+    for monomial in terms:
+        if len(monomial) != 2 or any(not isinstance(power, int) or power < 0 for power in monomial):
+            raise ValueError(f"A monomial is a pair of nonnegative integer powers, got {monomial!r}")
+    return {(power1, power2): coefficient for (power1, power2), coefficient in terms.items()}
+
+
+def _weighted_slice(values: List[int], start: int, step: int, power: int) -> List[int]:
+    """Multiplies values[t] by (start + t * step)^power."""
+    if power == 0:
+        return values
+    return [value * (start + index * step) ** power for index, value in enumerate(values)]
+
+
+def execute_moment_plan(list1: Sequence[int], list2: Sequence[int], plan: Plan,
+                        monomials: List[Monomial]) -> List[List[int]]:
+    """Evaluates a plan once for all monomials, returning one convolution of size plan.conv_size per monomial."""
+    list1, list2 = as_sequence(list1), as_sequence(list2)
+    powers1 = sorted({power1 for power1, _ in monomials})
+    powers2 = sorted({power2 for _, power2 in monomials})
+    convs = [[0] * plan.conv_size for _ in monomials]
+    if not monomials or not len(list1) or not len(list2):
+        return convs
+
+    # one prime bounds every leaf of every monomial
+    cache = get_prime_cache()
+    ntt_length = 2 * create_power_of_two(max(len(list1), len(list2)))
+    max1, max2 = max_abs(list1), max_abs(list2)
+    max_value = max(max1 * (len(list1) - 1) ** power1 * max2 * (len(list2) - 1) ** power2
+                    for power1, power2 in monomials)
+    prime = cache.ntt_prime(ntt_length, max_value * ntt_length + 1)
+
+    for leaf in plan.leaves:
+        if leaf.kind == "rectangle":
+            size1, size2 = leaf.x_max - leaf.x_min + 1, leaf.y_max - leaf.y_min + 1
+            length = create_power_of_two(leaf.conv_size)
+            values1 = read_slice(list1, leaf.x_min, size1)
+            values2 = read_slice(list2, leaf.y_min, size2)
+            transforms1 = {power: number_theoretic_transform(
+                _weighted_slice(values1, leaf.x_min, 1, power) + [0] * (length - size1), prime, cache=cache)
+                for power in powers1}
+            transforms2 = {power: number_theoretic_transform(
+                _weighted_slice(values2, leaf.y_min, 1, power) + [0] * (length - size2), prime, cache=cache)
+                for power in powers2}
+            for conv, (power1, power2) in zip(convs, monomials):
+                product = [value1 * value2 % prime
+                           for value1, value2 in zip(transforms1[power1], transforms2[power2])]
+                part = number_theoretic_transform(product, prime, inverse=True, cache=cache)[:leaf.conv_size]
+                # map the residues back to the symmetric range, which restores negative values
+                accumulate(conv, leaf.conv_min - plan.conv_min,
+                           [leaf.weight * (value - prime if 2 * value > prime else value) for value in part])
+        else:
+            products = [leaf.weight * value1 * value2 for value1, value2 in
+                        zip(read_slice(list1, leaf.x_start, leaf.count, leaf.x_step),
+                            read_slice(list2, leaf.y_start, leaf.count, leaf.y_step))]
+            for conv, (power1, power2) in zip(convs, monomials):
+                values = _weighted_slice(_weighted_slice(products, leaf.x_start, leaf.x_step, power1),
+                                         leaf.y_start, leaf.y_step, power2)
+                accumulate(conv, leaf.x_start + leaf.y_start - plan.conv_min, values, leaf.x_step + leaf.y_step)
+    return convs
+
+
+def moment_convolutions(list1: Sequence[int], list2: Sequence[int], geometry: List[Point],
+                        weights: List[Weight]) -> Tuple[List[List[int]], int]:
+    """Non-Rectangular Convolutions with polynomial weights, sharing a single decomposition.
+
+    Args:
+        list1 (Sequence[int]): The first list (indexed by x).
+        list2 (Sequence[int]): The second list (indexed by y).
+        geometry (List[Point]): The vertices of a simple polygon, as for non_rectangular_convolution.
+        weights (List[Weight]): The weights, each a monomial (j, k) for x^j * y^k,
+            or a dict mapping monomials to integer coefficients.
+
+    Returns:
+        First, one convolution per weight as a list of integers.
+
+        Second, the offset of the first index shared by all convolutions.
+
+    Raises:
+        ValueError: If a monomial is not a pair of nonnegative integers.
+    """
+
+    terms = [weight_terms(weight) for weight in weights]
+    monomials = sorted({monomial for term in terms for monomial in term})
+    plan = get_plan_cache().plan(geometry)
+    by_monomial = dict(zip(monomials, execute_moment_plan(list1, list2, plan, monomials)))
+    convs = []
+    for term in terms:
+        conv = [0] * plan.conv_size
+        for monomial, coefficient in term.items():
+            conv = [value + coefficient * part for value, part in zip(conv, by_monomial[monomial])]
+        convs.append(conv)
+    return convs, plan.conv_min
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+"""This module implements the number theoretic transform with cached twiddle tables.
+"""
+
+from typing import List, Optional, Sequence
+
+from nrconv.primes import PrimeCache, create_power_of_two, get_prime_cache
+
+
+def number_theoretic_transform(values: Sequence[int], prime: int, inverse: bool = False,
+                               cache: Optional[PrimeCache] = None) -> List[int]:
+    """Computes the (inverse) number theoretic transform of values modulo prime.
+
+    The sequence is zero-padded to the next power of two.  Twiddle factors
+    are taken from the prime cache instead of being recomputed per call.
+
+    Args:
+        values (Sequence[int]): The coefficients to transform.
+        prime (int): A prime of the form m*2^k + 1 with 2^k >= len(values).
+        inverse (bool): Whether to compute the inverse transform.
+        cache (Optional[PrimeCache]): The cache holding the twiddle tables.
+
+    Returns:
+        The transformed sequence as a list of residues modulo prime.
+    """
+
+    if cache is None:
+        cache = get_prime_cache()
+
+    length = create_power_of_two(len(values))
+    coefficients = [value % prime for value in values] + [0] * (length - len(values))
+    if length == 1:
+        return coefficients
+
+    coefficients = [coefficients[index] for index in cache.bit_reversal(length)]
+
+    twiddles = cache.twiddles(prime, length, inverse)
+    half_block = 1
+    while half_block < length:
+        stride = length // (2 * half_block)
+        block_twiddles = twiddles[::stride]
+        for block in range(0, length, 2 * half_block):
+            for offset in range(half_block):
+                low, high = block + offset, block + offset + half_block
+                upper, lower = coefficients[low], coefficients[high] * block_twiddles[offset]
+                coefficients[low], coefficients[high] = (upper + lower) % prime, (upper - lower) % prime
+        half_block = half_block * 2
+
+    if inverse:
+        length_inverse = pow(length, prime - 2, prime)
+        coefficients = [value * length_inverse % prime for value in coefficients]
+    return coefficients
+
+
+def convolution_ntt(list1: Sequence[int], list2: Sequence[int], prime: int,
+                    cache: Optional[PrimeCache] = None) -> List[int]:
+    """Computes the cyclic-free convolution of two lists modulo prime.
+
+    Args:
+        list1 (Sequence[int]): The first list.
+        list2 (Sequence[int]): The second list.
+        prime (int): A prime of the form m*2^k + 1 with 2^k >= len(list1) + len(list2) - 1.
+        cache (Optional[PrimeCache]): The cache holding the twiddle tables.
+
+    Returns:
+        The convolution of the two lists as residues modulo prime.
+    """
+
+    if not list1 or not list2:
+        return []
+    conv_size = len(list1) + len(list2) - 1
+    length = create_power_of_two(conv_size)
+    transform1 = number_theoretic_transform(list(list1) + [0] * (length - len(list1)), prime, cache=cache)
+    transform2 = number_theoretic_transform(list(list2) + [0] * (length - len(list2)), prime, cache=cache)
+    product = [value1 * value2 % prime for value1, value2 in zip(transform1, transform2)]
+    return number_theoretic_transform(product, prime, inverse=True, cache=cache)[:conv_size]
@@ -0,0 +1,950 @@
+#!/usr/bin/python3
+"""This module compiles the decomposition of a geometry into a flat plan of signed leaves.
+
+A plan only depends on the geometry.  Executing it accumulates every leaf
+directly into a single output slice, so no partial slices of intermediate
+decomposition levels are kept alive.
+"""
+
+import os
+import sys
+from contextlib import nullcontext
+from dataclasses import dataclass, fields, replace
+from fractions import Fraction
+from math import ceil, floor, gcd
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from nrconv.boolean import BitPackedSequence, boolean_and, boolean_product
+from nrconv.buffers import accumulate, as_sequence, read_slice, scatter, zero_slice
+from nrconv.convolution import (ConvolutionStep, SPLITTERS, is_integer, non_rectangular_convolution_convex_polygon,
+                                non_rectangular_convolution_edge, non_rectangular_convolution_rectangle,
+                                retrieve_convolution_size)
+from nrconv.fixed import INT64_MAX, as_int64, int64_convolution, slice_int64, slice_max_abs
+from nrconv.geometry import (Point, canonical_geometry, clip_half_plane, geometry_hash, is_convex,
+                             is_diagonal_symmetric, polygon_pieces, rectangle_inscribed_int, region_pieces,
+                             signed_columns)
+from nrconv.ntt import convolution_ntt
+from nrconv.primes import create_ntt_prime, create_power_of_two
+from nrconv.sparse import (SparseIndex, count_nonzero, group_columns, index_bytes, is_sparse, is_sparse_sequence,
+                           ntt_cost, sparse_convolution, sparse_pairs)
+from nrconv.tracing import active_tracer
+from nrconv.verify import VERIFY_ROUNDS, verify_convolution, verify_pieces
+
+# engines evaluating a plan, see execute_plan
+ENGINES = ("auto", "dense", "sparse", "boolean", "int64")
+
+# Values of the boolean and int64 engines take at most 64 bits, so budgets are
+# estimated as for an NTT prime of that size.
+WORD_BOUND = 1 << 64
+
+# Number of NTT-sized buffers alive while a rectangle leaf is evaluated
+# (two transforms, their product and the inverse transform).
+NTT_BUFFERS = 4
+
+
+@dataclass(frozen=True)
+class RectangleLeaf:
+    """All lattice points (x, y) with x_min <= x <= x_max and y_min <= y <= y_max."""
+    x_min: int
+    y_min: int
+    x_max: int
+    y_max: int
+    weight: int  # the signed multiplicity of the leaf
+
+    kind = "rectangle"
+
+    @property
+    def conv_min(self) -> int:
+        return self.x_min + self.y_min
+
+    @property
+    def conv_size(self) -> int:
+        return self.x_max + self.y_max - self.x_min - self.y_min + 1
+
+    @property
+    def bounds(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        return (self.x_min, self.y_min), (self.x_max, self.y_max)
+
+    def memory(self, value_bytes: int) -> int:
+        """Estimates the peak bytes needed to evaluate the leaf."""
+        return NTT_BUFFERS * create_power_of_two(self.conv_size) * value_bytes
+
+    def apply(self, list1: Sequence[int], list2: Sequence[int], conv: List[int], conv_min: int, ntt_prime: int):
+        """Adds weight times the convolution of the leaf onto the slice conv starting at conv_min."""
+        part = convolution_ntt(read_slice(list1, self.x_min, self.x_max - self.x_min + 1),
+                               read_slice(list2, self.y_min, self.y_max - self.y_min + 1), ntt_prime)
+        # map the residues back to the symmetric range, which restores negative values
+        values = [self.weight * (value - ntt_prime if 2 * value > ntt_prime else value) for value in part]
+        accumulate(conv, self.conv_min - conv_min, values)
+
+    def dense_cost(self) -> int:
+        """Estimates the work of apply in accumulated pairs."""
+        return ntt_cost(self.conv_size)
+
+    def sparse_cost(self, index1: SparseIndex, index2: SparseIndex) -> int:
+        """Counts the pairs of nonzero entries visited by apply_sparse."""
+        return index1.count(self.x_min, self.x_max) * index2.count(self.y_min, self.y_max)
+
+    def apply_sparse(self, index1: SparseIndex, index2: SparseIndex, conv: List[int], conv_min: int):
+        """Like apply, but visits the pairs of nonzero entries only."""
+        positions2, values2 = index2.items(self.y_min, self.y_max)
+        if not positions2:
+            return
+        positions1, values1 = index1.items(self.x_min, self.x_max)
+        for x_index, value1 in zip(positions1, values1):
+            scaled = self.weight * value1
+            scatter(conv, [x_index + y_index - conv_min for y_index in positions2],
+                    [scaled * value2 for value2 in values2])
+
+    def apply_boolean(self, packed1: BitPackedSequence, packed2: BitPackedSequence, conv: List[int], conv_min: int):
+        """Like apply for 0/1 lists, counting the pairs by a single product of bit-packed integers."""
+        counts = boolean_product(packed1.slice_bytes(self.x_min, self.x_max - self.x_min + 1),
+                                 packed2.slice_bytes(self.y_min, self.y_max - self.y_min + 1))
+        accumulate(conv, self.conv_min - conv_min, [self.weight * count for count in counts])
+
+    def int64_slices(self, array1: Any, array2: Any) -> Tuple[Any, Any]:
+        """Returns the int64 views of both lists read by the leaf."""
+        return array1[self.x_min:self.x_max + 1], array2[self.y_min:self.y_max + 1]
+
+    def multiplicity(self) -> int:
+        """The maximal number of lattice points of the leaf sharing an output index."""
+        return min(self.x_max - self.x_min, self.y_max - self.y_min) + 1
+
+    def apply_int64(self, values1: Any, values2: Any, max1: int, max2: int, conv: Any, conv_min: int) -> bool:
+        """Like apply on int64 slices and an int64 output, returning False if the leaf needs the exact path."""
+        part = int64_convolution(values1, values2, max1, max2)
+        if part is None:
+            return False
+        offset = self.conv_min - conv_min
+        conv[offset:offset + len(part)] += self.weight * part
+        return True
+
+
+@dataclass(frozen=True)
+class EdgeLeaf:
+    """The count lattice points (x_start + t * x_step, y_start + t * y_step) for 0 <= t < count."""
+    x_start: int
+    y_start: int
+    x_step: int
+    y_step: int
+    count: int
+    weight: int  # the signed multiplicity of the leaf
+
+    kind = "edge"
+
+    @property
+    def conv_min(self) -> int:
+        return self.x_start + self.y_start + min(0, (self.count - 1) * (self.x_step + self.y_step))
+
+    @property
+    def conv_size(self) -> int:
+        return abs((self.count - 1) * (self.x_step + self.y_step)) + 1
+
+    @property
+    def bounds(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        x_end, y_end = self.x_start + (self.count - 1) * self.x_step, self.y_start + (self.count - 1) * self.y_step
+        return (self.x_start, min(self.y_start, y_end)), (x_end, max(self.y_start, y_end))
+
+    def memory(self, _value_bytes: int) -> int:
+        """Edges are accumulated point by point without any buffer."""
+        return 0
+
+    def apply(self, list1: Sequence[int], list2: Sequence[int], conv: List[int], conv_min: int, _ntt_prime: int):
+        """Adds weight times the convolution of the leaf onto the slice conv starting at conv_min."""
+        values1 = read_slice(list1, self.x_start, self.count, self.x_step)
+        values2 = read_slice(list2, self.y_start, self.count, self.y_step)
+        accumulate(conv, self.x_start + self.y_start - conv_min,
+                   [self.weight * value1 * value2 for value1, value2 in zip(values1, values2)],
+                   self.x_step + self.y_step)
+
+    def dense_cost(self) -> int:
+        """Estimates the work of apply in accumulated pairs."""
+        return self.count
+
+    def sparse_cost(self, index1: SparseIndex, index2: SparseIndex) -> int:
+        """Counts the nonzero entries visited by apply_sparse."""
+        if self.x_step == 0:
+            (_, y_low), (_, y_high) = self.bounds
+            return index2.count(y_low, y_high)
+        return index1.count(self.x_start, self.x_start + (self.count - 1) * self.x_step)
+
+    def apply_sparse(self, index1: SparseIndex, index2: SparseIndex, conv: List[int], conv_min: int):
+        """Like apply, but visits the nonzero entries of one list only."""
+        positions, values = [], []
+        if self.x_step == 0:
+            # vertical edges have y_step == 1
+            value1 = index1.value(self.x_start)
+            if value1:
+                for y_index, value2 in zip(*index2.items(self.y_start, self.y_start + self.count - 1)):
+                    positions.append(self.x_start + y_index - conv_min)
+                    values.append(self.weight * value1 * value2)
+        else:
+            x_end = self.x_start + (self.count - 1) * self.x_step
+            for x_index, value1 in zip(*index1.items(self.x_start, x_end)):
+                step, remainder = divmod(x_index - self.x_start, self.x_step)
+                if remainder == 0:
+                    y_index = self.y_start + step * self.y_step
+                    value2 = index2.value(y_index)
+                    if value2:
+                        positions.append(x_index + y_index - conv_min)
+                        values.append(self.weight * value1 * value2)
+        scatter(conv, positions, values)
+
+    def apply_boolean(self, packed1: BitPackedSequence, packed2: BitPackedSequence, conv: List[int], conv_min: int):
+        """Like apply for 0/1 lists, combining both slices by a single bitwise AND."""
+        counts = boolean_and(packed1.slice_bytes(self.x_start, self.count, self.x_step),
+                             packed2.slice_bytes(self.y_start, self.count, self.y_step))
+        accumulate(conv, self.x_start + self.y_start - conv_min, [self.weight * count for count in counts],
+                   self.x_step + self.y_step)
+
+    def int64_slices(self, array1: Any, array2: Any) -> Tuple[Any, Any]:
+        """Returns the int64 values of both lists read by the leaf."""
+        return (slice_int64(array1, self.x_start, self.count, self.x_step),
+                slice_int64(array2, self.y_start, self.count, self.y_step))
+
+    def multiplicity(self) -> int:
+        """The maximal number of lattice points of the leaf sharing an output index."""
+        return self.count if self.x_step + self.y_step == 0 else 1
+
+    def apply_int64(self, values1: Any, values2: Any, _max1: int, _max2: int, conv: Any, conv_min: int) -> bool:
+        """Like apply on int64 slices and an int64 output."""
+        import numpy
+        positions = self.x_start + self.y_start - conv_min + (self.x_step + self.y_step) * numpy.arange(self.count)
+        numpy.add.at(conv, positions, self.weight * values1 * values2)
+        return True
+
+
+Leaf = Union[RectangleLeaf, EdgeLeaf]
+
+
+@dataclass
+class Plan:
+    leaves: List[Leaf]
+    conv_size: int  # size of the convolved sequence
+    conv_min: int  # offset of the convolved sequence
+
+    def leaf_counts(self) -> dict:
+        """Counts the leaves per kind."""
+        counts = {"rectangle": 0, "edge": 0}
+        for leaf in self.leaves:
+            counts[leaf.kind] += 1
+        return counts
+
+
+def rectangle_leaf(geometry: List[Point], weight: int) -> Optional[RectangleLeaf]:
+    """Creates the leaf of an axis-aligned rectangle, or None if it contains no lattice points."""
+    (x_min, y_min), (x_max, y_max) = rectangle_inscribed_int(geometry)
+    if x_min > x_max or y_min > y_max:
+        return None
+    return RectangleLeaf(x_min, y_min, x_max, y_max, weight)
+
+
+def edge_leaf(geometry: List[Point], weight: int) -> Optional[EdgeLeaf]:
+    """Creates the leaf of an edge, or None if it contains no lattice points."""
+    start, end = geometry[0], geometry[1]
+    if (start[0], start[1]) > (end[0], end[1]):
+        start, end = end, start
+
+    # edge is vertical
+    if start[0] == end[0]:
+        y_min, y_max = ceil(start[1]), floor(end[1])
+        if not is_integer(start[0]) or y_min > y_max:
+            return None
+        return EdgeLeaf(ceil(start[0]), y_min, 0, 1, y_max - y_min + 1, weight)
+
+    # primitive integer direction of the edge
+    x_diff, y_diff = end[0] - start[0], end[1] - start[1]
+    scale = x_diff.denominator * y_diff.denominator // gcd(x_diff.denominator, y_diff.denominator)
+    x_step, y_step = int(x_diff * scale), int(y_diff * scale)
+    divisor = gcd(x_step, y_step)
+    x_step, y_step = x_step // divisor, y_step // divisor
+
+    # the first lattice point repeats with period x_step
+    x_min, x_max = ceil(start[0]), floor(end[0])
+    for x_index in range(x_min, min(x_min + x_step, x_max + 1)):
+        y_index = start[1] + (x_index - start[0]) * y_diff / x_diff
+        if is_integer(y_index):
+            return EdgeLeaf(x_index, ceil(y_index), x_step, y_step, (x_max - x_index) // x_step + 1, weight)
+    return None
+
+
+def _collect_leaves(step: ConvolutionStep, weight: int, leaves: List[Leaf]):
+    weight = weight if step.is_positive else -weight
+    if step.function is non_rectangular_convolution_rectangle:
+        leaf = rectangle_leaf(step.geometry, weight)
+    elif step.function is non_rectangular_convolution_edge:
+        leaf = edge_leaf(step.geometry, weight)
+    else:
+        for sub_step in SPLITTERS[step.function](step.geometry):
+            _collect_leaves(sub_step, weight, leaves)
+        return
+    if leaf is not None:
+        leaves.append(leaf)
+
+
+def compile_plan(geometry: List[Point]) -> Plan:
+    """Compiles the decomposition of a convex polygon into signed rectangle and edge leaves.
+
+    Args:
+        geometry (List[Point]): The vertices defining the
+            underlying polygon.
+
+    Returns:
+        The plan, whose leaves sum up to the convolution with the polygon.
+    """
+
+    conv_size, conv_min = retrieve_convolution_size(geometry)
+    leaves: List[Leaf] = []
+    _collect_leaves(ConvolutionStep(geometry, non_rectangular_convolution_convex_polygon, True), 1, leaves)
+    return Plan(leaves, conv_size, conv_min)
+
+
+def merge_leaves(leaves: List[Leaf]) -> List[Leaf]:
+    """Merges identical leaves by summing their weights and drops leaves of weight zero."""
+    weights: Dict[Leaf, int] = {}
+    for leaf in leaves:
+        key = replace(leaf, weight=0)
+        weights[key] = weights.get(key, 0) + leaf.weight
+    return [replace(leaf, weight=weight) for leaf, weight in weights.items() if weight != 0]
+
+
+def compile_signed_plan(pieces: List[Tuple[List[Point], int]]) -> Plan:
+    """Compiles signed convex pieces into a single plan.
+
+    Identical leaves of different pieces (e.g. at shared boundaries) are merged,
+    so that each one is evaluated once.  The output bounds cover all pieces.
+
+    Args:
+        pieces (List[Tuple[List[Point], int]]): Convex polygons (or segments and
+            points) with their signed multiplicities.
+
+    Returns:
+        The plan, whose leaves sum up to the signed sum of the convolutions with the pieces.
+    """
+
+    if not pieces:
+        return Plan([], 0, 0)
+    conv_size, conv_min = retrieve_convolution_size([vertex for piece, _ in pieces for vertex in piece])
+    leaves: List[Leaf] = []
+    for piece, weight in pieces:
+        _collect_leaves(ConvolutionStep(piece, non_rectangular_convolution_convex_polygon, True), weight, leaves)
+    return Plan(merge_leaves(leaves), conv_size, conv_min)
+
+
+def compile_polygon_plan(geometry: List[Point]) -> Plan:
+    """Compiles a plan for a simple, possibly non-convex polygon.
+
+    Convex polygons are compiled as in compile_plan.  Other polygons are
+    triangulated into triangles minus their shared diagonals.
+    """
+
+    if is_convex(geometry):
+        return compile_plan(geometry)
+    plan = compile_signed_plan(polygon_pieces(geometry))
+    plan.conv_size, plan.conv_min = retrieve_convolution_size(geometry)
+    return plan
+
+
+def compile_region_plan(union: List[List[Point]], difference: Optional[List[List[Point]]] = None) -> Plan:
+    """Compiles a plan for a union of convex polygons without another union of convex polygons.
+
+    The region is decomposed by inclusion-exclusion into signed intersections
+    of the polygons, see region_pieces.
+    """
+
+    return compile_signed_plan(region_pieces(union, difference))
+
+
+def compile_symmetric_plan(geometry: List[Point]) -> Plan:
+    """Compiles a plan for the self-convolution of a list with a polygon symmetric about x = y.
+
+    For list1 == list2, the lattice points (x, y) with y < x contribute the same as
+    their mirror images.  So the plan holds the leaves of the half y <= x - 1 with
+    weight 2 plus the leaves of the diagonal edge, and has the output bounds of
+    the whole polygon.
+
+    Args:
+        geometry (List[Point]): The vertices defining the underlying polygon,
+            which has to be symmetric about the diagonal (see is_diagonal_symmetric).
+
+    Returns:
+        The plan, whose leaves sum up to the self-convolution with the polygon.
+    """
+
+    conv_size, conv_min = retrieve_convolution_size(geometry)
+    leaves: List[Leaf] = []
+    half = clip_half_plane(geometry, Fraction(-1), Fraction(1), Fraction(-1))
+    diagonal = clip_half_plane(clip_half_plane(geometry, Fraction(-1), Fraction(1), Fraction(0)),
+                               Fraction(1), Fraction(-1), Fraction(0))
+    for part, weight in ((half, 2), (diagonal, 1)):
+        if part:
+            _collect_leaves(ConvolutionStep(part, non_rectangular_convolution_convex_polygon, True), weight, leaves)
+    return Plan(leaves, conv_size, conv_min)
+
+
+def value_bytes(ntt_prime: int) -> int:
+    """Estimates the bytes of a single value within an NTT buffer (list slot and int object)."""
+    return 8 + sys.getsizeof(ntt_prime)
+
+
+def split_rectangle_leaf(leaf: RectangleLeaf, max_conv_size: int) -> List[RectangleLeaf]:
+    """Splits a rectangle leaf into blocks whose convolutions have at most max_conv_size entries.
+
+    The blocks tile the rectangle along both axes.  Their convolutions overlap
+    in the output and are added up there (overlap-add).
+    """
+
+    width, height = leaf.x_max - leaf.x_min + 1, leaf.y_max - leaf.y_min + 1
+    if width + height - 1 <= max_conv_size:
+        return [leaf]
+    side_sum = max_conv_size + 1
+    block_width = min(width, max(side_sum // 2, side_sum - height))
+    block_height = min(height, side_sum - block_width)
+    return [RectangleLeaf(x_index, y_index,
+                          min(x_index + block_width - 1, leaf.x_max), min(y_index + block_height - 1, leaf.y_max),
+                          leaf.weight)
+            for x_index in range(leaf.x_min, leaf.x_max + 1, block_width)
+            for y_index in range(leaf.y_min, leaf.y_max + 1, block_height)]
+
+
+def budget_leaves(plan: Plan, ntt_prime: int, max_memory: int) -> List[Leaf]:
+    """Splits the leaves of a plan such that each evaluation stays within max_memory bytes.
+
+    Raises:
+        MemoryError: If the output slice alone or a single lattice point exceeds the budget.
+    """
+
+    size = value_bytes(ntt_prime)
+    available = max_memory - plan.conv_size * size
+    if available < NTT_BUFFERS * size:
+        raise MemoryError(f"A memory budget of {max_memory} bytes can't hold an output of size {plan.conv_size}")
+
+    # longest convolution of a rectangle block fitting into the budget
+    max_conv_size = 1
+    while NTT_BUFFERS * 2 * max_conv_size * size <= available:
+        max_conv_size = max_conv_size * 2
+
+    leaves: List[Leaf] = []
+    for leaf in plan.leaves:
+        if leaf.memory(size) > available:
+            leaves.extend(split_rectangle_leaf(leaf, max_conv_size))
+        else:
+            leaves.append(leaf)
+    return leaves
+
+
+# Serialized plans start with PLAN_MAGIC followed by the format version.
+PLAN_MAGIC = b"NRCP"
+PLAN_FORMAT_VERSION = 1
+
+# kind byte of a leaf in a serialized plan
+_LEAF_KINDS = {"rectangle": 0, "edge": 1}
+
+
+def _write_varint(buffer: bytearray, number: int):
+    """Appends a signed integer as a zigzag-encoded LEB128 varint."""
+    number = 2 * number if number >= 0 else -2 * number - 1
+    while number >= 0x80:
+        buffer.append(number & 0x7F | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    """Reads a zigzag-encoded LEB128 varint and returns it with the next position."""
+    number, shift = 0, 0
+    while True:
+        if position >= len(data):
+            raise ValueError("Serialized plan is truncated")
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            break
+    return (number >> 1 if number % 2 == 0 else -(number + 1) // 2), position
+
+
+def serialize_plan(plan: Plan) -> bytes:
+    """Encodes a plan in the compact binary format of version PLAN_FORMAT_VERSION.
+
+    After the magic and the version byte, the output bounds, the number of leaves
+    and the fields of every leaf (preceded by its kind byte) follow as varints.
+    """
+
+    buffer = bytearray(PLAN_MAGIC)
+    buffer.append(PLAN_FORMAT_VERSION)
+    for number in (plan.conv_size, plan.conv_min, len(plan.leaves)):
+        _write_varint(buffer, number)
+    for leaf in plan.leaves:
+        buffer.append(_LEAF_KINDS[leaf.kind])
+        for field in fields(leaf):
+            _write_varint(buffer, getattr(leaf, field.name))
+    return bytes(buffer)
+
+
+def deserialize_plan(data: bytes) -> Plan:
+    """Decodes a plan written by serialize_plan.
+
+    Raises:
+        ValueError: If the data is not a serialized plan of the supported version.
+    """
+
+    if data[:len(PLAN_MAGIC)] != PLAN_MAGIC:
+        raise ValueError("Data is not a serialized plan")
+    position = len(PLAN_MAGIC)
+    if position >= len(data) or data[position] != PLAN_FORMAT_VERSION:
+        raise ValueError(f"Unsupported plan format version, expected {PLAN_FORMAT_VERSION}")
+    position += 1
+
+    header = []
+    for _ in range(3):
+        number, position = _read_varint(data, position)
+        header.append(number)
+    conv_size, conv_min, count = header
+
+    leaves: List[Leaf] = []
+    for _ in range(count):
+        if position >= len(data):
+            raise ValueError("Serialized plan is truncated")
+        leaf_class = {0: RectangleLeaf, 1: EdgeLeaf}.get(data[position])
+        if leaf_class is None:
+            raise ValueError(f"Unknown leaf kind {data[position]}")
+        position += 1
+        values = []
+        for _ in fields(leaf_class):
+            number, position = _read_varint(data, position)
+            values.append(number)
+        leaves.append(leaf_class(*values))
+    if position != len(data):
+        raise ValueError("Serialized plan has trailing data")
+    return Plan(leaves, conv_size, conv_min)
+
+
+class PlanCache:
+    """A cache of compiled plans keyed by the canonical hash of their geometry.
+
+    Plans are compiled from the canonical vertex sequence, so that every
+    rotation and reflection of a vertex list shares one plan.  If a directory
+    is given, plans are stored there as <hash>.plan files and loaded again by
+    later processes instead of being recompiled.
+
+    Args:
+        directory (Optional[str]): The directory backing the cache, or None
+            for an in-memory cache.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._plans: Dict[str, Plan] = {}
+
+    def path(self, key: str) -> str:
+        """Returns the file of the plan with the given geometry hash."""
+        return os.path.join(self.directory, f"{key}.plan")
+
+    def plan(self, geometry: List[Point], symmetric: bool = False) -> Plan:
+        """Returns the plan of a geometry, loading or compiling it on a miss.
+
+        With symmetric set, the plan of a self-convolution with a polygon symmetric
+        about x = y is returned (see compile_symmetric_plan).  Like in
+        non_rectangular_convolution, this only applies to convex polygons.
+        """
+        symmetric = symmetric and is_convex(geometry)
+        key = geometry_hash(geometry) + ("-symmetric" if symmetric else "")
+        if key in self._plans:
+            return self._plans[key]
+
+        plan = None
+        if self.directory is not None and os.path.exists(self.path(key)):
+            try:
+                with open(self.path(key), "rb") as file:
+                    plan = deserialize_plan(file.read())
+            except ValueError:
+                plan = None  # stale format, compile again
+        if plan is None:
+            compile_function = compile_symmetric_plan if symmetric else compile_polygon_plan
+            plan = compile_function(canonical_geometry(geometry))
+            if self.directory is not None:
+                self.save(key, plan)
+        self._plans[key] = plan
+        return plan
+
+    def plans(self, geometries: List[List[Point]]) -> List[Plan]:
+        """Returns the plans of many geometries, compiling all misses in one batch (see compile_plans).
+
+        Without NumPy, the misses are compiled one by one.
+        """
+        keys = [geometry_hash(geometry) for geometry in geometries]
+        misses = {}
+        for key, geometry in zip(keys, geometries):
+            if key in self._plans or key in misses:
+                continue
+            if self.directory is not None and os.path.exists(self.path(key)):
+                self.plan(geometry)
+            else:
+                misses[key] = canonical_geometry(geometry)
+        if misses:
+            try:
+                from nrconv.vectorized import compile_plans
+                compiled = compile_plans(list(misses.values()))
+            except ImportError:
+                compiled = [compile_polygon_plan(geometry) for geometry in misses.values()]
+            for key, plan in zip(misses, compiled):
+                if self.directory is not None:
+                    self.save(key, plan)
+                self._plans[key] = plan
+        return [self._plans[key] for key in keys]
+
+    def save(self, key: str, plan: Plan):
+        """Writes a plan to the directory of the cache."""
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(serialize_plan(plan))
+        os.replace(temporary, self.path(key))
+
+
+_PLAN_CACHE: Optional[PlanCache] = None
+
+
+def get_plan_cache() -> PlanCache:
+    """Returns the process-wide plan cache.
+
+    The cache is persisted to the directory named by the environment variable
+    NRCONV_PLAN_CACHE, if it is set.
+    """
+
+    global _PLAN_CACHE
+    if _PLAN_CACHE is None:
+        _PLAN_CACHE = PlanCache(os.environ.get("NRCONV_PLAN_CACHE"))
+    return _PLAN_CACHE
+
+
+def _prepare_output(conv_size: int, out: Optional[Any]) -> Any:
+    if out is None:
+        return [0] * conv_size
+    if len(out) < conv_size:
+        raise IndexError(f"Can't write a convolution of size {conv_size} into an output of size {len(out)}")
+    zero_slice(out, conv_size)
+    return out
+
+
+def _sparse_indices(list1: Sequence[int], list2: Sequence[int], engine: str = "sparse",
+                    max_memory: Optional[int] = None) -> Optional[Tuple[SparseIndex, SparseIndex]]:
+    """Builds the sparse indices of both lists, or returns None if engine "auto" evaluates densely.
+
+    The density and the size of the indices are taken from scans which keep no
+    positions, so a dense input is never indexed under "auto".
+
+    Raises:
+        MemoryError: If engine is "sparse" and the indices exceed max_memory.
+    """
+    lists = [list1] if list2 is list1 else [list1, list2]
+    if engine == "auto" and not any(is_sparse_sequence(values) for values in lists):
+        return None
+    if max_memory is not None:
+        required = index_bytes(sum(count_nonzero(values) for values in lists))
+        if required > max_memory:
+            if engine == "auto":
+                return None
+            raise MemoryError(f"A memory budget of {max_memory} bytes can't hold sparse indices of {required} bytes")
+    index1 = SparseIndex(list1)
+    return index1, index1 if list2 is list1 else SparseIndex(list2)
+
+
+def _remaining_memory(max_memory: Optional[int], indices: Optional[Tuple[SparseIndex, SparseIndex]]) -> Optional[int]:
+    """Returns the part of a budget left besides the sparse indices."""
+    if max_memory is None or indices is None:
+        return max_memory
+    index1, index2 = indices
+    entries = len(index1.positions) + (0 if index2 is index1 else len(index2.positions))
+    return max_memory - index_bytes(entries)
+
+
+def _packed_sequences(list1: Sequence[int], list2: Sequence[int]) -> Tuple[BitPackedSequence, BitPackedSequence]:
+    packed1 = BitPackedSequence(list1)
+    return packed1, packed1 if list2 is list1 else BitPackedSequence(list2)
+
+
+def _execute_boolean(list1: Sequence[int], list2: Sequence[int], plan: Plan, max_memory: Optional[int],
+                     out: Optional[Any]) -> Tuple[Any, int]:
+    packed = _packed_sequences(list1, list2)
+    leaves = plan.leaves if max_memory is None else budget_leaves(plan, WORD_BOUND, max_memory)
+    conv = _prepare_output(plan.conv_size, out)
+
+    tracer = active_tracer()
+    for leaf in leaves:
+        if tracer is None:
+            leaf.apply_boolean(*packed, conv, plan.conv_min)
+            continue
+        with tracer.span(leaf.kind, leaf.bounds, leaf.conv_size, leaf.weight):
+            tracer.annotate(engine="boolean")
+            leaf.apply_boolean(*packed, conv, plan.conv_min)
+    return conv, plan.conv_min
+
+
+def _execute_int64(list1: Sequence[int], list2: Sequence[int], plan: Plan, ntt_prime: Optional[int],
+                   max_memory: Optional[int], out: Optional[Any]) -> Tuple[Any, int]:
+    """Executes a plan in int64 arithmetic, falling back to the exact engine where it might overflow."""
+    try:
+        import numpy
+    except ImportError:
+        return execute_plan(list1, list2, plan, ntt_prime, max_memory, out, "dense")
+    array1 = as_int64(as_sequence(list1))
+    array2 = array1 if list2 is list1 else as_int64(as_sequence(list2))
+    if array1 is None or array2 is None:
+        return execute_plan(list1, list2, plan, ntt_prime, max_memory, out, "dense")
+
+    leaves = plan.leaves if max_memory is None else budget_leaves(plan, WORD_BOUND, max_memory)
+    slices = [leaf.int64_slices(array1, array2) for leaf in leaves]
+    maxima = [(slice_max_abs(values1), slice_max_abs(values2)) for values1, values2 in slices]
+    # every partial sum of an output entry is bounded by the sum of the leaf bounds
+    bound = sum(abs(leaf.weight) * max1 * max2 * leaf.multiplicity() for leaf, (max1, max2) in zip(leaves, maxima))
+    if bound > INT64_MAX:
+        return execute_plan(list1, list2, plan, ntt_prime, max_memory, out, "dense")
+
+    conv = numpy.zeros(plan.conv_size, dtype=numpy.int64)
+    tracer = active_tracer()
+    for leaf, (values1, values2), (max1, max2) in zip(leaves, slices, maxima):
+        span = nullcontext() if tracer is None else tracer.span(leaf.kind, leaf.bounds, leaf.conv_size, leaf.weight)
+        with span:
+            if leaf.apply_int64(values1, values2, max1, max2, conv, plan.conv_min):
+                if tracer is not None:
+                    tracer.annotate(engine="int64")
+                continue
+            # the leaf is too large for an exact FFT in double precision
+            if ntt_prime is None:
+                ntt_prime = create_ntt_prime(list1, list2)
+            part = [0] * leaf.conv_size
+            leaf.apply(list1, list2, part, leaf.conv_min, ntt_prime)
+            offset = leaf.conv_min - plan.conv_min
+            conv[offset:offset + leaf.conv_size] += numpy.array(part, dtype=numpy.int64)
+            if tracer is not None:
+                tracer.annotate(engine="dense", ntt_length=create_power_of_two(leaf.conv_size))
+
+    if out is None:
+        return conv.tolist(), plan.conv_min
+    _prepare_output(plan.conv_size, out)
+    out[:plan.conv_size] = conv if hasattr(out, "dtype") else conv.tolist()
+    return out, plan.conv_min
+
+
+def execute_plan(list1: Sequence[int], list2: Sequence[int], plan: Plan,
+                 ntt_prime: Optional[int] = None, max_memory: Optional[int] = None,
+                 out: Optional[Any] = None, engine: str = "auto",
+                 indices: Optional[Tuple[SparseIndex, SparseIndex]] = None) -> Tuple[Any, int]:
+    """Executes a plan by accumulating all its leaves into a single output slice.
+
+    Args:
+        list1 (Sequence[int]): The first list (or NumPy array, memory map, buffer).
+        list2 (Sequence[int]): The second list (or NumPy array, memory map, buffer).
+        plan (Plan): The compiled plan.
+        ntt_prime (Optional[int]): The prime for the number theoretic transform
+            (created from the lists if omitted).
+        max_memory (Optional[int]): A budget in bytes for the output slice plus
+            the buffers of the leaf currently evaluated.  Oversized rectangle leaves
+            are split into blocks.  Without a budget, leaves are evaluated as compiled.
+        out (Optional[Any]): A list or (memory-mapped) NumPy array with at least
+            plan.conv_size entries, which receives the convolution.
+        engine (str): "dense" evaluates every leaf by NTT or point by point,
+            "sparse" visits the nonzero entries only, and "auto" picks the cheaper
+            one per leaf if one of the lists is sparse (see SPARSE_DENSITY).
+            "boolean" requires 0/1 lists, packs them into bits and counts the
+            pairs per output index with bitwise operations (ntt_prime is unused).
+            "int64" evaluates the leaves in NumPy int64 arithmetic if a magnitude
+            bound excludes overflows, and falls back to "dense" otherwise.
+        indices (Optional[Tuple[SparseIndex, SparseIndex]]): The sparse indices
+            of both lists, if already built.
+
+    Returns:
+        First, the convolution of the two lists with the given
+            base geometry as a list of integers (or out, if given).
+
+        Second, the offset of the first index of the convolution.
+    """
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine == "boolean":
+        return _execute_boolean(list1, list2, plan, max_memory, out)
+    if engine == "int64":
+        return _execute_int64(list1, list2, plan, ntt_prime, max_memory, out)
+    list1, list2 = as_sequence(list1), as_sequence(list2)
+    if engine != "dense" and indices is None:
+        indices = _sparse_indices(list1, list2, engine, max_memory)
+    if engine == "auto" and (indices is None or not is_sparse(*indices)):
+        engine = "dense"
+    max_memory = _remaining_memory(max_memory, indices)
+    if ntt_prime is None and engine != "sparse":
+        ntt_prime = create_ntt_prime(list1, list2)
+    if max_memory is None:
+        leaves = plan.leaves
+    elif engine == "sparse":
+        leaves = plan.leaves
+        if plan.conv_size * value_bytes(0) > max_memory:
+            raise MemoryError(f"A memory budget of {max_memory} bytes can't hold an output of size {plan.conv_size}")
+    else:
+        leaves = budget_leaves(plan, ntt_prime, max_memory)
+    conv = _prepare_output(plan.conv_size, out)
+
+    tracer = active_tracer()
+    for leaf in leaves:
+        sparse = engine == "sparse" or (engine == "auto" and leaf.sparse_cost(*indices) < leaf.dense_cost())
+        if tracer is None:
+            if sparse:
+                leaf.apply_sparse(*indices, conv, plan.conv_min)
+            else:
+                leaf.apply(list1, list2, conv, plan.conv_min, ntt_prime)
+            continue
+        with tracer.span(leaf.kind, leaf.bounds, leaf.conv_size, leaf.weight):
+            if sparse:
+                tracer.annotate(engine="sparse")
+                leaf.apply_sparse(*indices, conv, plan.conv_min)
+                continue
+            if leaf.kind == "rectangle":
+                tracer.annotate(ntt_length=create_power_of_two(leaf.conv_size))
+            leaf.apply(list1, list2, conv, plan.conv_min, ntt_prime)
+    return conv, plan.conv_min
+
+
+def execute_pieces(list1: Sequence[int], list2: Sequence[int], pieces: List[Tuple[List[Point], int]],
+                   compile_function: Callable[[], Plan], ntt_prime: Optional[int] = None,
+                   max_memory: Optional[int] = None, out: Optional[Any] = None,
+                   engine: str = "auto") -> Tuple[Any, int]:
+    """Evaluates the convolution with a region given by signed convex pieces.
+
+    With a sparse list, the pairs of nonzero entries are visited column by column
+    of the pieces, if this is estimated to be cheaper than a single dense transform
+    of the whole output.  Otherwise, the plan returned by compile_function is
+    executed, whose leaves still choose their engine (see execute_plan).
+    The other arguments are those of execute_plan.
+    """
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine in ("dense", "boolean", "int64"):
+        return execute_plan(list1, list2, compile_function(), ntt_prime, max_memory, out, engine)
+
+    list1, list2 = as_sequence(list1), as_sequence(list2)
+    indices = _sparse_indices(list1, list2, engine, max_memory)
+    if indices is None:
+        return execute_plan(list1, list2, compile_function(), ntt_prime, max_memory, out, "dense")
+
+    conv_size, conv_min = retrieve_convolution_size([vertex for piece, _ in pieces for vertex in piece])
+    columns = group_columns(signed_columns(pieces, len(list1), len(list2)))
+    if engine == "auto" and sparse_pairs(*indices, columns) >= ntt_cost(conv_size):
+        return execute_plan(list1, list2, compile_function(), ntt_prime, max_memory, out, engine, indices)
+
+    max_memory = _remaining_memory(max_memory, indices)
+    if max_memory is not None and conv_size * value_bytes(0) > max_memory:
+        raise MemoryError(f"A memory budget of {max_memory} bytes can't hold an output of size {conv_size}")
+    conv = _prepare_output(conv_size, out)
+    tracer = active_tracer()
+    if tracer is None:
+        sparse_convolution(*indices, columns, conv, conv_min)
+    else:
+        with tracer.span("sparse_columns", size=conv_size):
+            sparse_convolution(*indices, columns, conv, conv_min)
+    return conv, conv_min
+
+
+def non_rectangular_convolution(list1: Sequence[int], list2: Sequence[int], geometry: List[Point],
+                                ntt_prime: Optional[int] = None,
+                                max_memory: Optional[int] = None,
+                                out: Optional[Any] = None,
+                                verify: Union[bool, int] = False,
+                                engine: str = "auto",
+                                cache: Optional[Any] = None) -> Tuple[Any, int]:
+    """Non-Rectangular Convolution of an arbitrary simple polygon via a compiled plan.
+    All edges are included.
+
+    Non-convex polygons are triangulated, see compile_polygon_plan.
+    A self-convolution (list1 is list2) with a polygon symmetric about x = y
+    only evaluates half of the polygon, see compile_symmetric_plan.
+
+    Args:
+        list1 (Sequence[int]): The first list (or NumPy array, memory map, buffer).
+        list2 (Sequence[int]): The second list (or NumPy array, memory map, buffer).
+        geometry (List[Point]): The vertices defining the
+            underlying polygon.
+        ntt_prime (Optional[int]): The prime for the number theoretic transform
+            (created from the lists if omitted).
+        max_memory (Optional[int]): A budget in bytes, see execute_plan.
+        out (Optional[Any]): An output array receiving the convolution, see execute_plan.
+        verify (Union[bool, int]): Checks the result with randomized fingerprints,
+            see verify_convolution (True for VERIFY_ROUNDS checks, or the number of checks).
+        engine (str): "auto", "dense", "sparse", "boolean" or "int64", see execute_plan.
+        cache (Optional[ResultCache]): A cache answering repeated requests, see
+            nrconv.cache.ResultCache (the result is copied into out, if given).
+
+    Returns:
+        First, the convolution of the two lists with the given
+            base geometry as a list of integers (or out, if given).
+
+        Second, the offset of the first index of the convolution.
+
+    Raises:
+        VerificationError: If verify is set and the result does not match the geometry.
+    """
+
+    if not is_convex(geometry):
+        compile_function = compile_polygon_plan
+    elif list1 is list2 and is_diagonal_symmetric(geometry):
+        compile_function = compile_symmetric_plan
+    else:
+        compile_function = compile_plan
+    if cache is None:
+        conv, conv_min = execute_pieces(list1, list2, polygon_pieces(geometry), lambda: compile_function(geometry),
+                                        ntt_prime, max_memory, out, engine)
+    else:
+        conv, conv_min = cache.convolve(list1, list2, geometry, lambda: execute_pieces(
+            list1, list2, polygon_pieces(geometry), lambda: compile_function(geometry), ntt_prime, max_memory,
+            None, engine), ntt_prime)
+        if out is not None:
+            values, conv = conv, _prepare_output(len(conv), out)
+            accumulate(conv, 0, values)
+    if verify:
+        conv_size, _ = retrieve_convolution_size(geometry)
+        rounds = VERIFY_ROUNDS if verify is True else verify
+        verify_convolution(list1, list2, geometry, conv if out is None else conv[:conv_size], conv_min, rounds)
+    return conv, conv_min
+
+
+def non_rectangular_convolution_region(list1: Sequence[int], list2: Sequence[int], union: List[List[Point]],
+                                       difference: Optional[List[List[Point]]] = None,
+                                       ntt_prime: Optional[int] = None,
+                                       max_memory: Optional[int] = None,
+                                       out: Optional[Any] = None,
+                                       verify: Union[bool, int] = False,
+                                       engine: str = "auto") -> Tuple[Any, int]:
+    """Non-Rectangular Convolution of a union of convex polygons without the lattice
+    points of another union of convex polygons, evaluated as a single plan.
+
+    Args:
+        list1 (Sequence[int]): The first list (or NumPy array, memory map, buffer).
+        list2 (Sequence[int]): The second list (or NumPy array, memory map, buffer).
+        union (List[List[Point]]): The convex polygons whose lattice points are included.
+        difference (Optional[List[List[Point]]]): The convex polygons whose lattice
+            points (including their boundary) are excluded.
+        ntt_prime (Optional[int]): The prime for the number theoretic transform
+            (created from the lists if omitted).
+        max_memory (Optional[int]): A budget in bytes, see execute_plan.
+        out (Optional[Any]): An output array receiving the convolution, see execute_plan.
+        verify (Union[bool, int]): Checks the result with randomized fingerprints.
+        engine (str): "auto", "dense", "sparse", "boolean" or "int64", see execute_plan.
+
+    Returns:
+        First, the convolution of the two lists with the region
+            as a list of integers (or out, if given).
+
+        Second, the offset of the first index of the convolution.
+    """
+
+    pieces = region_pieces(union, difference)
+    conv, conv_min = execute_pieces(list1, list2, pieces, lambda: compile_signed_plan(pieces),
+                                    ntt_prime, max_memory, out, engine)
+    if verify:
+        conv_size, _ = retrieve_convolution_size([vertex for piece, _ in pieces for vertex in piece])
+        rounds = VERIFY_ROUNDS if verify is True else verify
+        verify_pieces(list1, list2, pieces, conv if out is None else conv[:conv_size], conv_min, rounds)
+    return conv, conv_min
@@ -2,9 +2,33 @@
 """A module to create suitable primes for the NTT.
 """
 
-from typing import List
+import json
+import os
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
 
-import sympy
+from nrconv.buffers import max_abs
+
+# Well-known NTT primes c * 2^k + 1 as triples (c, k, primitive root).
+# The first block lists the classic primes, the second one is a ladder
+# covering magnitude bounds of up to 132 bits.
+NTT_PRIMES: List[Tuple[int, int, int]] = [
+    (3, 18, 10), (7, 20, 3), (5, 25, 3), (119, 23, 3), (45, 24, 11),
+    (7, 26, 3), (15, 27, 31), (3, 30, 5), (13, 28, 3),
+    (27, 56, 5), (29, 57, 3),
+    (9, 17, 19), (11, 21, 3), (23, 29, 5), (9, 33, 7),
+    (15, 37, 7), (21, 41, 11), (35, 45, 3), (15, 48, 19), (177, 48, 5),
+    (2067, 48, 5), (32817, 48, 10), (524305, 48, 3), (8388633, 48, 26),
+    (134217907, 48, 3), (2147483683, 48, 3), (34359738481, 48, 3),
+    (549755814111, 48, 11), (8796093022291, 48, 3), (140737488355387, 48, 3),
+    (2251799813685277, 48, 3), (36028797018963985, 48, 3),
+    (576460752303423507, 48, 7), (9223372036854775867, 48, 3),
+    (147573952589676413017, 48, 3), (2361183241434822606901, 48, 3),
+    (37778931862957161709803, 48, 7), (604462909807314587353275, 48, 11),
+    (9671406556917033397649463, 48, 13),
+]
+
+PRIME_CACHE_VERSION = 1
 
 
 def create_power_of_two(number: int) -> int:
@@ -15,26 +39,247 @@ def create_power_of_two(number: int) -> int:
     return power
 
 
+def _create_sieve_primes(limit: int) -> List[int]:
+    """Creates all primes below limit with a sieve of Eratosthenes."""
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = b"\x00\x00"
+    for number in range(2, int(limit ** 0.5) + 1):
+        if sieve[number]:
+            sieve[number * number::number] = bytes(len(range(number * number, limit, number)))
+    return [number for number in range(limit) if sieve[number]]
+
+
+# Small primes used to pre-filter candidates of an arithmetic progression.
+SIEVE_PRIMES = _create_sieve_primes(1 << 12)
+
+# Bases for which Miller-Rabin is deterministic below MILLER_RABIN_LIMIT.
+MILLER_RABIN_BASES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+MILLER_RABIN_LIMIT = 3317044064679887385961981
+
+# Pairs (limit, number of bases): the first bases suffice below the limit.
+MILLER_RABIN_BOUNDS = [(3215031751, 4), (3474749660383, 6), (3825123056546413051, 9),
+                       (318665857834031151167461, 12), (MILLER_RABIN_LIMIT, 13)]
+
+
+def miller_rabin(number: int) -> bool:
+    """Checks if number is a prime with the Miller-Rabin test.
+
+    The test is deterministic below MILLER_RABIN_LIMIT.  Larger numbers
+    are handed over to sympy's Baillie-PSW test.
+    """
+
+    if number < 2:
+        return False
+    for base in MILLER_RABIN_BASES:
+        if number % base == 0:
+            return number == base
+    if number >= MILLER_RABIN_LIMIT:
+        from sympy.ntheory.primetest import isprime
+        return isprime(number)
+
+    number_bases = next(count for limit, count in MILLER_RABIN_BOUNDS if number < limit)
+    odd_part, exponent = number - 1, 0
+    while odd_part % 2 == 0:
+        odd_part, exponent = odd_part // 2, exponent + 1
+    for base in MILLER_RABIN_BASES[:number_bases]:
+        witness = pow(base, odd_part, number)
+        if witness in (1, number - 1):
+            continue
+        for _ in range(exponent - 1):
+            witness = witness * witness % number
+            if witness == number - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def create_mod_primes(base: int, mod: int, min_prime: int = 0, count: int = 1) -> List[int]:
+    """Creates the count smallest primes >= min_prime with prime % base == mod.
+
+    The candidates base*k + mod are processed in segments.  Within a segment,
+    all candidates with a factor in SIEVE_PRIMES are crossed out in bulk
+    (a sieve of Eratosthenes over the arithmetic progression), and only the
+    remaining ones are tested with Miller-Rabin.  For details see the appendix of:
+    https://drops.dagstuhl.de/opus/volltexte/2020/11891/pdf/LIPIcs-STACS-2020-30.pdf
+
+    Several consecutive primes are useful for a multi-prime CRT.
+    """
+
+    first_candidate = base + mod
+    if first_candidate < min_prime:
+        diff_number_bases = (min_prime - first_candidate + base - 1) // base
+        first_candidate = first_candidate + diff_number_bases * base
+
+    # the segment initially covers the expected distance of count primes
+    segment_size = create_power_of_two(count * first_candidate.bit_length())
+    sieve_primes = [sieve_prime for sieve_prime in SIEVE_PRIMES[:bisect_left(SIEVE_PRIMES, 2 * segment_size)]
+                    if base % sieve_prime != 0]
+    # next_indices[i]: the first index k with first_candidate + base*k == 0 (mod sieve_primes[i])
+    next_indices = [-first_candidate * pow(base, -1, sieve_prime) % sieve_prime for sieve_prime in sieve_primes]
+
+    primes: List[int] = []
+    while len(primes) < count:
+        sieve = bytearray([1]) * segment_size
+        for number, sieve_prime in enumerate(sieve_primes):
+            index = next_indices[number]
+            # the sieve prime itself is not crossed out
+            start = index + sieve_prime if first_candidate + index * base == sieve_prime else index
+            if start < segment_size:
+                sieve[start::sieve_prime] = bytes(len(range(start, segment_size, sieve_prime)))
+            next_indices[number] = (index - segment_size) % sieve_prime
+
+        for index in range(segment_size):
+            if sieve[index] and miller_rabin(first_candidate + index * base):
+                primes.append(first_candidate + index * base)
+                if len(primes) == count:
+                    break
+
+        first_candidate = first_candidate + segment_size * base
+    return primes
+
+
 def create_mod_prime(base: int, mod: int, min_prime: int = 0) -> int:
     """Creates a prime >= min_prime with prime % base == mod.
 
-    This algorithm might be improvable with an adapted sieve
-    of Eratosthenes:  For details see the appendix of:
-    https://drops.dagstuhl.de/opus/volltexte/2020/11891/pdf/LIPIcs-STACS-2020-30.pdf
+    See create_mod_primes for the underlying segmented sieve.
     Also, random numbers might be helpful.  For details see section 2.3 of:
     https://epubs.siam.org/doi/pdf/10.1137/100811167
     """
 
-    prime_candidate = base + mod
-    if prime_candidate < min_prime:
-        diff_number_bases = (min_prime - prime_candidate + base - 1) // base
-        prime_candidate = prime_candidate + diff_number_bases * base
-    while not sympy.ntheory.primetest.isprime(prime_candidate):
-        prime_candidate = prime_candidate + base
-    return prime_candidate
+    return create_mod_primes(base, mod, min_prime)[0]
+
+
+def random_prime(bits: int, rng) -> int:
+    """Creates the smallest prime above a random number with the given bit length."""
+    return create_mod_prime(2, 1, rng.getrandbits(bits) | 1 << (bits - 1))
+
+
+class PrimeCache:
+    """A cache for NTT primes, primitive roots and twiddle tables.
+
+    Primes are looked up by (transform length, magnitude bound).  The cache is
+    seeded from NTT_PRIMES, so that the prime search of create_mod_prime is
+    only needed for bounds beyond the bundled table.  If a path is given,
+    primes and primitive roots found by a search are persisted there as JSON
+    and loaded again by later processes.
+
+    Args:
+        path (Optional[str]): The file backing the cache, or None for
+            an in-memory cache.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._roots: Dict[int, int] = {}
+        self._primes: Dict[Tuple[int, int], int] = {}
+        self._twiddles: Dict[Tuple[int, int, bool], List[int]] = {}
+        self._bit_reversals: Dict[int, List[int]] = {}
+        for factor, exponent, root in NTT_PRIMES:
+            self._roots[factor * 2 ** exponent + 1] = root
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def ntt_prime(self, ntt_length: int, max_value: int) -> int:
+        """Returns the smallest known prime p >= max_value with p % ntt_length == 1.
+
+        If no known prime qualifies, a new one is searched and remembered.
+        """
+
+        key = (ntt_length, max_value)
+        if key in self._primes:
+            return self._primes[key]
+
+        candidates = [prime for prime in self._roots
+                      if prime >= max_value and (prime - 1) % ntt_length == 0]
+        if candidates:
+            self._primes[key] = min(candidates)
+        else:
+            prime = create_mod_prime(ntt_length, 1, max_value)
+            self.primitive_root(prime)
+            self._primes[key] = prime
+            if self.path is not None:
+                self.save()
+        return self._primes[key]
+
+    def primitive_root(self, prime: int) -> int:
+        """Returns a primitive root modulo the given prime."""
+        if prime not in self._roots:
+            from sympy.ntheory.residue_ntheory import primitive_root
+            self._roots[prime] = primitive_root(prime)
+        return self._roots[prime]
+
+    def twiddles(self, prime: int, length: int, inverse: bool = False) -> List[int]:
+        """Returns the powers w^0, ..., w^(length/2 - 1) of a primitive length-th root of unity w.
+
+        Raises:
+            ValueError: If the prime does not support a transform of the given length.
+        """
+
+        key = (prime, length, inverse)
+        if key not in self._twiddles:
+            if (prime - 1) % length:
+                raise ValueError(f"Prime {prime} is not of the form m*{length} + 1")
+            root = pow(self.primitive_root(prime), (prime - 1) // length, prime)
+            if inverse:
+                root = pow(root, prime - 2, prime)
+            table = [1] * max(length // 2, 1)
+            for index in range(1, length // 2):
+                table[index] = table[index - 1] * root % prime
+            self._twiddles[key] = table
+        return self._twiddles[key]
+
+    def bit_reversal(self, length: int) -> List[int]:
+        """Returns the bit-reversal permutation of range(length) for a power of two length."""
+        if length not in self._bit_reversals:
+            permutation = [0] * length
+            for index in range(1, length):
+                permutation[index] = (permutation[index >> 1] >> 1) | ((index & 1) * (length >> 1))
+            self._bit_reversals[length] = permutation
+        return self._bit_reversals[length]
+
+    def load(self, path: str):
+        """Merges primes and primitive roots stored at path into the cache."""
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != PRIME_CACHE_VERSION:
+            return
+        for prime, root in data["roots"]:
+            self._roots[prime] = root
+        for ntt_length, max_value, prime in data["primes"]:
+            self._primes[(ntt_length, max_value)] = prime
+
+    def save(self, path: Optional[str] = None):
+        """Writes primes and primitive roots to path (default: the cache's own path)."""
+        path = self.path if path is None else path
+        data = {
+            "version": PRIME_CACHE_VERSION,
+            "roots": sorted([prime, root] for prime, root in self._roots.items()),
+            "primes": sorted([length, bound, prime] for (length, bound), prime in self._primes.items()),
+        }
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+
+
+_PRIME_CACHE: Optional[PrimeCache] = None
+
+
+def get_prime_cache() -> PrimeCache:
+    """Returns the process-wide prime cache.
+
+    The cache is persisted to the file named by the environment variable
+    NRCONV_PRIME_CACHE, if it is set.
+    """
+
+    global _PRIME_CACHE
+    if _PRIME_CACHE is None:
+        _PRIME_CACHE = PrimeCache(os.environ.get("NRCONV_PRIME_CACHE"))
+    return _PRIME_CACHE
 
 
-def create_ntt_prime(list1: List[int], list2: List[int]) -> int:
+def create_ntt_prime(list1: List[int], list2: List[int], cache: Optional[PrimeCache] = None) -> int:
     """Creates a suitable prime for the NTT.
 
     The prime is of the form m*2^k + 1, where 2^k is the length of the NTT.
@@ -43,9 +288,9 @@ def create_ntt_prime(list1: List[int], list2: List[int]) -> int:
     """
 
     ntt_length = 2 * create_power_of_two(max(len(list1), len(list2)))
-    max_list1_abs = max(abs(max(list1)), abs(min(list1)))
-    max_list2_abs = max(abs(max(list2)), abs(min(list2)))
-    max_value = max_list1_abs * max_list2_abs * ntt_length + 1
+    max_value = max_abs(list1) * max_abs(list2) * ntt_length + 1
 
-    prime = create_mod_prime(ntt_length, 1, max_value)
+    if cache is None:
+        cache = get_prime_cache()
+    prime = cache.ntt_prime(ntt_length, max_value)
     return prime
@@ -0,0 +1,491 @@
+#!/usr/bin/python3
+"""A local asyncio service computing non-rectangular convolutions for other processes.
+
+Processes that share a machine send their convolutions to one server instead
+of embedding the library, so that imports, NTT primes, twiddle tables and
+compiled plans are only paid once.  The server keeps a pool of warm worker
+processes, which load primes and plans from a shared cache directory (see
+PrimeCache and PlanCache) and keep their twiddle tables in memory.
+Requests with the same geometry that arrive within batch_delay seconds are
+coalesced into one batch, which a single worker runs with one plan lookup.
+
+Every message is a frame: the lengths of a JSON header and a binary payload
+as two big-endian uint32, followed by both.  A convolution request
+    {"id": 1, "op": "convolve", "geometry": [[0, 0], ["7/2", 0], [0, 3]],
+     "dtype": "<i8", "length1": 5, "engine": "auto"}
+carries the raw entries of list1 followed by those of list2 as payload.  The
+answer {"id": 1, "conv_min": 0, "dtype": "<i8"} carries the convolution as
+little-endian int64, or as comma-separated decimals (dtype "decimal") if it
+doesn't fit.  {"id": 2, "op": "metrics"} returns queue depth, batch and
+latency statistics.  Failed requests are answered with {"id": ..., "error": ...}.
+
+The server runs on a Unix socket or a local TCP port:
+    python -m nrconv.service --unix /tmp/nrconv.sock --workers 4 --cache-directory ~/.nrconv
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from nrconv.cli import parse_geometry, plan_cache
+from nrconv.fixed import INT64_MAX, INT64_MIN
+from nrconv.geometry import Point, geometry_hash
+from nrconv.plan import ENGINES, execute_plan
+from nrconv.primes import PrimeCache, create_ntt_prime
+
+# frame header: lengths of the JSON header and of the payload
+FRAME = struct.Struct(">II")
+
+# default time in seconds a request waits for others with the same geometry
+BATCH_DELAY = 0.002
+
+# default maximal number of requests per batch
+MAX_BATCH = 32
+
+# number of recent requests the latency statistics are taken over
+LATENCY_WINDOW = 1024
+
+# prime caches of a worker process by file
+_PRIME_CACHES: Dict[str, PrimeCache] = {}
+
+# cache directory of a worker process (set by _warm_worker)
+_CACHE_DIRECTORY: Optional[str] = None
+
+
+def format_geometry(geometry: List[Point]) -> List[List[str]]:
+    """Formats vertices as rational strings, the inverse of parse_geometry."""
+    return [[str(Fraction(x)), str(Fraction(y))] for x, y in geometry]
+
+
+def encode_list(values: Sequence[int]) -> Tuple[str, bytes]:
+    """Encodes a list or an integer NumPy array as (dtype, raw bytes)."""
+    import numpy
+    if hasattr(values, "dtype") and values.dtype.kind in "iu":
+        array = numpy.ascontiguousarray(values)
+        dtype = array.dtype.newbyteorder("<") if array.dtype.itemsize > 1 else array.dtype
+        return dtype.str, array.astype(dtype, copy=False).tobytes()
+    try:
+        return "<i8", numpy.array(values, dtype="<i8").tobytes()
+    except OverflowError:
+        raise ValueError("The service transfers lists of 64-bit integers") from None
+
+
+def integer_dtype(dtype: str) -> Any:
+    """Returns the NumPy dtype of a request, which has to be a signed or unsigned integer type."""
+    import numpy
+    try:
+        parsed = numpy.dtype(dtype)
+    except TypeError:
+        raise ValueError(f"Unknown dtype {dtype!r}") from None
+    if parsed.kind not in "iu":
+        raise ValueError(f"The service convolves lists of integers, got dtype {dtype!r}")
+    return parsed
+
+
+def decode_list(dtype: str, data: bytes) -> Any:
+    import numpy
+    return numpy.frombuffer(data, dtype=integer_dtype(dtype))
+
+
+def encode_result(values: List[int]) -> Tuple[str, bytes]:
+    """Encodes a convolution as little-endian int64 if it fits, and as decimals otherwise."""
+    import numpy
+    if all(INT64_MIN <= value <= INT64_MAX for value in values):
+        return "<i8", numpy.array(values, dtype="<i8").tobytes()
+    return "decimal", ",".join(str(value) for value in values).encode("ascii")
+
+
+def decode_result(dtype: str, data: bytes) -> List[int]:
+    if dtype == "decimal":
+        return [int(value) for value in data.split(b",")] if data else []
+    return decode_list(dtype, data).tolist()
+
+
+def _warm_worker(cache_directory: Optional[str]):
+    """Initializes a worker process: imports the heavy dependencies and opens the shared caches."""
+    global _CACHE_DIRECTORY
+    _CACHE_DIRECTORY = cache_directory
+    try:
+        import numpy  # noqa: F401
+        import sympy.ntheory.residue_ntheory  # noqa: F401 (primitive roots of new primes)
+    except ImportError:
+        pass
+    _prime_cache()
+    plan_cache(_plan_directory())
+
+
+def _prime_cache() -> Optional[PrimeCache]:
+    if _CACHE_DIRECTORY is None:
+        return None
+    path = os.path.join(_CACHE_DIRECTORY, "primes.json")
+    if path not in _PRIME_CACHES:
+        os.makedirs(_CACHE_DIRECTORY, exist_ok=True)
+        _PRIME_CACHES[path] = PrimeCache(path)
+    return _PRIME_CACHES[path]
+
+
+def _plan_directory() -> Optional[str]:
+    return None if _CACHE_DIRECTORY is None else os.path.join(_CACHE_DIRECTORY, "plans")
+
+
+def execute_batch(vertices: List[List[Any]], items: List[Tuple[str, bytes, bytes, str]]) -> List[Tuple[Any, ...]]:
+    """Runs the convolutions of a batch sharing one geometry (in a worker process).
+
+    Args:
+        vertices (List[List[Any]]): The vertices of the geometry as in parse_geometry.
+        items (List[Tuple[str, bytes, bytes, str]]): (dtype, list1, list2, engine) per request.
+
+    Returns:
+        Per request either ("ok", dtype, data, conv_min) or ("error", message).
+    """
+
+    plan = plan_cache(_plan_directory()).plan(parse_geometry(vertices))
+    results = []
+    for dtype, data1, data2, engine in items:
+        try:
+            list1, list2 = decode_list(dtype, data1), decode_list(dtype, data2)
+            if len(list1) == 0 or len(list2) == 0:
+                conv, conv_min = [], plan.conv_min
+            else:
+                ntt_prime = None if engine == "boolean" else create_ntt_prime(list1, list2, _prime_cache())
+                conv, conv_min = execute_plan(list1, list2, plan, ntt_prime, engine=engine)
+            results.append(("ok", *encode_result(conv), conv_min))
+        except (ValueError, IndexError, MemoryError) as error:
+            results.append(("error", str(error)))
+    return results
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """Reads a frame, or returns None at the end of the stream."""
+    try:
+        prefix = await reader.readexactly(FRAME.size)
+    except asyncio.IncompleteReadError:
+        return None
+    header_length, payload_length = FRAME.unpack(prefix)
+    header = json.loads(await reader.readexactly(header_length))
+    return header, await reader.readexactly(payload_length)
+
+
+def frame(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    data = json.dumps(header).encode("utf-8")
+    return FRAME.pack(len(data), len(payload)) + data + payload
+
+
+class _Request:
+    def __init__(self, item: Tuple[str, bytes, bytes, str], future: asyncio.Future):
+        self.item = item
+        self.future = future
+        self.arrival = time.perf_counter()
+
+
+class ConvolutionServer:
+    """
+    Serves convolutions over Unix sockets or local TCP ports from a warm pool of workers.
+
+    Args:
+        workers (int): The number of worker processes (0 runs the batches in a
+            thread of this process, which shares its caches).
+        cache_directory (Optional[str]): The directory of the prime and plan caches
+            shared by the workers (default: per-process in-memory caches).
+        batch_delay (float): The time in seconds a request waits for others with
+            the same geometry before its batch is dispatched.
+        max_batch (int): The number of requests dispatching a batch immediately.
+    """
+
+    def __init__(self, workers: int = 1, cache_directory: Optional[str] = None,
+                 batch_delay: float = BATCH_DELAY, max_batch: int = MAX_BATCH):
+        self.workers = workers
+        self.cache_directory = cache_directory
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+        self.executor: Optional[Executor] = None
+        self.servers: List[asyncio.AbstractServer] = []
+        # geometry hash -> (vertices, requests waiting for their batch)
+        self._pending: Dict[str, Tuple[List[List[str]], List[_Request]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self._connections = set()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {"requests": 0, "errors": 0, "batches": 0, "coalesced": 0,
+                          "queue_depth": 0, "max_queue_depth": 0}
+
+    async def start(self):
+        """Starts the worker pool and waits until every worker is warm."""
+        if self.executor is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self.workers <= 0:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+            warm = [loop.run_in_executor(self.executor, _warm_worker, self.cache_directory)]
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                                initargs=(self.cache_directory,))
+            warm = [loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)]
+        await asyncio.gather(*warm)
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        await self.start()
+        server = await asyncio.start_unix_server(self._handle_connection, path)
+        self.servers.append(server)
+        return server
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """Listens on a TCP port (port 0 picks a free one, see server.sockets)."""
+        await self.start()
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        self.servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        for task in self._connections:
+            task.cancel()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        for key in list(self._timers):
+            self._dispatch(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def __aenter__(self) -> "ConvolutionServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def convolve(self, vertices: List[List[Any]], dtype: str, data1: bytes, data2: bytes,
+                       engine: str = "auto") -> Tuple[str, bytes, int]:
+        """Queues a convolution for the next batch of its geometry and returns (dtype, data, conv_min)."""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+        itemsize = integer_dtype(dtype).itemsize
+        if len(data1) % itemsize or len(data2) % itemsize:
+            raise ValueError(f"The lists are no whole number of {dtype!r} values")
+        geometry = parse_geometry(vertices)
+        key = geometry_hash(geometry)
+        request = _Request((dtype, data1, data2, engine), asyncio.get_running_loop().create_future())
+        self._counters["requests"] += 1
+        self._counters["queue_depth"] += 1
+        self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], self._counters["queue_depth"])
+
+        if key not in self._pending:
+            self._pending[key] = (format_geometry(geometry), [])
+            self._timers[key] = asyncio.get_running_loop().call_later(self.batch_delay, self._dispatch, key)
+        self._pending[key][1].append(request)
+        if len(self._pending[key][1]) >= self.max_batch:
+            self._dispatch(key)
+        try:
+            return await request.future
+        finally:
+            self._counters["queue_depth"] -= 1
+            self._latencies.append(time.perf_counter() - request.arrival)
+
+    def _dispatch(self, key: str):
+        self._timers.pop(key).cancel()
+        vertices, requests = self._pending.pop(key)
+        self._counters["batches"] += 1
+        if len(requests) > 1:
+            self._counters["coalesced"] += len(requests)
+        task = asyncio.ensure_future(self._run_batch(vertices, requests))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, vertices: List[List[str]], requests: List[_Request]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, execute_batch, vertices,
+                                                 [request.item for request in requests])
+        except Exception as error:  # a broken worker fails the whole batch
+            results = [("error", f"{type(error).__name__}: {error}")] * len(requests)
+        for request, result in zip(requests, results):
+            if request.future.done():
+                continue
+            if result[0] == "ok":
+                request.future.set_result(result[1:])
+            else:
+                self._counters["errors"] += 1
+                request.future.set_exception(ValueError(result[1]))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Returns the request counters, the current queue depth and latency statistics in seconds."""
+        metrics = dict(self._counters)
+        metrics["pending_batches"] = len(self._pending)
+        latencies = sorted(self._latencies)
+        if latencies:
+            metrics["latency"] = {
+                "count": len(latencies), "mean": sum(latencies) / len(latencies),
+                "p50": latencies[len(latencies) // 2], "p95": latencies[int(0.95 * (len(latencies) - 1))],
+                "p99": latencies[int(0.99 * (len(latencies) - 1))], "max": latencies[-1]}
+        return metrics
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # requests of a connection are served concurrently and answered in the order of completion
+        lock = asyncio.Lock()
+        tasks = set()
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message is None:
+                    break
+                task = asyncio.ensure_future(self._answer(*message, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            # the server is closing (see close), which ends the connection without a traceback
+            for task in tasks:
+                task.cancel()
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+    async def _answer(self, header: Dict[str, Any], payload: bytes, writer: asyncio.StreamWriter,
+                      lock: asyncio.Lock):
+        answer, data = {"id": header.get("id")}, b""
+        try:
+            operation = header.get("op", "convolve")
+            if operation == "metrics":
+                answer["metrics"] = self.metrics()
+            elif operation == "convolve":
+                dtype = header.get("dtype", "<i8")
+                split = int(header["length1"]) * integer_dtype(dtype).itemsize
+                if not 0 <= split <= len(payload):
+                    raise ValueError(f"The payload of {len(payload)} bytes doesn't hold a first list of "
+                                     f"{header['length1']} {dtype!r} values")
+                answer["dtype"], data, answer["conv_min"] = await self.convolve(
+                    header["geometry"], dtype, payload[:split], payload[split:], header.get("engine", "auto"))
+            else:
+                raise ValueError(f"Unknown operation {operation!r}")
+        except (KeyError, TypeError, ValueError) as error:
+            answer, data = {"id": header.get("id"), "error": str(error)}, b""
+        async with lock:
+            writer.write(frame(answer, data))
+            await writer.drain()
+
+
+class ConvolutionClient:
+    """A client of a ConvolutionServer, which may send many requests concurrently over one connection."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+        self._futures: Dict[int, asyncio.Future] = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def open_unix(cls, path: str) -> "ConvolutionClient":
+        return cls(*await asyncio.open_unix_connection(path))
+
+    @classmethod
+    async def open_tcp(cls, host: str, port: int) -> "ConvolutionClient":
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def _receive(self):
+        try:
+            while True:
+                message = await read_frame(self.reader)
+                if message is None:
+                    break
+                header, payload = message
+                future = self._futures.pop(header.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        finally:
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("The convolution service closed the connection"))
+
+    async def _request(self, header: Dict[str, Any], payload: bytes = b"") -> Tuple[Dict[str, Any], bytes]:
+        self._next_id += 1
+        header["id"] = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._futures[self._next_id] = future
+        self.writer.write(frame(header, payload))
+        await self.writer.drain()
+        answer, payload = await future
+        if "error" in answer:
+            raise ValueError(answer["error"])
+        return answer, payload
+
+    async def convolve(self, list1: Sequence[int], list2: Sequence[int], geometry: List[Point],
+                       engine: str = "auto") -> Tuple[List[int], int]:
+        """Computes non_rectangular_convolution(list1, list2, geometry) on the server."""
+        dtype1, data1 = encode_list(list1)
+        dtype2, data2 = encode_list(list2)
+        if dtype1 != dtype2:
+            dtype1, data1 = encode_list(decode_list(dtype1, data1).astype("<i8"))
+            dtype2, data2 = encode_list(decode_list(dtype2, data2).astype("<i8"))
+        header = {"op": "convolve", "geometry": format_geometry(geometry), "dtype": dtype1,
+                  "length1": len(list1), "engine": engine}
+        answer, payload = await self._request(header, data1 + data2)
+        return decode_result(answer["dtype"], payload), answer["conv_min"]
+
+    async def metrics(self) -> Dict[str, Any]:
+        answer, _ = await self._request({"op": "metrics"})
+        return answer["metrics"]
+
+    async def close(self):
+        self.writer.close()
+        await self._receiver
+
+    async def __aenter__(self) -> "ConvolutionClient":
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+
+async def serve(unix_path: Optional[str] = None, host: Optional[str] = None, port: int = 0,
+                workers: int = 1, cache_directory: Optional[str] = None,
+                batch_delay: float = BATCH_DELAY, max_batch: int = MAX_BATCH):
+    """Runs a ConvolutionServer until it is cancelled."""
+    async with ConvolutionServer(workers, cache_directory, batch_delay, max_batch) as server:
+        if unix_path is not None:
+            await server.start_unix(unix_path)
+            print(f"listening on {unix_path}", flush=True)
+        if host is not None or unix_path is None:
+            tcp = await server.start_tcp(host or "127.0.0.1", port)
+            print("listening on {}:{}".format(*tcp.sockets[0].getsockname()[:2]), flush=True)
+        await asyncio.gather(*(listener.serve_forever() for listener in server.servers))
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m nrconv.service", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--unix", help="path of the Unix socket")
+    parser.add_argument("--host", help="TCP host (default: 127.0.0.1 if no Unix socket is given)")
+    parser.add_argument("--port", type=int, default=0, help="TCP port (default: a free one)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--cache-directory", help="directory of the prime and plan caches shared by the workers")
+    parser.add_argument("--batch-delay", type=float, default=BATCH_DELAY,
+                        help="seconds a request waits for others with the same geometry")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    args = parser.parse_args(arguments)
+    try:
+        asyncio.run(serve(args.unix, args.host, args.port, args.workers, args.cache_directory,
+                          args.batch_delay, args.max_batch))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+"""This module evaluates convolutions of mostly-zero sequences pair by pair.
+
+A SparseIndex keeps the sorted nonzero positions of a sequence.  The sparse
+engine iterates over the nonzero entries of list1 and, for each of them, over
+the nonzero entries of list2 within the column of the polygon, so its work is
+proportional to the pairs contributing to the output.
+"""
+
+import sys
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from nrconv.buffers import read_slice, scatter
+from nrconv.primes import create_power_of_two
+
+# Inputs with a larger share of nonzero entries are evaluated densely.
+SPARSE_DENSITY = 0.25
+
+# Estimated cost of an NTT-based rectangle leaf per element and doubling of its
+# transform length, relative to the cost of accumulating a single pair.
+NTT_COST_FACTOR = 4
+
+# number of values converted at once when scanning a sequence
+SCAN_CHUNK_SIZE = 1 << 16
+
+# Estimated bytes of a nonzero entry within a SparseIndex (a list slot and an
+# int object for both its position and its value).
+INDEX_ENTRY_BYTES = 2 * (8 + sys.getsizeof(1 << 40))
+
+Columns = Dict[int, List[Tuple[int, int, int]]]
+
+
+class SparseIndex:
+    """The sorted nonzero positions of a sequence together with their values.
+
+    Args:
+        values (Sequence[int]): The sequence (list, NumPy array, memory map or buffer).
+    """
+
+    def __init__(self, values: Sequence[int]):
+        self.length = len(values)
+        self.positions: List[int] = []
+        self.values: List[int] = []
+        if hasattr(values, "nonzero") and hasattr(values, "tolist"):
+            positions = values.nonzero()[0]
+            self.positions = positions.tolist()
+            self.values = [int(value) for value in values[positions].tolist()]
+            return
+        for start in range(0, self.length, SCAN_CHUNK_SIZE):
+            chunk = read_slice(values, start, min(SCAN_CHUNK_SIZE, self.length - start))
+            for position, value in enumerate(chunk, start):
+                if value:
+                    self.positions.append(position)
+                    self.values.append(value)
+
+    @property
+    def density(self) -> float:
+        """The share of nonzero entries."""
+        return len(self.positions) / self.length if self.length else 0.0
+
+    def count(self, low: int, high: int) -> int:
+        """Counts the nonzero entries with positions in [low, high]."""
+        return bisect_right(self.positions, high) - bisect_left(self.positions, low)
+
+    def items(self, low: int, high: int) -> Tuple[List[int], List[int]]:
+        """Returns the positions and values of the nonzero entries with positions in [low, high]."""
+        start, end = bisect_left(self.positions, low), bisect_right(self.positions, high)
+        return self.positions[start:end], self.values[start:end]
+
+    def value(self, position: int) -> int:
+        """Returns the entry at position."""
+        index = bisect_left(self.positions, position)
+        if index < len(self.positions) and self.positions[index] == position:
+            return self.values[index]
+        return 0
+
+
+def count_nonzero(values: Sequence[int], stop: Optional[int] = None) -> int:
+    """Counts the nonzero entries of a sequence chunk by chunk, without keeping their positions.
+
+    With stop given, the scan ends as soon as the count exceeds stop, so the
+    result is only exact up to stop + 1.
+    """
+    count = 0
+    for start in range(0, len(values), SCAN_CHUNK_SIZE):
+        end = min(start + SCAN_CHUNK_SIZE, len(values))
+        if hasattr(values, "nonzero") and hasattr(values, "tolist"):
+            count += int((values[start:end] != 0).sum())
+        else:
+            count += sum(1 for value in read_slice(values, start, end - start) if value)
+        if stop is not None and count > stop:
+            break
+    return count
+
+
+def is_sparse_sequence(values: Sequence[int]) -> bool:
+    """Checks if at most a share SPARSE_DENSITY of the entries is nonzero (see count_nonzero)."""
+    stop = int(SPARSE_DENSITY * len(values))
+    return count_nonzero(values, stop) <= stop
+
+
+def index_bytes(count: int) -> int:
+    """Estimates the bytes of a SparseIndex with count nonzero entries."""
+    return count * INDEX_ENTRY_BYTES
+
+
+def ntt_cost(conv_size: int) -> int:
+    """Estimates the work of an NTT-based convolution of the given size in accumulated pairs."""
+    ntt_length = create_power_of_two(conv_size)
+    return NTT_COST_FACTOR * ntt_length * ntt_length.bit_length()
+
+
+def is_sparse(index1: SparseIndex, index2: SparseIndex) -> bool:
+    """Checks if one of the sequences is sparse enough for the sparse engine to pay off."""
+    return min(index1.density, index2.density) <= SPARSE_DENSITY
+
+
+def group_columns(columns: List[Tuple[int, int, int, int]]) -> Columns:
+    """Groups the tuples (x, y_min, y_max, sign) of signed_columns by x."""
+    grouped: Columns = {}
+    for x_index, y_low, y_high, sign in columns:
+        grouped.setdefault(x_index, []).append((y_low, y_high, sign))
+    return grouped
+
+
+def sparse_pairs(index1: SparseIndex, index2: SparseIndex, columns: Columns) -> int:
+    """Counts the pairs of nonzero entries the sparse engine visits for the given columns."""
+    return sum(index2.count(y_low, y_high)
+               for x_index in index1.positions
+               for y_low, y_high, _ in columns.get(x_index, ()))
+
+
+def sparse_convolution(index1: SparseIndex, index2: SparseIndex, columns: Columns,
+                       conv: Any, conv_min: int):
+    """Adds the convolution with the lattice points of the columns onto conv starting at conv_min.
+
+    Args:
+        index1 (SparseIndex): The nonzero entries of the first list.
+        index2 (SparseIndex): The nonzero entries of the second list.
+        columns (Columns): The signed y-ranges per x, see group_columns.
+        conv (Any): The output list or array.
+        conv_min (int): The offset of the first index of conv.
+    """
+
+    for x_index, value1 in zip(index1.positions, index1.values):
+        for y_low, y_high, sign in columns.get(x_index, ()):
+            positions, values = index2.items(y_low, y_high)
+            offset = x_index - conv_min
+            scaled = sign * value1
+            scatter(conv, [offset + y_index for y_index in positions], [scaled * value2 for value2 in values])
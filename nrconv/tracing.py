@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""This module records the steps of a convolution as a tree of spans.
+
+Tracing is opt-in:
+
+    with nrconv.trace() as tracer:
+        nrconv.non_rectangular_convolution_convex_polygon(list1, list2, geometry, prime)
+    tracer.write_chrome_trace("trace.json")
+
+While no tracer is active, the instrumented code only pays for a single
+global lookup per applied step sequence.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Bounds = Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+@dataclass
+class Span:
+    kind: str
+    bounds: Optional[Bounds] = None  # integer bounding box of the step geometry
+    size: int = 0  # size of the convolved slice
+    sign: int = 1  # +1 for addition, -1 for subtraction
+    depth: int = 0
+    start: float = 0.0  # seconds since the start of the trace
+    elapsed: float = 0.0  # seconds
+    allocated_bytes: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    children: List['Span'] = field(default_factory=list)
+
+    def walk(self) -> Iterator['Span']:
+        """Iterates over the span and all its descendants in depth-first order."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converts the span tree into nested dictionaries."""
+        return {
+            "kind": self.kind,
+            "bounds": self.bounds,
+            "size": self.size,
+            "sign": self.sign,
+            "depth": self.depth,
+            "start": self.start,
+            "elapsed": self.elapsed,
+            "allocated_bytes": self.allocated_bytes,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class Tracer:
+    """Collects the spans of all convolution steps executed while it is active."""
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self.root = Span(kind="trace")
+        self._stack = [self.root]
+
+    @contextmanager
+    def span(self, kind: str, bounds: Optional[Bounds] = None, size: int = 0, sign: int = 1) -> Iterator[Span]:
+        """Opens a child span of the current span, which is timed until the context exits."""
+        parent = self._stack[-1]
+        span = Span(kind=kind, bounds=bounds, size=size, sign=sign, depth=parent.depth + 1)
+        parent.children.append(span)
+        self._stack.append(span)
+        span.start = time.perf_counter() - self._origin
+        try:
+            yield span
+        finally:
+            span.elapsed = time.perf_counter() - self._origin - span.start
+            self._stack.pop()
+
+    def annotate(self, **attributes: Any):
+        """Adds attributes (e.g. the NTT length) to the current span."""
+        self._stack[-1].attributes.update(attributes)
+
+    def finish(self):
+        """Closes the root span."""
+        self.root.elapsed = time.perf_counter() - self._origin
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregates the number of spans, their time and allocations per kind.
+
+        The elapsed time of a kind includes nested spans, its self_elapsed time does not.
+        """
+        kinds: Dict[str, Dict[str, Any]] = {}
+        for span in self.root.walk():
+            if span is self.root:
+                continue
+            entry = kinds.setdefault(span.kind, {"count": 0, "elapsed": 0.0, "self_elapsed": 0.0,
+                                                 "allocated_bytes": 0})
+            entry["count"] += 1
+            entry["elapsed"] += span.elapsed
+            entry["self_elapsed"] += span.elapsed - sum(child.elapsed for child in span.children)
+            entry["allocated_bytes"] += span.allocated_bytes
+        ntt_lengths = sorted({span.attributes["ntt_length"] for span in self.root.walk()
+                              if "ntt_length" in span.attributes})
+        return {
+            "kinds": kinds,
+            "max_depth": max(span.depth for span in self.root.walk()),
+            "ntt_lengths": ntt_lengths,
+            "elapsed": self.root.elapsed,
+        }
+
+    def to_json(self) -> str:
+        """Serializes the span tree as JSON."""
+        return json.dumps(self.root.to_dict())
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Converts the span tree into the Chrome trace event format (chrome://tracing, Perfetto)."""
+        events = []
+        for span in self.root.walk():
+            args = {"bounds": span.bounds, "size": span.size, "sign": span.sign,
+                    "depth": span.depth, "allocated_bytes": span.allocated_bytes}
+            args.update(span.attributes)
+            events.append({
+                "name": span.kind, "cat": "nrconv", "ph": "X",
+                "ts": span.start * 1e6, "dur": span.elapsed * 1e6,
+                "pid": os.getpid(), "tid": 0, "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_json(self, path: str):
+        """Writes the span tree as JSON to path."""
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.to_json())
+
+    def write_chrome_trace(self, path: str):
+        """Writes the span tree in the Chrome trace event format to path."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_chrome_trace(), file)
+
+
+_ACTIVE_TRACER: Optional[Tracer] = None
+
+
+def active_tracer() -> Optional[Tracer]:
+    """Returns the active tracer, or None if tracing is disabled."""
+    return _ACTIVE_TRACER
+
+
+@contextmanager
+def trace(tracer: Optional[Tracer] = None) -> Iterator[Tracer]:
+    """Activates a tracer for the duration of the context."""
+    global _ACTIVE_TRACER
+    tracer = Tracer() if tracer is None else tracer
+    previous, _ACTIVE_TRACER = _ACTIVE_TRACER, tracer
+    try:
+        yield tracer
+    finally:
+        _ACTIVE_TRACER = previous
+        tracer.finish()
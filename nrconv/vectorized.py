@@ -0,0 +1,377 @@
+#!/usr/bin/python3
+"""This module compiles the plans of many convex polygons at once with NumPy.
+
+The geometry helpers of nrconv.geometry take one tuple of Fractions at a time,
+and compiling a polygon calls them for every step of its decomposition.  Here,
+a stack of n points (or polygons with k vertices) is an integer array of
+numerators of shape (n, 2) (or (n, k, 2)) over a denominator per row, and the
+kernels below work on whole stacks.  compile_plans decomposes all polygons
+level by level: the triangles of all polygons are split at once, and so are
+all axis-aligned triangles of a recursion level.
+
+Numerators are int64 while products of two of them can't overflow, and Python
+ints in object arrays beyond that, so that all results stay exact.
+"""
+
+from fractions import Fraction
+from math import lcm
+from typing import Any, Dict, List, Sequence, Tuple
+
+from nrconv.convolution import retrieve_convolution_size
+from nrconv.geometry import Point, is_convex
+
+# Numerators and denominators below this bound are stored as int64, so that
+# sums of products of two of them can't overflow.
+SAFE_BOUND = 1 << 29
+
+
+def _dtype(values: Any) -> Any:
+    import numpy
+    if values.dtype != object and (len(values) == 0 or int(numpy.abs(values).max()) < SAFE_BOUND):
+        return numpy.int64
+    return object
+
+
+def _ceil_div(numerators: Any, denominators: Any) -> Any:
+    return -((-numerators) // denominators)
+
+
+def as_rational_arrays(polygons: Sequence[List[Point]]) -> Tuple[Any, Any]:
+    """Converts polygons with the same number of vertices into numerators over one denominator per polygon.
+
+    Returns:
+        The numerators of shape (n, k, 2) and the denominators of shape (n,).
+    """
+
+    import numpy
+    denominators = [lcm(*(coordinate.denominator for vertex in polygon for coordinate in vertex))
+                    for polygon in polygons]
+    numerators = [[[int(x * denominator), int(y * denominator)] for x, y in polygon]
+                  for polygon, denominator in zip(polygons, denominators)]
+    numerators = numpy.array(numerators, dtype=object).reshape(len(polygons), -1, 2)
+    denominators = numpy.array(denominators, dtype=object)
+    dtype = _dtype(numpy.concatenate([numerators.ravel(), denominators]))
+    return numerators.astype(dtype), denominators.astype(dtype)
+
+
+def rectangle_inscribed_arrays(numerators: Any) -> Tuple[Any, Any]:
+    """Vectorized rectangle_inscribed: the minimal and maximal coordinates of every polygon, shape (n, 2)."""
+    return numerators.min(axis=1), numerators.max(axis=1)
+
+
+def rectangle_inscribed_int_arrays(numerators: Any, denominators: Any) -> Tuple[Any, Any]:
+    """Vectorized rectangle_inscribed_int: the minimal and maximal integer coordinates, shape (n, 2)."""
+    minima, maxima = rectangle_inscribed_arrays(numerators)
+    return _ceil_div(minima, denominators[:, None]), maxima // denominators[:, None]
+
+
+def closer_point_arrays(reference: Any, option_a: Any, option_b: Any) -> Any:
+    """Vectorized closer_point for stacks of points over the same denominators."""
+    import numpy
+    a_squared_distance = ((reference - option_a) ** 2).sum(axis=1)
+    b_squared_distance = ((reference - option_b) ** 2).sum(axis=1)
+    return numpy.where((a_squared_distance <= b_squared_distance)[:, None], option_a, option_b)
+
+
+def opposing_rect_vertex_arrays(reference: Any, diag_start: Any, diag_end: Any) -> Any:
+    """Vectorized opposing_rect_vertex for stacks of points over the same denominators.
+
+    The comparison part_ax / weight_ax + part_ay / weight_ay > 1 is evaluated
+    without divisions, as the diagonals are never axis-parallel.
+    """
+
+    import numpy
+    other_a = numpy.stack([diag_end[:, 0], diag_start[:, 1]], axis=1)
+    other_b = numpy.stack([diag_start[:, 0], diag_end[:, 1]], axis=1)
+    weight_ax, weight_ay = abs(other_a[:, 0] - diag_start[:, 0]), abs(other_a[:, 1] - diag_end[:, 1])
+    part_ax, part_ay = abs(other_a[:, 0] - reference[:, 0]), abs(other_a[:, 1] - reference[:, 1])
+    use_a = part_ax * weight_ay + part_ay * weight_ax > weight_ax * weight_ay
+    return numpy.where(use_a[:, None], other_a, other_b)
+
+
+class _Stacks:
+    """Collects stacks of geometries of one kind with their denominators, weights and polygons."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def add(self, points: List[Any], denominators: Any, weights: Any, owners: Any, mask: Any = None):
+        import numpy
+        numerators = numpy.stack(points, axis=1)
+        if mask is not None:
+            numerators, denominators, weights, owners = (numerators[mask], denominators[mask],
+                                                         weights[mask], owners[mask])
+        if len(numerators):
+            self.chunks.append((numerators, denominators, weights, owners))
+
+    def concatenate(self) -> Tuple[Any, Any, Any, Any]:
+        import numpy
+        if not self.chunks:
+            return None
+        return tuple(numpy.concatenate(parts) for parts in zip(*self.chunks))
+
+
+def _split_triangles(triangles, rectangles: _Stacks, edges: _Stacks, axis_aligned: _Stacks):
+    """Vectorized split_triangle: adds the steps of every triangle to the stacks of their kind."""
+    import numpy
+    numerators, denominators, weights, owners = triangles
+    minima, maxima = rectangle_inscribed_arrays(numerators)
+    (x_min, y_min), (x_max, y_max) = minima.T, maxima.T
+    degenerate = (x_min == x_max) | (y_min == y_max)
+    edges.add([minima, maxima], denominators, weights, owners, degenerate)
+
+    xs, ys = numerators[:, :, 0], numerators[:, :, 1]
+    collisions = (((xs == x_min[:, None]) | (xs == x_max[:, None]))
+                  & ((ys == y_min[:, None]) | (ys == y_max[:, None])))
+    count = numpy.where(degenerate, 0, collisions.sum(axis=1))
+    # the colliding vertices first, both groups in their original order
+    order = numpy.argsort(~collisions, axis=1, kind="stable")
+    vertices = numpy.take_along_axis(numerators, order[:, :, None], axis=1)
+    first, second, third = vertices[:, 0], vertices[:, 1], vertices[:, 2]
+    arguments = (denominators, weights, owners)
+    negated = (denominators, -weights, owners)
+
+    axis_aligned.add([numerators[:, 0], numerators[:, 1], numerators[:, 2]], *arguments, count == 3)
+
+    # two vertices on opposing corners of the surrounding rectangle
+    opposing = (count == 2) & (first[:, 0] != second[:, 0]) & (first[:, 1] != second[:, 1])
+    if opposing.any():
+        quart = opposing_rect_vertex_arrays(third, first, second)
+        candidates = (numpy.stack([third[:, 0], quart[:, 1]], axis=1), numpy.stack([quart[:, 0], third[:, 1]], axis=1))
+        base0, base1 = closer_point_arrays(first, *candidates), closer_point_arrays(second, *candidates)
+        rectangles.add([third, quart], *arguments, opposing)
+        axis_aligned.add([first, base0, third], *arguments, opposing)
+        edges.add([base0, third], *negated, opposing)
+        axis_aligned.add([second, base1, third], *arguments, opposing)
+        edges.add([base1, third], *negated, opposing)
+        axis_aligned.add([first, second, quart], *negated, opposing)
+        edges.add([first, second], *arguments, opposing)
+
+    # two vertices on the same edge of the surrounding rectangle
+    same_edge = (count == 2) & ~opposing
+    if same_edge.any():
+        vertical = (first[:, 0] == second[:, 0])[:, None]
+        base = numpy.where(vertical, numpy.stack([first[:, 0], third[:, 1]], axis=1),
+                           numpy.stack([third[:, 0], first[:, 1]], axis=1))
+        axis_aligned.add([first, base, third], *arguments, same_edge)
+        axis_aligned.add([second, base, third], *arguments, same_edge)
+        edges.add([base, third], *negated, same_edge)
+
+    # a single vertex on a corner of the surrounding rectangle
+    single = count == 1
+    if single.any():
+        opposite = minima + maxima - first
+        corner0 = opposing_rect_vertex_arrays(third, first, opposite)
+        corner1 = opposing_rect_vertex_arrays(second, first, opposite)
+        rectangles.add([first, opposite], *arguments, single)
+        axis_aligned.add([first, corner0, second], *negated, single)
+        edges.add([first, second], *arguments, single)
+        axis_aligned.add([first, corner1, third], *negated, single)
+        edges.add([first, third], *arguments, single)
+        axis_aligned.add([opposite, second, third], *negated, single)
+        edges.add([second, third], *arguments, single)
+
+
+def _split_axis_aligned(triangles, rectangles: _Stacks, edges: _Stacks, points: List[Any]) -> Any:
+    """Vectorized split_triangle_axis_aligned for one recursion level.
+
+    Returns:
+        The axis-aligned triangles of the next level (over doubled denominators).
+    """
+
+    import numpy
+    numerators, denominators, weights, owners = triangles
+    if numerators.dtype != object and (_dtype(numerators.ravel()) is object or _dtype(denominators) is object):
+        numerators, denominators = numerators.astype(object), denominators.astype(object)
+    minima, maxima = rectangle_inscribed_arrays(numerators)
+    (x_min, y_min), (x_max, y_max) = minima.T, maxima.T
+    degenerate = (x_min == x_max) | (y_min == y_max)
+    edges.add([minima, maxima], denominators, weights, owners, degenerate)
+
+    low, high = _ceil_div(minima, denominators[:, None]), maxima // denominators[:, None]
+    empty = (low > high).any(axis=1)
+    conv_size = numpy.where(empty, 0, high.sum(axis=1) - low.sum(axis=1) + 1)
+    x_cathetus = numerators[:, :, 0].sum(axis=1) - x_min - x_max
+    y_cathetus = numerators[:, :, 1].sum(axis=1) - y_min - y_max
+
+    # a single candidate point is in the triangle if its relative distances from the catheti sum up to at most 1
+    small = ~degenerate & (conv_size == 1)
+    if small.any():
+        x_point, y_point = low[:, 0], low[:, 1]
+        x_extent, y_extent = x_max - x_min, y_max - y_min
+        inside = (abs(x_point * denominators - x_cathetus) * y_extent
+                  + abs(y_point * denominators - y_cathetus) * x_extent <= x_extent * y_extent)
+        keep = small & inside
+        points.append(numpy.stack([owners[keep], x_point[keep], y_point[keep], x_point[keep], y_point[keep],
+                                   weights[keep]], axis=1))
+
+    large = ~degenerate & (conv_size > 1)
+    if not large.any():
+        return None
+    numerators, denominators, weights, owners = numerators[large], denominators[large], weights[large], owners[large]
+    x_min, y_min, x_max, y_max = x_min[large], y_min[large], x_max[large], y_max[large]
+    # everything over twice the denominator, such that the averages are numerators as well
+    x_average, y_average = x_min + x_max, y_min + y_max
+    x_cathetus, y_cathetus = 2 * x_cathetus[large], 2 * y_cathetus[large]
+    x_not_cathetus, y_not_cathetus = 2 * (x_min + x_max) - x_cathetus, 2 * (y_min + y_max) - y_cathetus
+    denominators = 2 * denominators
+
+    def point(x, y):
+        return numpy.stack([x, y], axis=1)
+
+    average = point(x_average, y_average)
+    arguments = (denominators, weights, owners)
+    negated = (denominators, -weights, owners)
+    rectangles.add([point(x_cathetus, y_cathetus), average], *arguments)
+    edges.add([point(x_average, y_cathetus), average], *negated)
+    edges.add([point(x_cathetus, y_average), average], *negated)
+    children = _Stacks()
+    children.add([average, point(x_cathetus, y_average), point(x_cathetus, y_not_cathetus)], *arguments)
+    children.add([average, point(x_average, y_cathetus), point(x_not_cathetus, y_cathetus)], *arguments)
+    return children.concatenate()
+
+
+def _rectangle_leaves(stacks: _Stacks, points: List[Any]):
+    """Converts a stack of rectangles into rows (owner, x_min, y_min, x_max, y_max, weight)."""
+    import numpy
+    rectangles = stacks.concatenate()
+    if rectangles is None:
+        return
+    numerators, denominators, weights, owners = rectangles
+    low, high = rectangle_inscribed_int_arrays(numerators, denominators)
+    keep = (low <= high).all(axis=1)
+    points.append(numpy.concatenate([owners[keep, None], low[keep], high[keep], weights[keep, None]], axis=1))
+
+
+def _edge_leaves(stacks: _Stacks, rows: List[Any], general: List[Tuple[int, List[Point], int]]):
+    """Converts the axis-parallel edges of a stack into rows (owner, x_start, y_start, x_step, y_step,
+    count, weight) and collects the other ones for edge_leaf.
+    """
+
+    import numpy
+    edges = stacks.concatenate()
+    if edges is None:
+        return
+    numerators, denominators, weights, owners = edges
+    low, high = rectangle_inscribed_arrays(numerators)
+    int_low, int_high = _ceil_div(low, denominators[:, None]), high // denominators[:, None]
+    zero, one = numpy.zeros_like(owners), numpy.ones_like(owners)
+
+    # vertical edges (and points) at an integer x, and horizontal edges at an integer y
+    for axis, steps in ((0, (zero, one)), (1, (one, zero))):
+        other = 1 - axis
+        parallel = low[:, axis] == high[:, axis]
+        if axis == 1:
+            parallel &= low[:, 0] != high[:, 0]
+        keep = (parallel & (low[:, axis] % denominators == 0) & (int_low[:, other] <= int_high[:, other]))
+        count = int_high[:, other] - int_low[:, other] + 1
+        rows.append(numpy.stack([owners, int_low[:, 0], int_low[:, 1], *steps, count, weights], axis=1)[keep])
+
+    diagonal = (low[:, 0] != high[:, 0]) & (low[:, 1] != high[:, 1])
+    for index in numpy.nonzero(diagonal)[0].tolist():
+        denominator = int(denominators[index])
+        general.append((int(owners[index]),
+                        [(Fraction(int(x), denominator), Fraction(int(y), denominator)) for x, y in numerators[index]],
+                        int(weights[index])))
+
+
+def _convex_parts(vertices: List[int], weight: int, parts: Dict[int, list]):
+    """Mirrors split_convex_polygon on vertex indices, collecting (indices, weight) by number of vertices."""
+    count = len(vertices)
+    if count == 1:
+        parts[2].append(([vertices[0], vertices[0]], weight, "rectangle"))
+    elif count == 2:
+        parts[2].append((vertices, weight, "edge"))
+    elif count == 3:
+        parts[3].append((vertices, weight))
+    elif count == 4:
+        parts[3].append(([vertices[0], vertices[1], vertices[2]], weight))
+        parts[3].append(([vertices[2], vertices[3], vertices[0]], weight))
+        parts[2].append(([vertices[0], vertices[2]], -weight, "edge"))
+    else:
+        _convex_parts(vertices[::2], weight, parts)
+        for index in range(0, count - 2, 2):
+            parts[3].append((vertices[index:index + 3], weight))
+            parts[2].append(([vertices[index], vertices[index + 2]], -weight, "edge"))
+        if count % 2 == 0:
+            parts[3].append(([vertices[count - 2], vertices[count - 1], vertices[0]], weight))
+            parts[2].append(([vertices[count - 2], vertices[0]], -weight, "edge"))
+
+
+def compile_plans(geometries: Sequence[List[Point]]) -> List[Any]:
+    """
+    Compiles the plans of many polygons at once.
+
+    Convex polygons are decomposed together as in compile_plan, with the same
+    leaves (in a different order).  Other polygons are compiled one by one with
+    compile_polygon_plan.
+
+    Args:
+        geometries (Sequence[List[Point]]): The vertices of every polygon.
+
+    Returns:
+        The plans in the order of the geometries.
+    """
+
+    import numpy
+    from nrconv.plan import EdgeLeaf, Plan, RectangleLeaf, compile_polygon_plan, edge_leaf
+
+    plans: List[Any] = [None] * len(geometries)
+    parts: Dict[int, list] = {2: [], 3: []}
+    polygons = []
+    for owner, geometry in enumerate(geometries):
+        geometry = [(Fraction(x), Fraction(y)) for x, y in geometry]
+        if not geometry or not is_convex(geometry):
+            plans[owner] = compile_polygon_plan(geometry)
+            continue
+        numerators, denominators = as_rational_arrays([geometry])
+        offset = sum(len(polygon) for polygon, _ in polygons)
+        polygons.append((numerators[0].astype(object), denominators[0]))
+        owner_parts: Dict[int, list] = {2: [], 3: []}
+        _convex_parts(list(range(offset, offset + len(geometry))), 1, owner_parts)
+        for size, items in owner_parts.items():
+            parts[size].extend((owner, *item) for item in items)
+
+    rows: List[Any] = []
+    edge_rows: List[Any] = []
+    general: List[Tuple[int, List[Point], int]] = []
+    if polygons:
+        vertices = numpy.concatenate([numerators for numerators, _ in polygons])
+        vertex_denominators = numpy.concatenate([[denominator] * len(numerators)
+                                                 for numerators, denominator in polygons])
+        dtype = _dtype(numpy.concatenate([vertices.ravel(), vertex_denominators]))
+        vertices, vertex_denominators = vertices.astype(dtype), vertex_denominators.astype(dtype)
+
+        def stack(items, size):
+            indices = numpy.array([item[1] for item in items], dtype=numpy.int64).reshape(-1, size)
+            weights = numpy.array([item[2] for item in items], dtype=numpy.int64)
+            owners = numpy.array([item[0] for item in items], dtype=numpy.int64)
+            return vertices[indices], vertex_denominators[indices[:, 0]], weights, owners
+
+        rectangles, edges, axis_aligned = _Stacks(), _Stacks(), _Stacks()
+        for kind, target in (("rectangle", rectangles), ("edge", edges)):
+            items = [item for item in parts[2] if item[3] == kind]
+            if items:
+                numerators, denominators, weights, owners = stack(items, 2)
+                target.add([numerators[:, 0], numerators[:, 1]], denominators, weights, owners)
+        if parts[3]:
+            _split_triangles(stack(parts[3], 3), rectangles, edges, axis_aligned)
+        level = axis_aligned.concatenate()
+        while level is not None:
+            level = _split_axis_aligned(level, rectangles, edges, rows)
+        _rectangle_leaves(rectangles, rows)
+        _edge_leaves(edges, edge_rows, general)
+
+    leaves: Dict[int, list] = {owner: [] for owner in range(len(geometries)) if plans[owner] is None}
+    for table, leaf_type in ((rows, RectangleLeaf), (edge_rows, EdgeLeaf)):
+        for row in numpy.concatenate(table).tolist() if table else []:
+            leaves[row[0]].append(leaf_type(*row[1:]))
+    for owner, geometry, weight in general:
+        leaf = edge_leaf(geometry, weight)
+        if leaf is not None:
+            leaves[owner].append(leaf)
+    for owner, owner_leaves in leaves.items():
+        conv_size, conv_min = retrieve_convolution_size(
+            [(Fraction(x), Fraction(y)) for x, y in geometries[owner]])
+        plans[owner] = Plan(owner_leaves, conv_size, conv_min)
+    return plans
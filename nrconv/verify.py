@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+"""This module checks a convolution probabilistically instead of by brute force.
+
+The output c is compared with the polygon through the random linear combination
+    sum_s c[s] * t^s = sum_x list1[x] * t^x * sum_{y in I(x)} list2[y] * t^y   (mod p)
+for a random prime p and a random base t, where I(x) is the range of lattice
+points of the polygon in column x.  Non-convex regions sum up the columns of
+their signed convex pieces.  With prefix sums of list2[y] * t^y, the
+right-hand side costs one term per column, so a check runs in
+O(len(list1) + len(list2) + len(c)) instead of O(len(list1) * len(list2)).
+A wrong output passes a check with a probability of at most len(c) / p.
+"""
+
+import random
+from typing import Any, List, Optional, Sequence, Tuple
+
+from nrconv.buffers import as_sequence, read_slice
+from nrconv.geometry import Point, polygon_pieces, signed_columns
+from nrconv.primes import random_prime
+
+VERIFY_ROUNDS = 2
+VERIFY_PRIME_BITS = 61
+
+# number of values converted at once when reading the lists
+CHUNK_SIZE = 1 << 16
+
+
+class VerificationError(ValueError):
+    """A convolution does not match its geometry in the output indices index_range (inclusive)."""
+
+    def __init__(self, index_range: Tuple[int, int]):
+        super().__init__(f"Convolution mismatch in the output indices {index_range[0]} to {index_range[1]}")
+        self.index_range = index_range
+
+
+def _weighted_prefix_sums(values: Sequence[int], start: int, prime: int, base: int) -> List[int]:
+    """Returns the prefix sums of values[i] * base^(start + i) modulo prime."""
+    sums = [0] * (len(values) + 1)
+    power = pow(base, start, prime)
+    total = 0
+    for chunk_start in range(0, len(values), CHUNK_SIZE):
+        chunk = read_slice(values, chunk_start, min(CHUNK_SIZE, len(values) - chunk_start))
+        for index, value in enumerate(chunk, chunk_start):
+            total = (total + value * power) % prime
+            power = power * base % prime
+            sums[index + 1] = total
+    return sums
+
+
+class _Fingerprint:
+    """Range sums of the output and of the direct evaluation for one prime and base."""
+
+    def __init__(self, list1: Sequence[int], list2: Sequence[int], columns: List[Tuple[int, int, int, int]],
+                 conv: Sequence[int], conv_min: int, prime: int, base: int):
+        self.prime = prime
+        self.columns = columns
+        self.conv_min = conv_min
+        self.output_sums = _weighted_prefix_sums(conv, conv_min, prime, base)
+        self.list2_sums = _weighted_prefix_sums(list2, 0, prime, base)
+        self.list1_terms = [sign * int(list1[x_index]) * pow(base, x_index, prime) % prime
+                            for x_index, _, _, sign in columns]
+
+    def output(self, low: int, high: int) -> int:
+        """The combination of the output indices low to high."""
+        low = min(max(low - self.conv_min, 0), len(self.output_sums) - 1)
+        high = min(max(high + 1 - self.conv_min, 0), len(self.output_sums) - 1)
+        return (self.output_sums[high] - self.output_sums[low]) % self.prime
+
+    def direct(self, low: int, high: int) -> int:
+        """The combination of the lattice points (x, y) of the polygon with low <= x + y <= high."""
+        total = 0
+        for term, (x_index, y_low, y_high, _) in zip(self.list1_terms, self.columns):
+            y_start, y_end = max(y_low, low - x_index), min(y_high, high - x_index)
+            if y_start <= y_end:
+                total += term * (self.list2_sums[y_end + 1] - self.list2_sums[y_start])
+        return total % self.prime
+
+    def mismatch(self, low: int, high: int) -> bool:
+        return self.output(low, high) != self.direct(low, high)
+
+    def localize(self, low: int, high: int) -> Tuple[int, int]:
+        """Narrows a mismatching index range down to its first and last mismatching index."""
+        first, last = low, high
+        while first < last:
+            middle = (first + last) // 2
+            if self.mismatch(first, middle):
+                last = middle
+            else:
+                first = middle + 1
+        start = first
+        first, last = start, high
+        while first < last:
+            middle = (first + last + 1) // 2
+            if self.mismatch(middle, last):
+                first = middle
+            else:
+                last = middle - 1
+        return start, last
+
+
+def verify_convolution(list1: Sequence[int], list2: Sequence[int], geometry: List[Point],
+                       conv: Sequence[int], conv_min: int, rounds: int = VERIFY_ROUNDS,
+                       rng: Optional[Any] = None):
+    """Checks a non-rectangular convolution of a simple polygon with random fingerprints.
+
+    Args:
+        list1 (Sequence[int]): The first list.
+        list2 (Sequence[int]): The second list.
+        geometry (List[Point]): The vertices of the polygon.
+        conv (Sequence[int]): The convolution to check.
+        conv_min (int): The offset of the first index of conv.
+        rounds (int): The number of independent checks, each with its own prime.
+        rng (Optional[Any]): The random number generator (default: a fresh random.Random).
+
+    Raises:
+        VerificationError: If a check fails.  Its index_range holds the first and
+            last output index (offset by conv_min) found to differ.
+    """
+
+    verify_pieces(list1, list2, polygon_pieces(geometry), conv, conv_min, rounds, rng)
+
+
+def verify_pieces(list1: Sequence[int], list2: Sequence[int], pieces: List[Tuple[List[Point], int]],
+                  conv: Sequence[int], conv_min: int, rounds: int = VERIFY_ROUNDS,
+                  rng: Optional[Any] = None):
+    """Checks a convolution with a region given as signed convex pieces, see verify_convolution."""
+
+    list1, list2 = as_sequence(list1), as_sequence(list2)
+    rng = random.Random() if rng is None else rng
+    columns = signed_columns(pieces, len(list1), len(list2))
+
+    indices = [x_index + y_low for x_index, y_low, _, _ in columns]
+    indices += [x_index + y_high for x_index, _, y_high, _ in columns]
+    if len(conv) > 0:
+        indices += [conv_min, conv_min + len(conv) - 1]
+    if not indices:
+        return
+    low, high = min(indices), max(indices)
+
+    for _ in range(rounds):
+        prime = random_prime(VERIFY_PRIME_BITS, rng)
+        fingerprint = _Fingerprint(list1, list2, columns, conv, conv_min, prime, rng.randrange(2, prime - 1))
+        if fingerprint.mismatch(low, high):
+            raise VerificationError(fingerprint.localize(low, high))
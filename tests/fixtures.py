@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+"""Geometries and random lists shared by the tests."""
+
+from fractions import Fraction
+
+TRIANGLE = [(Fraction(0), Fraction(0)), (Fraction(13, 2), Fraction(0)), (Fraction(0), Fraction(20, 3))]
+SQUARE = [(Fraction(1), Fraction(1)), (Fraction(5), Fraction(1)), (Fraction(5), Fraction(5)), (Fraction(1), Fraction(5))]
+
+POLYGON_13 = [(Fraction(3, 1), Fraction(0, 1)),
+              (Fraction(4, 1), Fraction(0, 1)),
+              (Fraction(11, 2), Fraction(1, 1)),
+              (Fraction(6, 1), Fraction(3, 2)),
+              (Fraction(7, 1), Fraction(3, 1)),
+              (Fraction(7, 1), Fraction(4, 1)),
+              (Fraction(6, 1), Fraction(6, 1)),
+              (Fraction(4, 1), Fraction(7, 1)),
+              (Fraction(3, 1), Fraction(7, 1)),
+              (Fraction(1, 1), Fraction(6, 1)),
+              (Fraction(0, 1), Fraction(4, 1)),
+              (Fraction(0, 1), Fraction(3, 1)),
+              (Fraction(1, 1), Fraction(1, 1))]
+
+POLYGON_12 = [(Fraction(3, 1), Fraction(0, 1)),
+              (Fraction(4, 1), Fraction(0, 1)),
+              (Fraction(6, 1), Fraction(1, 1)),
+              (Fraction(7, 1), Fraction(3, 1)),
+              (Fraction(7, 1), Fraction(4, 1)),
+              (Fraction(6, 1), Fraction(6, 1)),
+              (Fraction(4, 1), Fraction(7, 1)),
+              (Fraction(3, 1), Fraction(7, 1)),
+              (Fraction(1, 1), Fraction(6, 1)),
+              (Fraction(0, 1), Fraction(4, 1)),
+              (Fraction(0, 1), Fraction(3, 1)),
+              (Fraction(1, 1), Fraction(1, 1))]
+
+
+def polygon(*vertices):
+    return [(Fraction(x), Fraction(y)) for x, y in vertices]
+
+
+def random_list(rng, length):
+    return [rng.randint(-99, 99) for _ in range(length)]
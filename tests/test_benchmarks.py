@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+import unittest
+
+import nrconv
+
+from benchmarks import suite
+
+
+def brute_force_convex_polygon(list1, list2, geometry):
+    """Sums list1[x] * list2[y] over all lattice points (x, y) of a convex polygon."""
+    (x_min, y_min), (x_max, y_max) = nrconv.rectangle_inscribed_int(geometry)
+    conv = [0] * (x_max + y_max - x_min - y_min + 1)
+    edges = list(zip(geometry, geometry[1:] + geometry[:1]))
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            crosses = [(end[0] - start[0]) * (y - start[1]) - (end[1] - start[1]) * (x - start[0])
+                       for start, end in edges]
+            if all(cross >= 0 for cross in crosses) or all(cross <= 0 for cross in crosses):
+                conv[x + y - x_min - y_min] += list1[x] * list2[y]
+    return conv
+
+
+class TestBenchmarkFamilies(unittest.TestCase):
+    def test_families_match_brute_force(self):
+        list1, list2 = suite.create_inputs(12, 0)
+        prime = nrconv.create_ntt_prime(list1, list2)
+        for family, create_geometry in suite.FAMILIES.items():
+            geometry = create_geometry(12)
+            result, _ = nrconv.non_rectangular_convolution_convex_polygon(list1, list2, geometry, prime)
+            self.assertEqual(result, brute_force_convex_polygon(list1, list2, geometry), family)
+
+    def test_create_inputs_reproducible(self):
+        self.assertEqual(suite.create_inputs(20, 3), suite.create_inputs(20, 3))
+        self.assertNotEqual(suite.create_inputs(20, 3), suite.create_inputs(20, 4))
+
+
+class TestBenchmarkRun(unittest.TestCase):
+    def test_run_case(self):
+        result = suite.run_case("triangle_axis_aligned", 20, repeats=1)
+        self.assertEqual(result["family"], "triangle_axis_aligned")
+        self.assertGreater(result["seconds"], 0)
+        self.assertGreater(result["peak_bytes"], 0)
+        self.assertGreater(result["leaves"]["rectangle"], 0)
+
+    def test_run_suite(self):
+        results = suite.run_suite(["thin_sliver", "polygon_12"], [16], repeats=1, leaf_counts=False)
+        self.assertEqual(results["version"], suite.RESULTS_VERSION)
+        self.assertEqual(len(results["results"]), 2 * len(suite.ENTRY_POINTS))
+
+    def test_run_case_plan(self):
+        result = suite.run_case("polygon_13", 20, repeats=1, entry_point="plan")
+        self.assertEqual(result["entry_point"], "plan")
+        self.assertGreater(result["leaves"]["rectangle"], 0)
+
+
+class TestBenchmarkCompare(unittest.TestCase):
+    @staticmethod
+    def results(seconds):
+        return {"results": [{"family": "polygon_12", "length": 100, "seed": 0,
+                             "seconds": seconds, "peak_bytes": 1000}]}
+
+    def test_compare_flags_slowdown(self):
+        comparisons = suite.compare_results(self.results(1.0), self.results(1.5), threshold=1.1)
+        self.assertTrue(comparisons[0]["slowdown"])
+        self.assertAlmostEqual(comparisons[0]["ratio"], 1.5)
+
+    def test_compare_accepts_noise(self):
+        comparisons = suite.compare_results(self.results(1.0), self.results(1.05), threshold=1.1)
+        self.assertFalse(comparisons[0]["slowdown"])
+
+    def test_compare_skips_unknown_cases(self):
+        current = self.results(1.0)
+        current["results"][0]["length"] = 1000
+        self.assertEqual(suite.compare_results(self.results(1.0), current), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
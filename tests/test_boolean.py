@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+import random
+
+import unittest
+
+import nrconv
+from fixtures import POLYGON_13, polygon
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NON_CONVEX = polygon((0, 0), (30, 0), (30, 30), (15, 9), (0, 30))
+
+
+def bit_list(rng, length):
+    return [rng.randint(0, 1) for _ in range(length)]
+
+
+class TestBitPacked(unittest.TestCase):
+    def test_slice_bytes(self):
+        packed = nrconv.BitPackedSequence([1, 0, 1, 1, 0, 0, 1, 0])
+        self.assertEqual(packed.bits, 0b01001101)
+        self.assertEqual(packed.slice_bytes(1, 4), bytes([0, 1, 1, 0]))
+        self.assertEqual(packed.slice_bytes(0, 3, 3), bytes([1, 1, 1]))
+        self.assertEqual(packed.slice_bytes(7, 4, -2), bytes([0, 0, 1, 0]))
+        self.assertEqual(packed.slice_bytes(2, 3, 0), bytes([1, 1, 1]))
+
+    def test_rejects_non_binary(self):
+        for values in ([0, 2, 1], [1, -1], [0.5]):
+            with self.assertRaises(ValueError):
+                nrconv.BitPackedSequence(values)
+
+    def test_boolean_product(self):
+        rng = random.Random(1)
+        values1, values2 = bit_list(rng, 300), bit_list(rng, 70)
+        want = [0] * 369
+        for index1, value1 in enumerate(values1):
+            for index2, value2 in enumerate(values2):
+                want[index1 + index2] += value1 * value2
+        self.assertEqual(nrconv.boolean_product(bytes(values1), bytes(values2)), want)
+        self.assertEqual(nrconv.boolean_product(bytes([1] * 300), bytes([1] * 300))[299], 300)
+
+
+class TestBooleanEngine(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        self.list1 = bit_list(rng, 40)
+        self.list2 = bit_list(rng, 40)
+
+    def test_matches_dense(self):
+        for geometry in (POLYGON_13, NON_CONVEX, polygon((0, 0), (30, 0), (0, 30))):
+            want = nrconv.non_rectangular_convolution(self.list1, self.list2, geometry, engine="dense")
+            got = nrconv.non_rectangular_convolution(self.list1, self.list2, geometry, engine="boolean")
+            self.assertEqual(got, want)
+
+    def test_symmetric_and_budget(self):
+        geometry = polygon((0, 0), (30, 0), (30, 30), (0, 30))
+        want = nrconv.non_rectangular_convolution(self.list1, self.list1, geometry, engine="dense")
+        got = nrconv.non_rectangular_convolution(self.list1, self.list1, geometry, engine="boolean",
+                                                 max_memory=20000, verify=True)
+        self.assertEqual(got, want)
+
+    def test_region(self):
+        union = [polygon((0, 0), (20, 0), (0, 20)), polygon((5, 5), (25, 5), (25, 25), (5, 25))]
+        difference = [polygon((8, 8), (12, 8), (12, 12))]
+        want = nrconv.non_rectangular_convolution_region(self.list1, self.list2, union, difference, engine="dense")
+        got = nrconv.non_rectangular_convolution_region(self.list1, self.list2, union, difference, engine="boolean")
+        self.assertEqual(got, want)
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_numpy_input(self):
+        want = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13)
+        got = nrconv.non_rectangular_convolution(numpy.array(self.list1, dtype=numpy.int8),
+                                                 numpy.array(self.list2, dtype=numpy.int64), POLYGON_13,
+                                                 engine="boolean")
+        self.assertEqual(got, want)
+        with self.assertRaises(ValueError):
+            nrconv.non_rectangular_convolution(numpy.array([0, 3]), numpy.array([1, 1]), POLYGON_13, engine="boolean")
+
+    def test_tracing(self):
+        tracer = nrconv.Tracer()
+        with nrconv.trace(tracer):
+            nrconv.execute_plan(self.list1, self.list2, nrconv.compile_plan(POLYGON_13), engine="boolean")
+        spans = [span for span in tracer.root.walk() if span is not tracer.root]
+        self.assertTrue(spans)
+        self.assertTrue(all(span.attributes.get("engine") == "boolean" for span in spans))
+
+
+if __name__ == '__main__':
+    unittest.main()
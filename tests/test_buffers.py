@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+import array
+import os
+import random
+import tempfile
+
+import unittest
+
+import nrconv
+from fixtures import POLYGON_12
+from nrconv.buffers import accumulate, as_sequence, max_abs, read_slice
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestReadSlice(unittest.TestCase):
+    def test_read_slice_steps(self):
+        data = list(range(10))
+        self.assertEqual(read_slice(data, 2, 3), [2, 3, 4])
+        self.assertEqual(read_slice(data, 1, 3, 3), [1, 4, 7])
+        self.assertEqual(read_slice(data, 7, 4, -2), [7, 5, 3, 1])
+        self.assertEqual(read_slice(data, 3, 0, -2), [])
+        self.assertEqual(read_slice(data, 5, 3, 0), [5, 5, 5])
+
+    def test_read_slice_buffer(self):
+        data = as_sequence(array.array("q", [-3, 1, 4, -1, 5]))
+        self.assertEqual(read_slice(data, 4, 3, -2), [5, 4, -3])
+        self.assertEqual(max_abs(data), 5)
+
+    def test_accumulate_list(self):
+        conv = [0] * 5
+        accumulate(conv, 4, [1, 2, 3], -2)
+        accumulate(conv, 1, [5, 5], 0)
+        self.assertEqual(conv, [3, 10, 2, 0, 1])
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestMemoryMapped(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(5)
+        self.list1 = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(8)]
+        self.list2 = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(8)]
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def memmap(self, name, values):
+        path = os.path.join(self.directory.name, name)
+        mapped = numpy.memmap(path, dtype=numpy.int64, mode="w+", shape=(len(values),))
+        mapped[:] = values
+        return mapped
+
+    def test_memmap_input(self):
+        want = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_12)
+        got = nrconv.non_rectangular_convolution(self.memmap("list1", self.list1),
+                                                 self.memmap("list2", self.list2), POLYGON_12, max_memory=2000)
+        self.assertEqual(got, want)
+        self.assertTrue(all(type(value) is int for value in got[0]))
+
+    def test_memmap_output(self):
+        want, want_min = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_12)
+        out = self.memmap("out", [7] * (len(want) + 2))
+        got, got_min = nrconv.non_rectangular_convolution(self.memmap("list1", self.list1),
+                                                          self.memmap("list2", self.list2), POLYGON_12, out=out)
+        self.assertIs(got, out)
+        self.assertEqual(got_min, want_min)
+        self.assertEqual(out[:len(want)].tolist(), want)
+        self.assertEqual(out[len(want):].tolist(), [7, 7])
+
+    def test_output_too_small(self):
+        with self.assertRaises(IndexError):
+            nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_12, out=numpy.zeros(3, dtype=numpy.int64))
+
+    def test_recursive_memmap_input(self):
+        ntt_prime = nrconv.create_ntt_prime(self.list1, self.list2)
+        want = nrconv.non_rectangular_convolution_convex_polygon(self.list1, self.list2, POLYGON_12, ntt_prime)
+        got = nrconv.non_rectangular_convolution_convex_polygon(self.memmap("list1", self.list1),
+                                                                self.memmap("list2", self.list2), POLYGON_12, ntt_prime)
+        self.assertEqual(got, want)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+
+import os
+import random
+import tempfile
+from fractions import Fraction
+
+import unittest
+
+import nrconv
+from fixtures import SQUARE, TRIANGLE, random_list
+from nrconv.cache import ResultCache, content_hash, result_bytes
+from nrconv.convolution import non_rectangular_convolution_convex_polygon
+from nrconv.plan import non_rectangular_convolution
+from nrconv.primes import create_ntt_prime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestResultCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        rng = random.Random(1)
+        list1, list2 = random_list(rng, 9), random_list(rng, 8)
+        cache = ResultCache()
+        expected = non_rectangular_convolution(list1, list2, TRIANGLE)
+        self.assertEqual(non_rectangular_convolution(list1, list2, TRIANGLE, cache=cache), expected)
+        conv, _ = non_rectangular_convolution(list(list1), list2, TRIANGLE[::-1], cache=cache)
+        self.assertEqual(conv, expected[0])
+        conv[0] += 1  # results are copies of the cached entries
+        self.assertEqual(non_rectangular_convolution(list1, list2, TRIANGLE, cache=cache), expected)
+        self.assertEqual(non_rectangular_convolution(list1, list2, SQUARE, cache=cache),
+                         non_rectangular_convolution(list1, list2, SQUARE))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 2, 2))
+
+        out = [7] * 20
+        self.assertIs(non_rectangular_convolution(list1, list2, TRIANGLE, out=out, cache=cache)[0], out)
+        self.assertEqual(out[:len(expected[0])], expected[0])
+
+        ntt_prime = create_ntt_prime(list1, list2)
+        self.assertEqual(non_rectangular_convolution_convex_polygon(list1, list2, SQUARE, ntt_prime, cache=cache),
+                         non_rectangular_convolution(list1, list2, SQUARE))
+        self.assertEqual(cache.stats()["hits"], 4)
+
+    def test_lru_eviction(self):
+        rng = random.Random(2)
+        lists = [(random_list(rng, 9), random_list(rng, 8)) for _ in range(3)]
+        size = result_bytes(non_rectangular_convolution(*lists[0], TRIANGLE)[0])
+        cache = ResultCache(max_bytes=2 * size + size // 2)
+        for list1, list2 in lists[:2] + lists[:1] + lists[2:]:
+            cache.convolve(list1, list2, TRIANGLE)
+        # the second pair was the least recently used one
+        cache.convolve(*lists[0], TRIANGLE)
+        cache.convolve(*lists[1], TRIANGLE)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 4, 2))
+        self.assertLessEqual(stats["bytes"], cache.max_bytes)
+
+    def test_disk_tier(self):
+        list1, list2 = [1 << 70, -3, 5, 2, 9, 1], [4, 1, -1, 7, 3, 2, 2]
+        with tempfile.TemporaryDirectory() as directory:
+            expected = ResultCache(directory=directory).convolve(list1, list2, TRIANGLE)
+            self.assertEqual(expected, non_rectangular_convolution(list1, list2, TRIANGLE))
+            cache = ResultCache(max_bytes=0, directory=directory)
+            self.assertEqual(cache.convolve(list1, list2, TRIANGLE), expected)
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+            self.assertEqual(len(cache), 0)
+            with open(os.path.join(directory, os.listdir(directory)[0]), "w") as file:
+                file.write("{")
+            self.assertEqual(cache.convolve(list1, list2, TRIANGLE), expected)
+            self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_leaves(self):
+        rng = random.Random(3)
+        list1, list2 = random_list(rng, 200), random_list(rng, 200)
+        first = [(Fraction(0), Fraction(0)), (Fraction(150), Fraction(0)), (Fraction(0), Fraction(150))]
+        second = [(Fraction(0), Fraction(0)), (Fraction(151), Fraction(0)), (Fraction(0), Fraction(150))]
+        cache = ResultCache(leaves=True)
+        for geometry in [first, second]:
+            self.assertEqual(cache.convolve(list1, list2, geometry), non_rectangular_convolution(list1, list2, geometry))
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 2)
+        self.assertGreater(stats["leaf_hits"], 0)
+        self.assertGreater(stats["leaf_misses"], 0)
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_content_hash(self):
+        values = [3, -1, 4, 1, 5]
+        digest = content_hash(values)
+        for dtype in [numpy.int8, numpy.int32, numpy.int64]:
+            self.assertEqual(content_hash(numpy.array(values, dtype=dtype)), digest)
+        self.assertEqual(content_hash(numpy.array(values, dtype=numpy.int64)[::-1][::-1]), digest)
+        self.assertNotEqual(content_hash(values[:-1]), digest)
+        self.assertNotEqual(content_hash([1 << 64]), content_hash([0]))
+        self.assertEqual(content_hash(numpy.array([1 << 63], dtype=numpy.uint64)), content_hash([1 << 63]))
+        self.assertEqual(nrconv.result_key(values, values, TRIANGLE), nrconv.result_key(values, values, TRIANGLE[::-1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
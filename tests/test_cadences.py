@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+import unittest
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from cadences import experiments
+from cadences.counting import count_cadences
+from cadences.generator import (cadence_index_plausibility, check_cadence, check_partial_cadence,
+                                make_4_cadence_free, reduce_non_partial_4_cadences)
+
+
+def brute_force_counts(list_string, length_cadence, partial, by):
+    counts = [0] * len(list_string)
+    for start in range(len(list_string)):
+        for distance in range(1, len(list_string)):
+            if check_partial_cadence(list_string, start, distance, length_cadence, partial):
+                counts[distance if by == "distance" else start + (0 if by == "start" else by) * distance] += 1
+    return counts
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestVectorized(unittest.TestCase):
+    def test_plausibility_mask(self):
+        from cadences.vectorized import cadence_plausibility_mask
+        starts, distances = numpy.meshgrid(numpy.arange(-2, 12), numpy.arange(1, 12), indexing="ij")
+        mask = cadence_plausibility_mask(starts, distances, 4, 30)
+        for start, distance, plausible in zip(starts.ravel(), distances.ravel(), mask.ravel()):
+            self.assertEqual(plausible, cadence_index_plausibility(int(start), int(distance), 4, 30))
+
+    def test_make_4_cadence_free(self):
+        from cadences.vectorized import make_4_cadence_free_vectorized
+        for length in (1, 6, 7, 20, 49, 100, 300):
+            random.seed(length)
+            want = make_4_cadence_free(length)
+            random.seed(length)
+            self.assertEqual(make_4_cadence_free_vectorized(length), want)
+
+    def test_reduce_non_partial_4_cadences(self):
+        from cadences.vectorized import reduce_non_partial_4_cadences_vectorized
+        random.seed(3)
+        for base in (make_4_cadence_free(210), [random.randint(0, 1) for _ in range(140)]):
+            want = reduce_non_partial_4_cadences(list(base))
+            got = list(base)
+            self.assertIs(reduce_non_partial_4_cadences_vectorized(got), got)
+            self.assertEqual(got, want)
+            self.assertEqual(reduce_non_partial_4_cadences_vectorized(got), reduce_non_partial_4_cadences(want))
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestBitsets(unittest.TestCase):
+    def test_bitset(self):
+        from cadences.bitsets import Bitset
+        rng = random.Random(12)
+        values = [rng.randint(0, 2) for _ in range(200)]
+        bitset = Bitset.from_list(values, 2)
+        self.assertEqual(bitset.to_list(), [1 if value == 2 else 0 for value in values])
+        self.assertEqual(bitset.count(), values.count(2))
+        for offset, count in ((0, 64), (3, 100), (130, 70), (190, 30), (250, 5)):
+            want = [1 if offset + index < 200 and values[offset + index] == 2 else 0 for index in range(count)]
+            part = Bitset(count)
+            part.deposit_or(0, bitset.extract(offset, count), count)
+            self.assertEqual(part.to_list(), want)
+        bitset.clear(5)
+        self.assertFalse(bitset.test(5))
+        copy = Bitset(200)
+        copy.deposit_or(37, Bitset.from_list(values[37:], 2).words, 163)
+        self.assertEqual(copy.to_list()[37:], bitset.to_list()[37:])
+
+    def test_make_4_cadence_free(self):
+        from cadences.bitsets import make_4_cadence_free_bitset
+        for length in (1, 7, 48, 301):
+            random.seed(length)
+            want = make_4_cadence_free(length)
+            random.seed(length)
+            self.assertEqual(make_4_cadence_free_bitset(length).to_list(), want)
+        self.assertEqual(make_4_cadence_free_bitset(301, random.Random(2)).to_list(),
+                         make_4_cadence_free(301, random.Random(2)))
+
+    def test_reduce_non_partial_4_cadences(self):
+        from cadences.bitsets import Bitset, reduce_non_partial_4_cadences_bitset
+        random.seed(13)
+        for base in (make_4_cadence_free(350), [random.randint(0, 1) for _ in range(203)]):
+            want = reduce_non_partial_4_cadences(list(base))
+            reduced = reduce_non_partial_4_cadences_bitset(Bitset.from_list(base))
+            self.assertEqual(reduced.to_list(), want)
+            self.assertEqual(reduced.count(), sum(want))
+
+
+class TestRepair(unittest.TestCase):
+    def test_index(self):
+        from cadences.repair import CadenceIndex
+        values = [1, 1, 1, 1, 0, 1, 1]
+        index = CadenceIndex(values, [(0, 1), (2, 2), (1, 2)], [0, 1, 2])
+        self.assertEqual([index.is_live(cadence) for cadence in range(3)], [True, False, True])
+        self.assertEqual((index.live_count, index.hits[1], index.hits[2]), (2, 2, 1))
+        self.assertEqual(index.set(1, 0), [0, 2])
+        self.assertEqual((index.live_count, index.hits[0], values[1]), (0, 0, 0))
+        self.assertEqual(index.set(4, 1), [1])
+        self.assertEqual(index.set(4, 1), [])
+        self.assertEqual(index.set(1, 1), [0, 2])
+        self.assertEqual((index.live_count, index.hits[2], index.flips), (3, 2, 3))
+
+    def test_make_4_cadence_free(self):
+        from cadences.repair import make_4_cadence_free_incremental
+        for length in (1, 7, 48, 301):
+            random.seed(length)
+            want = make_4_cadence_free(length)
+            random.seed(length)
+            self.assertEqual(make_4_cadence_free_incremental(length), want)
+        self.assertEqual(make_4_cadence_free_incremental(301, random.Random(2)),
+                         make_4_cadence_free(301, random.Random(2)))
+
+    def test_greedy(self):
+        from cadences.repair import block_cadences, make_4_cadence_free_greedy
+        for length in (7, 50, 301):
+            greedy = make_4_cadence_free_greedy(length)
+            self.assertFalse(any(check_cadence(greedy, 1, start, distance, 4)
+                                 for start, distance in block_cadences(len(greedy))))
+            random.seed(length)
+            self.assertGreaterEqual(sum(greedy), sum(make_4_cadence_free(length)))
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestGeneral(unittest.TestCase):
+    @staticmethod
+    def present(values, length_cadence, period, blocks, partial):
+        from cadences.general import block_structure
+        _, _, length_block = block_structure(len(values), length_cadence, period, blocks)
+        return [(start, distance) for distance_raw in range(length_block) for start in range(length_block)
+                for distance in (period * length_block + distance_raw, period * length_block - distance_raw)
+                if check_partial_cadence(values, start, distance, length_cadence, partial)]
+
+    def test_cadence_free(self):
+        from cadences.general import make_k_cadence_free_batch
+        for length_cadence, period, blocks, partial in ((4, 2, None, None), (3, 2, None, None), (5, 3, None, None),
+                                                        (4, 2, 9, None), (4, 2, None, [0, 1, 2])):
+            for length in (1, 30, 200):
+                batch = make_k_cadence_free_batch(3, length, length_cadence, numpy.random.default_rng(length),
+                                                  period, blocks, partial)
+                self.assertEqual(batch.shape[1] % (blocks or period * (length_cadence - 1) + 1), 0)
+                for values in batch.tolist():
+                    self.assertEqual(self.present(values, length_cadence, period, blocks,
+                                                  partial or list(range(length_cadence))), [])
+
+    def test_seeded(self):
+        from cadences.general import make_k_cadence_free, make_k_cadence_free_batch
+        first = make_k_cadence_free_batch(4, 300, 5, numpy.random.default_rng(3))
+        second = make_k_cadence_free_batch(4, 300, 5, numpy.random.default_rng(3))
+        self.assertEqual(first.tolist(), second.tolist())
+        self.assertEqual(make_k_cadence_free(300, 5, numpy.random.default_rng(3)),
+                         make_k_cadence_free_batch(1, 300, 5, numpy.random.default_rng(3))[0].tolist())
+
+    def test_invalid_arguments(self):
+        from cadences.general import make_k_cadence_free_batch
+        with self.assertRaises(ValueError):
+            make_k_cadence_free_batch(1, 50, 1)
+        with self.assertRaises(ValueError):
+            make_k_cadence_free_batch(1, 50, 4, period=0)
+        with self.assertRaises(ValueError):
+            make_k_cadence_free_batch(1, 50, 4, partial=[0, 4])
+
+
+class TestCounting(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(9)
+        self.strings = [[rng.randint(0, 1) for _ in range(length)] for length in (1, 5, 23, 58)]
+
+    def test_pairs(self):
+        for list_string in self.strings:
+            for partial in ([0, 3], [1, 2], [0, 1]):
+                for by in ("start", "distance", 1, 3):
+                    self.assertEqual(count_cadences(list_string, 1, 4, partial, by, method="convolution"),
+                                     brute_force_counts(list_string, 4, partial, by))
+
+    def test_triples(self):
+        for list_string in self.strings:
+            for partial, by in (([0, 1, 2], "start"), ([0, 1, 3], 1), ([0, 2, 3], 2), ([1, 2, 3], 3)):
+                self.assertEqual(count_cadences(list_string, 1, 4, partial, by, method="convolution"),
+                                 brute_force_counts(list_string, 4, partial, by))
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_direct(self):
+        list_string = self.strings[-1]
+        for partial, by in (([0, 1, 2, 3], "start"), ([0, 1, 2], "distance"), ([1, 2, 3], "start"), ([0, 3], 1)):
+            self.assertEqual(count_cadences(list_string, 1, 4, partial, by),
+                             brute_force_counts(list_string, 4, partial, by))
+        inverted = [1 - value for value in list_string]
+        self.assertEqual(count_cadences(list_string, 0, 3, by="distance"),
+                         brute_force_counts(inverted, 3, [0, 1, 2], "distance"))
+
+    def test_without_numpy(self):
+        with mock.patch.dict(sys.modules, {"numpy": None}):
+            for list_string in self.strings:
+                for partial, by in ((None, "start"), ([0, 1, 2, 3], "distance"), ([0, 2, 3], 1), ([1, 3], 2)):
+                    self.assertEqual(count_cadences(list_string, 1, 4, partial, by),
+                                     brute_force_counts(list_string, 4, partial or [0, 1, 2, 3], by))
+                    self.assertEqual(count_cadences(list_string, 1, 4, partial, by, method="direct"),
+                                     brute_force_counts(list_string, 4, partial or [0, 1, 2, 3], by))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            count_cadences([1, 0, 1], 1, 4, by=4)
+        with self.assertRaises(ValueError):
+            count_cadences([1, 0, 1], 1, 4, [0, 4])
+        with self.assertRaises(ValueError):
+            count_cadences([1, 0, 1], 1, 4, method="fft")
+
+
+class TestExperiments(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "sweep")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def rows(self, path):
+        results = experiments.load_results(path)
+        return sorted(zip(*(results[name] for name in experiments.columns())))
+
+    def test_rng_parameter(self):
+        random.seed(4)
+        want = make_4_cadence_free(70)
+        self.assertEqual(make_4_cadence_free(70, random.Random(11)), make_4_cadence_free(70, random.Random(11)))
+        random.seed(4)
+        self.assertEqual(make_4_cadence_free(70), want)
+
+    def test_sweep_is_deterministic(self):
+        lengths = list(range(7, 50, 7))
+        serial = list(experiments.run_sweep(self.path, lengths, [0, 1]))
+        self.assertEqual(len(serial), 14)
+        other = os.path.join(self.directory.name, "parallel")
+        list(experiments.run_sweep(other, lengths, [0, 1], workers=2))
+        self.assertEqual(self.rows(other), self.rows(self.path))
+        self.assertEqual(serial[0], experiments.run_task(7, 0))
+
+    def test_resume(self):
+        list(experiments.run_sweep(self.path, [7, 14], [0]))
+        # an interrupted append leaves a partial row behind
+        with open(os.path.join(self.path, "length.i8"), "ab") as file:
+            file.write(bytes(8))
+        self.assertEqual(len(experiments.load_results(self.path)["length"]), 2)
+        self.assertEqual(experiments.pending_tasks(self.path, [7, 14, 21], [0, 1]), [(7, 1), (14, 1), (21, 0), (21, 1)])
+        resumed = list(experiments.run_sweep(self.path, [7, 14, 21], [0, 1]))
+        self.assertEqual(len(resumed), 4)
+        self.assertEqual(len(self.rows(self.path)), 6)
+        self.assertEqual(list(experiments.run_sweep(self.path, [7, 14, 21], [0, 1])), [])
+
+    def test_other_reductions(self):
+        list(experiments.run_sweep(self.path, list(range(7, 71, 7)), [0]))
+        with self.assertRaises(ValueError):
+            list(experiments.run_sweep(self.path, [7, 14], [0], reductions=4))
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            experiments.main(["run", self.path, "--lengths", "7", "14", "--reductions", "4", "--quiet"])
+        self.assertEqual(len(self.rows(self.path)), 10)
+
+    def test_inconsistent_columns(self):
+        list(experiments.run_sweep(self.path, [7, 14], [0]))
+        with open(os.path.join(self.path, "base.i8"), "ab") as file:
+            file.write(bytes(16))
+        with self.assertRaises(ValueError):
+            experiments.ResultWriter(self.path)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "seed.i8")), 16)
+
+    def test_import_without_matplotlib(self):
+        code = "import sys, cadences; sys.exit('matplotlib' in sys.modules)"
+        self.assertEqual(subprocess.run([sys.executable, "-c", code]).returncode, 0)
+
+    def test_plot(self):
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            self.skipTest("requires matplotlib")
+        list(experiments.run_sweep(self.path, [7, 14], [0]))
+        output = os.path.join(self.directory.name, "sweep.png")
+        self.assertEqual(experiments.main(["plot", self.path, "--output", output]), 0)
+        self.assertGreater(os.path.getsize(output), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
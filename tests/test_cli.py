@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+import io
+import json
+import os
+import random
+import tempfile
+from contextlib import redirect_stdout
+from fractions import Fraction
+
+import unittest
+
+import nrconv
+from nrconv.cli import main, parse_geometry, read_jobs
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TRIANGLE = [[0, 0], ["13/2", 0], [0, "20/3"]]
+
+
+class TestParseGeometry(unittest.TestCase):
+    def test_parse_rational_vertices(self):
+        self.assertEqual(parse_geometry(TRIANGLE),
+                         [(Fraction(0), Fraction(0)), (Fraction(13, 2), Fraction(0)), (Fraction(0), Fraction(20, 3))])
+
+    def test_reject_floats(self):
+        with self.assertRaises(ValueError):
+            parse_geometry([[0.5, 0]])
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = random.Random(3)
+        self.list1 = [rng.randint(-99, 99) for _ in range(8)]
+        self.list2 = [rng.randint(-99, 99) for _ in range(8)]
+        numpy.save(self.path("list1.npy"), numpy.array(self.list1, dtype=numpy.int64))
+        numpy.array(self.list2, dtype="<i4").tofile(self.path("list2.bin"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write_jobs(self, count):
+        with open(self.path("jobs.jsonl"), "w", encoding="utf-8") as file:
+            for index in range(count):
+                file.write(json.dumps({"id": f"job{index}", "list1": "list1.npy", "list2": "list2.bin",
+                                       "dtype": "<i4", "geometry": TRIANGLE, "output": f"out{index}.npy"}) + "\n")
+
+    def run_main(self, *options):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.assertEqual(main([self.path("jobs.jsonl"), *options]), 0)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_jobs(self):
+        self.write_jobs(3)
+        want, want_min = nrconv.non_rectangular_convolution(self.list1, self.list2, parse_geometry(TRIANGLE))
+        summaries = self.run_main()
+        self.assertEqual([summary["id"] for summary in summaries], ["job0", "job1", "job2"])
+        for index, summary in enumerate(summaries):
+            self.assertEqual(summary["conv_min"], want_min)
+            self.assertEqual(numpy.load(self.path(f"out{index}.npy")).tolist(), want)
+
+    def test_workers_and_profile(self):
+        self.write_jobs(3)
+        summaries = self.run_main("--workers", "2", "--profile")
+        self.assertEqual([summary["id"] for summary in summaries], ["job0", "job1", "job2"])
+        self.assertIn("execute", summaries[0]["profile"]["kinds"])
+
+    def test_plan_cache(self):
+        self.write_jobs(2)
+        self.run_main("--plan-cache", self.path("plans"))
+        self.assertEqual(os.listdir(self.path("plans")), [nrconv.geometry_hash(parse_geometry(TRIANGLE)) + ".plan"])
+
+    def test_symmetric_non_convex(self):
+        geometry = [[0, 0], [7, 0], [7, 2], [4, 2], [4, 4], [5, 5], [2, 4], [2, 7], [0, 7]]
+        with open(self.path("jobs.jsonl"), "w", encoding="utf-8") as file:
+            file.write(json.dumps({"id": "job", "list1": "list1.npy", "list2": "list1.npy",
+                                   "geometry": geometry, "output": "out.npy"}) + "\n")
+        summary, = self.run_main()
+        want, want_min = nrconv.non_rectangular_convolution(self.list1, list(self.list1), parse_geometry(geometry))
+        self.assertEqual((numpy.load(self.path("out.npy")).tolist(), summary["conv_min"]), (want, want_min))
+
+    def test_missing_key(self):
+        with open(self.path("jobs.json"), "w", encoding="utf-8") as file:
+            json.dump([{"list1": "list1.npy", "list2": "list2.bin"}], file)
+        with self.assertRaises(ValueError):
+            read_jobs(self.path("jobs.json"))
+
+
+if __name__ == '__main__':
+    unittest.main()
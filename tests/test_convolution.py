@@ -171,6 +171,16 @@ class TestRectangleCase(unittest.TestCase):
         want = 3
         self.assertEqual(result, want)
 
+    def test_non_rectangular_convolution_rectangle_negative(self):
+        list1 = [1, -1, 2, -2, 3, -3, 4, -4]
+        list2 = [-1, 1, -1, 1, -1, 1, -1, 1]
+        geometry = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(2, 1), Fraction(1, 1))]
+        prime = nrconv.create_ntt_prime(list1, list2)
+        result, _ = nrconv.convolution.non_rectangular_convolution_rectangle(
+            list1, list2, geometry, prime)
+        want = [-1, 2, -3, 2]
+        self.assertEqual(result, want)
+
 
 class TestAxisAlignedTriangleCase(unittest.TestCase):
     def test_non_rectangular_convolution_triangle_axis_aligned_degenerated1(
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+import random
+
+import unittest
+
+import nrconv
+from fixtures import POLYGON_13, polygon
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def engines(tracer):
+    return [span.attributes.get("engine") for span in tracer.root.walk() if span is not tracer.root]
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestFixedWidth(unittest.TestCase):
+    def test_as_int64(self):
+        self.assertEqual(nrconv.as_int64([1, -2, 3]).dtype, numpy.int64)
+        self.assertIsNone(nrconv.as_int64([1, 2 ** 63]))
+        self.assertIsNone(nrconv.as_int64([-2 ** 63]))
+        self.assertIsNone(nrconv.as_int64(numpy.array([2 ** 64 - 1], dtype=numpy.uint64)))
+        self.assertIsNone(nrconv.as_int64(numpy.array([1.0])))
+
+    def test_int64_convolution(self):
+        rng = numpy.random.default_rng(3)
+        values1 = rng.integers(-1000, 1000, 500)
+        values2 = rng.integers(-1000, 1000, 300)
+        want = nrconv.convolution_ntt(values1.tolist(), values2.tolist(), nrconv.create_ntt_prime(values1, values2))
+        prime = nrconv.create_ntt_prime(values1, values2)
+        want = [value - prime if 2 * value > prime else value for value in want]
+        self.assertTrue(nrconv.fft_is_exact(1000, 1000, 500, 300))
+        self.assertEqual(nrconv.int64_convolution(values1, values2, 1000, 1000).tolist(), want)
+        self.assertFalse(nrconv.fft_is_exact(2 ** 30, 2 ** 30, 500, 300))
+        self.assertIsNone(nrconv.int64_convolution(values1, values2, 2 ** 30, 2 ** 30))
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestInt64Engine(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(6)
+        self.list1 = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(200)]
+        self.list2 = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(200)]
+
+    def test_matches_dense(self):
+        for geometry in (POLYGON_13, polygon((0, 0), (190, 0), (0, 190)),
+                         polygon((0, 0), (150, 0), (150, 150), (70, 40), (0, 150))):
+            want = nrconv.non_rectangular_convolution(self.list1, self.list2, geometry, engine="dense")
+            got = nrconv.non_rectangular_convolution(self.list1, self.list2, geometry, engine="int64", verify=True)
+            self.assertEqual(got, want)
+            self.assertTrue(all(type(value) is int for value in got[0]))
+
+    def test_leaf_promotion(self):
+        # the largest rectangle leaves are too large for an exact FFT, but the output fits into int64
+        rng = random.Random(7)
+        list1 = [rng.randint(-2 ** 24, 2 ** 24) for _ in range(600)]
+        list2 = [rng.randint(-2 ** 24, 2 ** 24) for _ in range(600)]
+        geometry = polygon((0, 0), (590, 0), (0, 590))
+        want = nrconv.non_rectangular_convolution(list1, list2, geometry, engine="dense")
+        tracer = nrconv.Tracer()
+        with nrconv.trace(tracer):
+            got = nrconv.non_rectangular_convolution(list1, list2, geometry, engine="int64")
+        self.assertEqual(got, want)
+        self.assertIn("int64", engines(tracer))
+        self.assertIn("dense", engines(tracer))
+
+    def test_query_promotion(self):
+        # the bound exceeds int64, so the whole query runs exactly
+        list1 = [value * 2 ** 40 for value in self.list1]
+        want = nrconv.non_rectangular_convolution(list1, self.list2, POLYGON_13, engine="dense")
+        tracer = nrconv.Tracer()
+        with nrconv.trace(tracer):
+            got = nrconv.non_rectangular_convolution(list1, self.list2, POLYGON_13, engine="int64")
+        self.assertEqual(got, want)
+        self.assertNotIn("int64", engines(tracer))
+        self.assertNotIn("dense", engines(tracer))
+        big = [2 ** 70, -1, 3, 0, 5, 2, -7, 1]
+        self.assertEqual(nrconv.non_rectangular_convolution(big, big, POLYGON_13, engine="int64"),
+                         nrconv.non_rectangular_convolution(big, big, POLYGON_13, engine="dense"))
+
+    def test_output_and_budget(self):
+        want, want_min = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13)
+        out = numpy.full(len(want) + 2, 7, dtype=numpy.int64)
+        got, got_min = nrconv.non_rectangular_convolution(numpy.array(self.list1), numpy.array(self.list2), POLYGON_13,
+                                                          out=out, engine="int64", max_memory=5000)
+        self.assertIs(got, out)
+        self.assertEqual((out[:len(want)].tolist(), got_min), (want, want_min))
+        self.assertEqual(out[len(want):].tolist(), [7, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -85,3 +85,43 @@ class TestOpposingRectVertex(unittest.TestCase):
         expected = (Fraction(9, 10), Fraction(39, 10))
         actual = nrconv.opposing_rect_vertex(reference, diag_start, diag_end)
         self.assertEqual(expected, actual)
+
+class TestCanonicalGeometry(unittest.TestCase):
+    def test_canonical_geometry_rotation_and_reflection(self):
+        polygon = [(Fraction(3, 1), Fraction(0, 1)), (Fraction(7, 2), Fraction(4, 1)), (Fraction(0, 1), Fraction(1, 3))]
+        rotated = polygon[1:] + polygon[:1]
+        reflected = polygon[::-1]
+        want = [(Fraction(0, 1), Fraction(1, 3)), (Fraction(3, 1), Fraction(0, 1)), (Fraction(7, 2), Fraction(4, 1))]
+        self.assertEqual(nrconv.canonical_geometry(rotated), want)
+        self.assertEqual(nrconv.canonical_geometry(reflected), want)
+        self.assertEqual(nrconv.geometry_hash(rotated), nrconv.geometry_hash(reflected))
+
+    def test_geometry_hash_differs(self):
+        triangle = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(2, 1), Fraction(0, 1)), (Fraction(0, 1), Fraction(2, 1))]
+        moved = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(2, 1), Fraction(0, 1)), (Fraction(0, 1), Fraction(3, 1))]
+        self.assertNotEqual(nrconv.geometry_hash(triangle), nrconv.geometry_hash(moved))
+
+
+class TestClipHalfPlane(unittest.TestCase):
+    def test_clip_half_plane_triangle(self):
+        triangle = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(4, 1), Fraction(0, 1)), (Fraction(0, 1), Fraction(4, 1))]
+        clipped = nrconv.clip_half_plane(triangle, Fraction(1, 1), Fraction(0, 1), Fraction(1, 1))
+        want = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(1, 1), Fraction(0, 1)), (Fraction(1, 1), Fraction(3, 1)),
+                (Fraction(0, 1), Fraction(4, 1))]
+        self.assertEqual(clipped, want)
+
+    def test_clip_half_plane_degenerate(self):
+        square = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(2, 1), Fraction(0, 1)), (Fraction(2, 1), Fraction(2, 1)),
+                  (Fraction(0, 1), Fraction(2, 1))]
+        diagonal = nrconv.clip_half_plane(nrconv.clip_half_plane(square, Fraction(-1, 1), Fraction(1, 1), Fraction(0, 1)),
+                                          Fraction(1, 1), Fraction(-1, 1), Fraction(0, 1))
+        self.assertEqual(diagonal, [(Fraction(0, 1), Fraction(0, 1)), (Fraction(2, 1), Fraction(2, 1))])
+        corner = nrconv.clip_half_plane(square, Fraction(1, 1), Fraction(1, 1), Fraction(0, 1))
+        self.assertEqual(corner, [(Fraction(0, 1), Fraction(0, 1))])
+        self.assertEqual(nrconv.clip_half_plane(square, Fraction(1, 1), Fraction(1, 1), Fraction(-1, 1)), [])
+
+    def test_is_diagonal_symmetric(self):
+        kite = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(5, 2), Fraction(1, 1)), (Fraction(3, 1), Fraction(3, 1)),
+                (Fraction(1, 1), Fraction(5, 2))]
+        self.assertTrue(nrconv.is_diagonal_symmetric(kite))
+        self.assertFalse(nrconv.is_diagonal_symmetric(kite[:3]))
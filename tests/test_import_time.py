@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+
+import statistics
+import subprocess
+import sys
+import unittest
+
+# Startup budget for ``import nrconv`` in seconds.  Regressions are measured against it.
+IMPORT_TIME_BUDGET = 0.15
+
+IMPORT_TIME_REPETITIONS = 5
+
+
+def measure_import_time(module: str) -> float:
+    """Measures the cumulative import time of module in a fresh interpreter in seconds."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    for line in reversed(result.stderr.splitlines()):
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+    raise ValueError(f"No import time reported for {module}")
+
+
+def loaded_modules_after_import(module: str) -> set:
+    """Returns the names of all modules loaded by importing module in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-c", f"import sys, {module}; print(' '.join(sys.modules))"],
+                            capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+class TestImportTime(unittest.TestCase):
+    def test_import_time_budget(self):
+        import_time = statistics.median(
+            measure_import_time("nrconv") for _ in range(IMPORT_TIME_REPETITIONS))
+        self.assertLess(import_time, IMPORT_TIME_BUDGET)
+
+    def test_import_does_not_load_sympy(self):
+        self.assertNotIn("sympy", loaded_modules_after_import("nrconv"))
+
+    def test_import_convolution_does_not_load_sympy(self):
+        self.assertNotIn("sympy", loaded_modules_after_import("nrconv.convolution"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+
+import random
+from fractions import Fraction
+
+import unittest
+
+import nrconv
+from nrconv.plan import non_rectangular_convolution
+
+QUADRILATERAL = [(Fraction(1), Fraction(0)), (Fraction(27, 2), Fraction(2)), (Fraction(20), Fraction(21)),
+                 (Fraction(3), Fraction(17, 3))]
+L_SHAPE = [(Fraction(0), Fraction(0)), (Fraction(12), Fraction(0)), (Fraction(12), Fraction(4)),
+           (Fraction(4), Fraction(4)), (Fraction(4), Fraction(15)), (Fraction(0), Fraction(15))]
+
+
+def weighted_convolution(list1, list2, geometry, power1, power2):
+    """Reruns the plain convolution with pre-weighted copies of the lists."""
+    return non_rectangular_convolution([value * x ** power1 for x, value in enumerate(list1)],
+                                       [value * y ** power2 for y, value in enumerate(list2)], geometry)
+
+
+class TestMoments(unittest.TestCase):
+    def test_monomials(self):
+        rng = random.Random(1)
+        list1, list2 = [rng.randint(-9, 9) for _ in range(30)], [rng.randint(-9, 9) for _ in range(25)]
+        for geometry in [QUADRILATERAL, L_SHAPE]:
+            weights = [(0, 0), (1, 0), (0, 1), (2, 0), (1, 1), (3, 2)]
+            convs, conv_min = nrconv.moment_convolutions(list1, list2, geometry, weights)
+            for (power1, power2), conv in zip(weights, convs):
+                self.assertEqual((conv, conv_min), weighted_convolution(list1, list2, geometry, power1, power2))
+
+    def test_polynomials(self):
+        list1, list2 = list(range(1, 21)), [1] * 22
+        weight = {(1, 0): 2, (0, 2): -3, (0, 0): 5}
+        (conv, mass), conv_min = nrconv.moment_convolutions(list1, list2, QUADRILATERAL, [weight, (0, 0)])
+        expected = [0] * len(conv)
+        for monomial, coefficient in weight.items():
+            part, _ = weighted_convolution(list1, list2, QUADRILATERAL, *monomial)
+            expected = [value + coefficient * term for value, term in zip(expected, part)]
+        self.assertEqual(conv, expected)
+        self.assertEqual((mass, conv_min), non_rectangular_convolution(list1, list2, QUADRILATERAL))
+
+    def test_invalid_monomial(self):
+        with self.assertRaises(ValueError):
+            nrconv.moment_convolutions([1], [1], QUADRILATERAL, [(1, -1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
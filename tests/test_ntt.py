@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+
+import unittest
+
+import nrconv
+
+import sympy
+
+
+class TestNumberTheoreticTransform(unittest.TestCase):
+    def test_number_theoretic_transform_matches_sympy(self):
+        values = [3, 1, 4, 1, 5, 9, 2, 6]
+        result = nrconv.number_theoretic_transform(values, 998244353)
+        want = sympy.discrete.transforms.ntt(values, 998244353)
+        self.assertEqual(result, want)
+
+    def test_number_theoretic_transform_padding(self):
+        values = [3, 1, 4, 1, 5]
+        result = nrconv.number_theoretic_transform(values, 998244353)
+        want = sympy.discrete.transforms.ntt(values, 998244353)
+        self.assertEqual(result, want)
+
+    def test_number_theoretic_transform_inverse(self):
+        values = [3, 1, 4, 1, 5, 9, 2, 6]
+        transform = nrconv.number_theoretic_transform(values, 998244353)
+        result = nrconv.number_theoretic_transform(transform, 998244353, inverse=True)
+        self.assertEqual(result, values)
+
+
+class TestConvolutionNTT(unittest.TestCase):
+    def test_convolution_ntt_simple(self):
+        result = nrconv.convolution_ntt([1, 2, 3], [4, 5], 998244353)
+        want = [4, 13, 22, 15]
+        self.assertEqual(result, want)
+
+    def test_convolution_ntt_matches_sympy(self):
+        list1 = [14, 23, 63, 41, 12, 42, 75, 32, 21]
+        list2 = [-4, 2, 7, -5, 1]
+        result = nrconv.convolution_ntt(list1, list2, 998244353)
+        want = sympy.discrete.convolutions.convolution_ntt(list1, list2, 998244353)
+        self.assertEqual(result, want)
+
+    def test_convolution_ntt_empty(self):
+        result = nrconv.convolution_ntt([], [4, 5], 998244353)
+        want = []
+        self.assertEqual(result, want)
+
+
+if __name__ == '__main__':
+    unittest.main()
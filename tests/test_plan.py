@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+from fractions import Fraction
+
+import unittest
+
+import nrconv
+from fixtures import POLYGON_13
+from nrconv.plan import PLAN_FORMAT_VERSION, PLAN_MAGIC, budget_leaves, edge_leaf, split_rectangle_leaf, value_bytes
+
+
+class TestEdgeLeaf(unittest.TestCase):
+    def test_edge_leaf_diagonal(self):
+        leaf = edge_leaf([(Fraction(0, 1), Fraction(0, 1)), (Fraction(7, 1), Fraction(7, 2))], 1)
+        want = nrconv.EdgeLeaf(0, 0, 2, 1, 4, 1)
+        self.assertEqual(leaf, want)
+
+    def test_edge_leaf_reversed(self):
+        leaf = edge_leaf([(Fraction(7, 1), Fraction(0, 1)), (Fraction(0, 1), Fraction(7, 1))], -1)
+        want = nrconv.EdgeLeaf(0, 7, 1, -1, 8, -1)
+        self.assertEqual(leaf, want)
+
+    def test_edge_leaf_vertical_rational(self):
+        leaf = edge_leaf([(Fraction(5, 2), Fraction(0, 1)), (Fraction(5, 2), Fraction(7, 1))], 1)
+        self.assertIsNone(leaf)
+
+    def test_edge_leaf_offset(self):
+        leaf = edge_leaf([(Fraction(1, 1), Fraction(7, 2)), (Fraction(7, 1), Fraction(1, 2))], 1)
+        self.assertEqual(leaf.conv_min, 5)
+        self.assertEqual(leaf.count, 3)
+
+
+class TestCompilePlan(unittest.TestCase):
+    def test_compile_plan_bounds(self):
+        plan = nrconv.compile_plan(POLYGON_13)
+        self.assertEqual((plan.conv_size, plan.conv_min), nrconv.retrieve_convolution_size(POLYGON_13))
+
+    def test_compile_plan_only_leaves(self):
+        plan = nrconv.compile_plan(POLYGON_13)
+        self.assertTrue(plan.leaves)
+        self.assertTrue(all(leaf.kind in ("rectangle", "edge") for leaf in plan.leaves))
+        self.assertEqual(sum(plan.leaf_counts().values()), len(plan.leaves))
+
+    def test_compile_plan_empty_triangle(self):
+        geometry = [(Fraction(39, 10), Fraction(32, 10)),
+                    (Fraction(42, 10), Fraction(28, 10)),
+                    (Fraction(42, 10), Fraction(32, 10))]
+        plan = nrconv.compile_plan(geometry)
+        self.assertEqual(plan.leaves, [])
+
+
+class TestExecutePlan(unittest.TestCase):
+    def test_non_rectangular_convolution_13_edges(self):
+        list1 = [1, 1, 1, 1, 1, 1, 1, 1]
+        list2 = [1, 1, 1, 1, 1, 1, 1, 1]
+        result, _ = nrconv.non_rectangular_convolution(list1, list2, POLYGON_13)
+        want = [0, 0, 1, 4, 5, 4, 5, 5, 5, 4, 5, 4, 1, 0, 0]
+        self.assertEqual(result, want)
+
+    def test_non_rectangular_convolution_matches_recursion(self):
+        list1 = [3, -1, 4, 1, -5, 9, 2, -6]
+        list2 = [2, 7, -1, 8, 2, -8, 1, 8]
+        prime = nrconv.create_ntt_prime(list1, list2)
+        result = nrconv.non_rectangular_convolution(list1, list2, POLYGON_13, prime)
+        want = nrconv.non_rectangular_convolution_convex_polygon(list1, list2, POLYGON_13, prime)
+        self.assertEqual(result, want)
+
+    def test_execute_plan_traced(self):
+        list1 = [1, 1, 1, 1, 1, 1, 1, 1]
+        list2 = [1, 1, 1, 1, 1, 1, 1, 1]
+        plan = nrconv.compile_plan(POLYGON_13)
+        with nrconv.trace() as tracer:
+            nrconv.execute_plan(list1, list2, plan)
+        self.assertEqual(len(tracer.root.children), len(plan.leaves))
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_split_rectangle_leaf_covers_rectangle(self):
+        leaf = nrconv.RectangleLeaf(2, 3, 11, 7, -1)
+        blocks = split_rectangle_leaf(leaf, 7)
+        points = [(x, y) for block in blocks
+                  for x in range(block.x_min, block.x_max + 1) for y in range(block.y_min, block.y_max + 1)]
+        want = [(x, y) for x in range(2, 12) for y in range(3, 8)]
+        self.assertEqual(sorted(points), want)
+        self.assertTrue(all(block.conv_size <= 7 and block.weight == -1 for block in blocks))
+
+    def test_split_rectangle_leaf_thin(self):
+        leaf = nrconv.RectangleLeaf(0, 0, 0, 99, 1)
+        blocks = split_rectangle_leaf(leaf, 32)
+        self.assertEqual(len(blocks), 4)
+
+    def test_budget_leaves_respects_budget(self):
+        list1 = list(range(40))
+        prime = nrconv.create_ntt_prime(list1, list1)
+        geometry = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(39, 1), Fraction(0, 1)), (Fraction(0, 1), Fraction(39, 1))]
+        plan = nrconv.compile_plan(geometry)
+        size = value_bytes(prime)
+        max_memory = plan.conv_size * size + 32 * size
+        leaves = budget_leaves(plan, prime, max_memory)
+        self.assertGreater(len(leaves), len(plan.leaves))
+        self.assertTrue(all(leaf.memory(size) <= 32 * size for leaf in leaves))
+
+    def test_non_rectangular_convolution_max_memory(self):
+        list1 = [3, -1, 4, 1, -5, 9, 2, -6]
+        list2 = [2, 7, -1, 8, 2, -8, 1, 8]
+        prime = nrconv.create_ntt_prime(list1, list2)
+        max_memory = 15 * value_bytes(prime) + 8 * value_bytes(prime)
+        result = nrconv.non_rectangular_convolution(list1, list2, POLYGON_13, prime, max_memory=max_memory)
+        want = nrconv.non_rectangular_convolution(list1, list2, POLYGON_13, prime)
+        self.assertEqual(result, want)
+
+    def test_non_rectangular_convolution_budget_too_small(self):
+        list1 = [1, 1, 1, 1, 1, 1, 1, 1]
+        with self.assertRaises(MemoryError):
+            nrconv.non_rectangular_convolution(list1, list1, POLYGON_13, max_memory=100)
+
+
+class TestSymmetricPlan(unittest.TestCase):
+    def test_symmetric_plan_matches(self):
+        values = [3, -1, 4, 1, -5, 9, 2, -6]
+        polygon_12 = [(Fraction(3, 1), Fraction(0, 1)), (Fraction(4, 1), Fraction(0, 1)), (Fraction(6, 1), Fraction(1, 1)),
+                      (Fraction(7, 1), Fraction(3, 1)), (Fraction(7, 1), Fraction(4, 1)), (Fraction(6, 1), Fraction(6, 1)),
+                      (Fraction(4, 1), Fraction(7, 1)), (Fraction(3, 1), Fraction(7, 1)), (Fraction(1, 1), Fraction(6, 1)),
+                      (Fraction(0, 1), Fraction(4, 1)), (Fraction(0, 1), Fraction(3, 1)), (Fraction(1, 1), Fraction(1, 1))]
+        plan = nrconv.compile_plan(polygon_12)
+        symmetric = nrconv.compile_symmetric_plan(polygon_12)
+        self.assertLess(len(symmetric.leaves), len(plan.leaves))
+        self.assertIn(2, {leaf.weight for leaf in symmetric.leaves})
+        want = nrconv.execute_plan(values, values, plan)
+        self.assertEqual(nrconv.execute_plan(values, values, symmetric), want)
+        self.assertEqual(nrconv.non_rectangular_convolution(values, values, polygon_12, verify=True), want)
+
+    def test_plan_cache_symmetric_non_convex(self):
+        # clip_half_plane only cuts convex polygons in half, so the flag is ignored here
+        values = [3, -1, 4, 1, -5, 9, 2, -6, 5, 3, 7]
+        polygon = [(Fraction(x), Fraction(y)) for x, y in [(0, 0), (10, 0), (10, 2), (6, 2), (6, 4), (7, 7),
+                                                            (4, 6), (2, 6), (2, 10), (0, 10)]]
+        self.assertTrue(nrconv.is_diagonal_symmetric(polygon))
+        want = nrconv.execute_plan(values, values, nrconv.compile_polygon_plan(polygon))
+        self.assertEqual(nrconv.execute_plan(values, values, nrconv.PlanCache().plan(polygon, True)), want)
+        self.assertEqual(nrconv.non_rectangular_convolution(values, values, polygon, verify=True), want)
+
+    def test_symmetric_plan_single_point(self):
+        values = [3, -1, 4]
+        point = [(Fraction(1, 1), Fraction(1, 1))]
+        self.assertEqual(nrconv.non_rectangular_convolution(values, values, point), ([1], 2))
+
+
+def brute_force_region(list1, list2, contains):
+    """Sums list1[x] * list2[y] over all lattice points (x, y) with contains(x, y), returned from index 0."""
+    conv = [0] * (len(list1) + len(list2) - 1)
+    for x, value1 in enumerate(list1):
+        for y, value2 in enumerate(list2):
+            if contains(x, y):
+                conv[x + y] += value1 * value2
+    return conv
+
+
+def inside_polygon(polygon, x, y):
+    """Checks if (x, y) lies in a simple polygon or on its boundary (by the crossing number)."""
+    inside = False
+    for (x_start, y_start), (x_end, y_end) in zip(polygon, polygon[1:] + polygon[:1]):
+        cross = (x_end - x_start) * (y - y_start) - (y_end - y_start) * (x - x_start)
+        if cross == 0 and min(x_start, x_end) <= x <= max(x_start, x_end) \
+                and min(y_start, y_end) <= y <= max(y_start, y_end):
+            return True
+        if (y_start > y) != (y_end > y) and x < x_start + (y - y_start) * (x_end - x_start) / (y_end - y_start):
+            inside = not inside
+    return inside
+
+
+def trimmed(conv, conv_min, size):
+    """Places a convolution slice into a zero list of the given size."""
+    result = [0] * size
+    for index, value in enumerate(conv):
+        result[conv_min + index] += value
+    return result
+
+
+class TestRegionPlan(unittest.TestCase):
+    def setUp(self):
+        self.list1 = [3, -1, 4, 1, -5, 9, 2, -6, 5, 3]
+        self.list2 = [2, 7, -1, 8, 2, -8, 1, 8, -2, 8]
+
+    def test_non_convex_polygon(self):
+        # an L-shape, and a chevron with rational vertices
+        l_shape = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(9, 1), Fraction(0, 1)), (Fraction(9, 1), Fraction(3, 1)),
+                   (Fraction(3, 1), Fraction(3, 1)), (Fraction(3, 1), Fraction(9, 1)), (Fraction(0, 1), Fraction(9, 1))]
+        chevron = [(Fraction(1, 2), Fraction(0, 1)), (Fraction(9, 1), Fraction(1, 3)), (Fraction(8, 1), Fraction(9, 1)),
+                   (Fraction(9, 2), Fraction(5, 2)), (Fraction(1, 1), Fraction(17, 2))]
+        for polygon in (l_shape, chevron):
+            self.assertFalse(nrconv.is_convex(polygon))
+            conv, conv_min = nrconv.non_rectangular_convolution(self.list1, self.list2, polygon, verify=True)
+            want = brute_force_region(self.list1, self.list2, lambda x, y: inside_polygon(polygon, x, y))
+            self.assertEqual(trimmed(conv, conv_min, len(want)), want)
+
+    def test_union_and_difference(self):
+        square = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(6, 1), Fraction(0, 1)), (Fraction(6, 1), Fraction(6, 1)),
+                  (Fraction(0, 1), Fraction(6, 1))]
+        triangle = [(Fraction(4, 1), Fraction(4, 1)), (Fraction(9, 1), Fraction(4, 1)), (Fraction(4, 1), Fraction(9, 1))]
+        hole = [(Fraction(1, 1), Fraction(1, 1)), (Fraction(5, 2), Fraction(1, 1)), (Fraction(1, 1), Fraction(5, 2))]
+
+        def contains(x, y):
+            in_square = x <= 6 and y <= 6
+            in_triangle = x >= 4 and y >= 4 and x + y <= 13
+            in_hole = x >= 1 and y >= 1 and x + y <= Fraction(7, 2)
+            return (in_square or in_triangle) and not in_hole
+
+        conv, conv_min = nrconv.non_rectangular_convolution_region(self.list1, self.list2, [square, triangle], [hole],
+                                                                   verify=True)
+        want = brute_force_region(self.list1, self.list2, contains)
+        self.assertEqual(trimmed(conv, conv_min, len(want)), want)
+
+    def test_merge_leaves(self):
+        leaf = nrconv.RectangleLeaf(0, 0, 2, 2, 1)
+        edge = nrconv.EdgeLeaf(0, 0, 1, 1, 3, -1)
+        merged = nrconv.merge_leaves([leaf, edge, leaf, nrconv.EdgeLeaf(0, 0, 1, 1, 3, 1)])
+        self.assertEqual(merged, [nrconv.RectangleLeaf(0, 0, 2, 2, 2)])
+
+class TestPlanSerialization(unittest.TestCase):
+    def test_round_trip(self):
+        plan = nrconv.compile_plan(POLYGON_13)
+        plan.leaves.append(nrconv.EdgeLeaf(-3, 2 ** 70, 1, -1, 5, -2))
+        data = nrconv.serialize_plan(plan)
+        self.assertTrue(data.startswith(PLAN_MAGIC))
+        self.assertEqual(nrconv.deserialize_plan(data), plan)
+
+    def test_invalid_data(self):
+        data = nrconv.serialize_plan(nrconv.compile_plan(POLYGON_13))
+        for invalid in (b"", b"XXXX" + data[4:], data[:4] + bytes([PLAN_FORMAT_VERSION + 1]) + data[5:],
+                        data[:-1], data + b"\x00"):
+            with self.assertRaises(ValueError):
+                nrconv.deserialize_plan(invalid)
+
+    def test_plan_cache_directory(self):
+        list1 = [3, -1, 4, 1, -5, 9, 2, -6]
+        list2 = [2, 7, -1, 8, 2, -8, 1, 8]
+        want = nrconv.non_rectangular_convolution(list1, list2, POLYGON_13)
+        with tempfile.TemporaryDirectory() as directory:
+            plan = nrconv.PlanCache(directory).plan(POLYGON_13)
+            self.assertTrue(os.path.exists(os.path.join(directory, nrconv.geometry_hash(POLYGON_13) + ".plan")))
+            loaded = nrconv.PlanCache(directory).plan(POLYGON_13[::-1])
+            self.assertEqual(loaded, plan)
+            self.assertEqual(nrconv.execute_plan(list1, list2, loaded), want)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 #!/usr/bin/python3
 
+import os
+import tempfile
 import unittest
 
 import nrconv
@@ -57,6 +59,40 @@ class TestPrimeGeneration(unittest.TestCase):
         remainder = 1
         self.assertEqual(mod, remainder)
 
+    def test_create_mod_prime_small_prime(self):
+        prime = nrconv.create_mod_prime(2, 1)
+        want = 3
+        self.assertEqual(prime, want)
+
+    def test_create_mod_prime_large(self):
+        prime = nrconv.create_mod_prime(2 ** 21, 1, 2 ** 200)
+        self.assertTrue(sympy.ntheory.primetest.isprime(prime))
+        self.assertGreaterEqual(prime, 2 ** 200)
+        self.assertEqual(prime % 2 ** 21, 1)
+
+    def test_create_mod_primes_consecutive(self):
+        primes = nrconv.create_mod_primes(6, 1, 0, 6)
+        want = [7, 13, 19, 31, 37, 43]
+        self.assertEqual(primes, want)
+
+    def test_create_mod_primes_first(self):
+        primes = nrconv.create_mod_primes(256, 1, 3121, 3)
+        self.assertEqual(primes[0], nrconv.create_mod_prime(256, 1, 3121))
+        self.assertTrue(all(sympy.ntheory.primetest.isprime(prime) for prime in primes))
+
+
+class TestMillerRabin(unittest.TestCase):
+    def test_miller_rabin_small_numbers(self):
+        result = [number for number in range(50) if nrconv.miller_rabin(number)]
+        want = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47]
+        self.assertEqual(result, want)
+
+    def test_miller_rabin_strong_pseudoprime(self):
+        self.assertFalse(nrconv.miller_rabin(3215031751))
+
+    def test_miller_rabin_ntt_prime(self):
+        self.assertTrue(nrconv.miller_rabin(4179340454199820289))
+
 
 class TestPrimesForNTT(unittest.TestCase):
     def test_create_ntt_prime_primality1(self):
@@ -92,5 +128,56 @@ class TestPrimesForNTT(unittest.TestCase):
         self.assertEqual(mod, remainder)
 
 
+class TestPrimeCache(unittest.TestCase):
+    def test_prime_cache_table_prime(self):
+        cache = nrconv.PrimeCache()
+        prime = cache.ntt_prime(2 ** 20, 10 ** 8)
+        want = 167772161
+        self.assertEqual(prime, want)
+
+    def test_prime_cache_search_beyond_table(self):
+        cache = nrconv.PrimeCache()
+        prime = cache.ntt_prime(2 ** 60, 2 ** 61)
+        self.assertTrue(sympy.ntheory.primetest.isprime(prime))
+        self.assertEqual(prime % 2 ** 60, 1)
+
+    def test_prime_cache_primitive_root(self):
+        cache = nrconv.PrimeCache()
+        root = cache.primitive_root(998244353)
+        self.assertTrue(sympy.ntheory.residue_ntheory.is_primitive_root(root, 998244353))
+
+    def test_prime_cache_twiddles(self):
+        cache = nrconv.PrimeCache()
+        twiddles = cache.twiddles(998244353, 8)
+        self.assertEqual(len(twiddles), 4)
+        self.assertEqual(pow(twiddles[1], 8, 998244353), 1)
+        self.assertEqual(pow(twiddles[1], 4, 998244353), 998244352)
+
+    def test_prime_cache_twiddles_invalid_length(self):
+        cache = nrconv.PrimeCache()
+        with self.assertRaises(ValueError):
+            cache.twiddles(998244353, 2 ** 24)
+
+    def test_prime_cache_bit_reversal(self):
+        cache = nrconv.PrimeCache()
+        want = [0, 4, 2, 6, 1, 5, 3, 7]
+        self.assertEqual(cache.bit_reversal(8), want)
+
+    def test_prime_cache_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "primes.json")
+            prime = nrconv.PrimeCache(path).ntt_prime(2 ** 60, 2 ** 61)
+            self.assertTrue(os.path.exists(path))
+            reloaded = nrconv.PrimeCache(path)
+            self.assertEqual(reloaded._primes[(2 ** 60, 2 ** 61)], prime)
+
+    def test_create_ntt_prime_uses_cache(self):
+        cache = nrconv.PrimeCache()
+        list1 = [1, 2, 3, 4, 5, 6, 7, 8]
+        list2 = [8, 7, 6, 5, 4, 3, 2, 1]
+        prime = nrconv.create_ntt_prime(list1, list2, cache)
+        self.assertEqual(cache._primes[(16, 64 * 16 + 1)], prime)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+import asyncio
+import os
+import random
+import tempfile
+
+import unittest
+
+from fixtures import SQUARE, TRIANGLE, random_list
+from nrconv.plan import non_rectangular_convolution
+from nrconv.service import (ConvolutionClient, ConvolutionServer, decode_result, encode_result, execute_batch,
+                            format_geometry)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestService(unittest.TestCase):
+    def test_results(self):
+        self.assertEqual(decode_result(*encode_result([1, -2, 3])), [1, -2, 3])
+        self.assertEqual(decode_result(*encode_result([1 << 70, -1])), [1 << 70, -1])
+        rng = random.Random(4)
+        list1, list2 = random_list(rng, 9), random_list(rng, 8)
+        (status, dtype, data, conv_min), = execute_batch(
+            format_geometry(TRIANGLE), [("<i8", numpy.array(list1).tobytes(), numpy.array(list2).tobytes(), "auto")])
+        self.assertEqual((status, decode_result(dtype, data), conv_min),
+                         ("ok", *non_rectangular_convolution(list1, list2, TRIANGLE)))
+
+    def test_coalescing(self):
+        rng = random.Random(5)
+        cases = [(random_list(rng, 9), random_list(rng, 7), geometry) for geometry in [TRIANGLE] * 5 + [SQUARE] * 3]
+
+        async def run():
+            async with ConvolutionServer(workers=0, batch_delay=0.05) as server:
+                with tempfile.TemporaryDirectory() as directory:
+                    await server.start_unix(os.path.join(directory, "nrconv.sock"))
+                    async with await ConvolutionClient.open_unix(os.path.join(directory, "nrconv.sock")) as client:
+                        results = await asyncio.gather(*(client.convolve(list1, list2, geometry)
+                                                         for list1, list2, geometry in cases))
+                        return results, await client.metrics()
+
+        results, metrics = asyncio.run(run())
+        for (list1, list2, geometry), result in zip(cases, results):
+            self.assertEqual(result, non_rectangular_convolution(list1, list2, geometry))
+        self.assertEqual((metrics["requests"], metrics["batches"], metrics["coalesced"]), (8, 2, 8))
+        self.assertEqual((metrics["queue_depth"], metrics["max_queue_depth"]), (0, 8))
+        self.assertEqual(metrics["latency"]["count"], 8)
+
+    def test_invalid_requests(self):
+        rng = random.Random(7)
+        cases = [(random_list(rng, 9), random_list(rng, 7)) for _ in range(3)]
+        vertices = format_geometry(TRIANGLE)
+
+        async def run():
+            async with ConvolutionServer(workers=0, batch_delay=0.05) as server:
+                with tempfile.TemporaryDirectory() as directory:
+                    await server.start_unix(os.path.join(directory, "nrconv.sock"))
+                    async with await ConvolutionClient.open_unix(os.path.join(directory, "nrconv.sock")) as client:
+                        invalid = [
+                            {"dtype": "<f8", "length1": 2, "payload": numpy.array([1.5, 2, 3, 4]).tobytes()},
+                            {"dtype": "<i8", "length1": 3, "payload": numpy.array([1, 2, 3, 4]).tobytes()[:-1]},
+                            {"dtype": "<i8", "length1": 5, "payload": numpy.array([1, 2, 3, 4]).tobytes()},
+                            {"dtype": "not a dtype", "length1": 1, "payload": b""}]
+                        requests = [client.convolve(list1, list2, TRIANGLE) for list1, list2 in cases]
+                        requests[1:1] = [client._request({"op": "convolve", "geometry": vertices, "dtype": item["dtype"],
+                                                          "length1": item["length1"]}, item["payload"])
+                                         for item in invalid]
+                        requests.append(client.convolve([2] * 9, [1] * 7, TRIANGLE, engine="boolean"))
+                        results = await asyncio.gather(*requests, return_exceptions=True)
+                        return results, await client.metrics()
+
+        results, metrics = asyncio.run(run())
+        self.assertEqual([results[0], results[5], results[6]],
+                         [non_rectangular_convolution(list1, list2, TRIANGLE) for list1, list2 in cases])
+        for result in results[1:5] + results[7:]:
+            self.assertIsInstance(result, ValueError)
+        # the malformed requests are rejected before they join the batch, the boolean one fails inside it
+        self.assertEqual((metrics["requests"], metrics["batches"], metrics["coalesced"], metrics["errors"]),
+                         (4, 1, 4, 1))
+
+    def test_close_with_open_connection(self):
+        errors = []
+
+        async def run():
+            asyncio.get_running_loop().set_exception_handler(lambda _, context: errors.append(context))
+            server = ConvolutionServer(workers=0)
+            with tempfile.TemporaryDirectory() as directory:
+                await server.start_unix(os.path.join(directory, "nrconv.sock"))
+                client = await ConvolutionClient.open_unix(os.path.join(directory, "nrconv.sock"))
+                await client.metrics()
+                await server.close()
+                # the server ends the connection, which stops the receiver of the client
+                await asyncio.wait_for(client._receiver, 1)
+                await client.close()
+
+        asyncio.run(run())
+        self.assertEqual(errors, [])
+
+    def test_worker_processes(self):
+        rng = random.Random(6)
+        list1, list2 = numpy.array(random_list(rng, 20), dtype=numpy.int32), random_list(rng, 12)
+
+        async def run(cache_directory):
+            async with ConvolutionServer(workers=2, cache_directory=cache_directory, max_batch=1) as server:
+                tcp = await server.start_tcp()
+                async with await ConvolutionClient.open_tcp(*tcp.sockets[0].getsockname()[:2]) as client:
+                    result = await client.convolve(list1, list2, TRIANGLE, engine="dense")
+                    with self.assertRaises(ValueError):
+                        await client.convolve([2], [3], TRIANGLE, engine="boolean")
+                    return result, await client.metrics()
+
+        with tempfile.TemporaryDirectory() as directory:
+            result, metrics = asyncio.run(run(directory))
+            self.assertTrue(os.listdir(os.path.join(directory, "plans")))
+        self.assertEqual(result, non_rectangular_convolution(list1.tolist(), list2, TRIANGLE))
+        self.assertEqual((metrics["requests"], metrics["errors"], metrics["batches"]), (2, 1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+
+import os
+import random
+import tempfile
+import tracemalloc
+from fractions import Fraction
+
+import unittest
+
+import nrconv
+from fixtures import POLYGON_13
+from nrconv.sparse import count_nonzero, group_columns, index_bytes, is_sparse_sequence, sparse_pairs
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def sparse_list(rng, length, density):
+    return [rng.randint(-9, 9) if rng.random() < density else 0 for _ in range(length)]
+
+
+class TestSparseIndex(unittest.TestCase):
+    def test_sparse_index(self):
+        index = nrconv.SparseIndex([0, 3, 0, 0, -2, 0, 7, 0])
+        self.assertEqual(index.positions, [1, 4, 6])
+        self.assertEqual(index.density, 3 / 8)
+        self.assertEqual(index.count(2, 6), 2)
+        self.assertEqual(index.items(0, 4), ([1, 4], [3, -2]))
+        self.assertEqual((index.value(4), index.value(5)), (-2, 0))
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_sparse_index_numpy(self):
+        index = nrconv.SparseIndex(numpy.array([0, 3, 0, -2], dtype=numpy.int64))
+        self.assertEqual((index.positions, index.values), ([1, 3], [3, -2]))
+        self.assertIs(type(index.values[0]), int)
+
+    def test_sparse_pairs(self):
+        index1, index2 = nrconv.SparseIndex([1, 0, 1]), nrconv.SparseIndex([1, 1, 1])
+        columns = group_columns([(0, 0, 2, 1), (1, 0, 2, 1), (2, 1, 1, 1), (2, 0, 0, -1)])
+        self.assertEqual(sparse_pairs(index1, index2, columns), 5)
+
+
+class TestEngines(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(8)
+        self.list1 = sparse_list(rng, 8, 0.3)
+        self.list2 = sparse_list(rng, 8, 0.3)
+
+    def test_engines_match(self):
+        want = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13, engine="dense")
+        for engine in ("auto", "sparse"):
+            self.assertEqual(nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13, engine=engine), want)
+            self.assertEqual(nrconv.execute_plan(self.list1, self.list2, nrconv.compile_plan(POLYGON_13),
+                                                 engine=engine), want)
+
+    def test_sparse_edge_leaves(self):
+        rng = random.Random(9)
+        list1, list2 = sparse_list(rng, 12, 0.5), sparse_list(rng, 12, 0.5)
+        for leaf in (nrconv.EdgeLeaf(2, 1, 0, 1, 9, 1), nrconv.EdgeLeaf(0, 11, 2, -3, 4, -2),
+                     nrconv.EdgeLeaf(1, 1, 1, 1, 11, 3)):
+            plan = nrconv.Plan([leaf], 23, 0)
+            want = nrconv.execute_plan(list1, list2, plan, engine="dense")
+            self.assertEqual(nrconv.execute_plan(list1, list2, plan, engine="sparse"), want)
+
+    def test_sparse_region(self):
+        square = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(6, 1), Fraction(0, 1)), (Fraction(6, 1), Fraction(6, 1)),
+                  (Fraction(0, 1), Fraction(6, 1))]
+        hole = [(Fraction(1, 1), Fraction(1, 1)), (Fraction(5, 2), Fraction(1, 1)), (Fraction(1, 1), Fraction(5, 2))]
+        want = nrconv.non_rectangular_convolution_region(self.list1, self.list2, [square], [hole], engine="dense")
+        self.assertEqual(nrconv.non_rectangular_convolution_region(self.list1, self.list2, [square], [hole],
+                                                                   engine="sparse"), want)
+
+    def test_sparse_leaves_are_traced(self):
+        plan = nrconv.compile_plan(POLYGON_13)
+        with nrconv.trace() as tracer:
+            nrconv.execute_plan(self.list1, self.list2, plan, engine="sparse")
+        engines = {span.attributes.get("engine") for span in tracer.root.walk() if span is not tracer.root}
+        self.assertEqual(engines, {"sparse"})
+
+    def test_sparse_budget(self):
+        rng = random.Random(9)
+        list1, list2 = sparse_list(rng, 400, 0.1), sparse_list(rng, 400, 0.1)
+        # the indices of both lists take more than the budget, the dense engine does not
+        max_memory = index_bytes(count_nonzero(list1) + count_nonzero(list2)) - 1
+        with self.assertRaises(MemoryError):
+            nrconv.non_rectangular_convolution(list1, list2, POLYGON_13, max_memory=max_memory, engine="sparse")
+        self.assertEqual(nrconv.non_rectangular_convolution(list1, list2, POLYGON_13, max_memory=max_memory),
+                         nrconv.non_rectangular_convolution(list1, list2, POLYGON_13, engine="dense"))
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_dense_memmap_is_not_indexed(self):
+        length = 1 << 20
+        with tempfile.TemporaryDirectory() as directory:
+            values = numpy.memmap(os.path.join(directory, "values"), dtype=numpy.int64, mode="w+", shape=(length,))
+            values[:] = numpy.arange(length) % 7 + 1
+            triangle = [(Fraction(0), Fraction(0)), (Fraction(6), Fraction(0)), (Fraction(0), Fraction(6))]
+            plan = nrconv.compile_plan(triangle)
+            want = nrconv.execute_plan(values, values, plan, engine="dense")
+            tracemalloc.start()
+            try:
+                got = nrconv.execute_plan(values, values, plan, max_memory=10000)
+                self.assertEqual(nrconv.non_rectangular_convolution(values, values, triangle, max_memory=10000), want)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            del values
+        self.assertEqual(got, want)
+        # an index of the whole list would take about 70 bytes per entry
+        self.assertLess(peak, 1 << 20)
+
+    def test_count_nonzero(self):
+        self.assertEqual(count_nonzero([0, 3, 0, -2, 5]), 3)
+        self.assertGreater(count_nonzero([1] * 10, stop=4), 4)
+        self.assertTrue(is_sparse_sequence([0, 0, 0, 4]))
+        self.assertFalse(is_sparse_sequence([0, 0, 3, 4]))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13, engine="fast")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+from fractions import Fraction
+
+import json
+import unittest
+
+import nrconv
+
+
+def convolve_quadrilateral():
+    list1 = [1, 1, 1, 1, 1, 1, 1, 1]
+    list2 = [1, 1, 1, 1, 1, 1, 1, 1]
+    geometry = [(Fraction(0, 1), Fraction(0, 1)),
+                (Fraction(4, 1), Fraction(2, 1)),
+                (Fraction(6, 1), Fraction(4, 1)),
+                (Fraction(2, 1), Fraction(4, 1))]
+    prime = nrconv.create_ntt_prime(list1, list2)
+    return nrconv.convolution.non_rectangular_convolution_convex_polygon(list1, list2, geometry, prime)
+
+
+class TestTracing(unittest.TestCase):
+    def test_trace_disabled_by_default(self):
+        self.assertIsNone(nrconv.active_tracer())
+
+    def test_trace_active_in_context(self):
+        with nrconv.trace() as tracer:
+            self.assertIs(nrconv.active_tracer(), tracer)
+        self.assertIsNone(nrconv.active_tracer())
+
+    def test_trace_does_not_change_result(self):
+        want = convolve_quadrilateral()
+        with nrconv.trace():
+            result = convolve_quadrilateral()
+        self.assertEqual(result, want)
+
+    def test_trace_records_steps(self):
+        with nrconv.trace() as tracer:
+            convolve_quadrilateral()
+        kinds = [span.kind for span in tracer.root.children]
+        want = ["triangle", "triangle", "edge"]
+        self.assertEqual(kinds, want)
+
+    def test_trace_records_signs_and_bounds(self):
+        with nrconv.trace() as tracer:
+            convolve_quadrilateral()
+        edge = tracer.root.children[2]
+        self.assertEqual(edge.sign, -1)
+        self.assertEqual(edge.bounds, ((0, 0), (6, 4)))
+        self.assertEqual(edge.size, 11)
+
+    def test_trace_summary(self):
+        with nrconv.trace() as tracer:
+            convolve_quadrilateral()
+        summary = tracer.summary()
+        self.assertGreater(summary["kinds"]["rectangle"]["count"], 0)
+        self.assertGreater(summary["max_depth"], 1)
+        self.assertTrue(summary["ntt_lengths"])
+
+    def test_trace_json(self):
+        with nrconv.trace() as tracer:
+            convolve_quadrilateral()
+        data = json.loads(tracer.to_json())
+        self.assertEqual(data["kind"], "trace")
+        self.assertEqual(len(data["children"]), 3)
+
+    def test_trace_chrome_trace(self):
+        with nrconv.trace() as tracer:
+            convolve_quadrilateral()
+        events = tracer.to_chrome_trace()["traceEvents"]
+        self.assertEqual(len(events), sum(1 for _ in tracer.root.walk()))
+        self.assertTrue(all(event["ph"] == "X" for event in events))
+
+
+if __name__ == '__main__':
+    unittest.main()
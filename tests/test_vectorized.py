@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+
+import random
+import tempfile
+from collections import Counter
+from fractions import Fraction
+
+import unittest
+
+import nrconv
+from nrconv.plan import PlanCache, compile_polygon_plan
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def random_convex_polygon(rng, size, denominator):
+    """Returns the convex hull of a few random points (possibly a segment or a single point)."""
+    points = sorted({(Fraction(rng.randint(0, size * denominator), denominator),
+                      Fraction(rng.randint(0, size * denominator), denominator))
+                     for _ in range(rng.randint(1, 8))})
+    if len(points) <= 2:
+        return points
+
+    def cross(origin, first, second):
+        return ((first[0] - origin[0]) * (second[1] - origin[1])
+                - (first[1] - origin[1]) * (second[0] - origin[0]))
+
+    lower, upper = [], []
+    for point in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+    for point in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+    hull = lower[:-1] + upper[:-1]
+    return hull if rng.random() < 0.5 else hull[::-1]
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestKernels(unittest.TestCase):
+    def test_rectangle_inscribed(self):
+        geometry = [(Fraction(23, 10), Fraction(9, 10)), (Fraction(70, 10), Fraction(40, 10)),
+                    (Fraction(45, 10), Fraction(69, 10)), (Fraction(11, 10), Fraction(36, 10))]
+        numerators, denominators = nrconv.as_rational_arrays([geometry, geometry[::-1]])
+        self.assertEqual(denominators.tolist(), [10, 10])
+        minima, maxima = nrconv.rectangle_inscribed_arrays(numerators)
+        self.assertEqual((minima.tolist(), maxima.tolist()), ([[11, 9]] * 2, [[70, 69]] * 2))
+        low, high = nrconv.rectangle_inscribed_int_arrays(numerators, denominators)
+        self.assertEqual((low[0].tolist(), high[0].tolist()), ([2, 1], [7, 6]))
+
+    def test_points(self):
+        rng = random.Random(7)
+        triples = [[(Fraction(rng.randint(0, 40), 4), Fraction(rng.randint(0, 40), 4)) for _ in range(3)]
+                   for _ in range(200)]
+        triples = [triple for triple in triples
+                   if triple[1][0] != triple[2][0] and triple[1][1] != triple[2][1]]
+        numerators, denominators = nrconv.as_rational_arrays(triples)
+        closer = nrconv.closer_point_arrays(numerators[:, 0], numerators[:, 1], numerators[:, 2])
+        opposing = nrconv.opposing_rect_vertex_arrays(numerators[:, 0], numerators[:, 1], numerators[:, 2])
+        for triple, denominator, point, corner in zip(triples, denominators.tolist(), closer.tolist(),
+                                                      opposing.tolist()):
+            self.assertEqual(nrconv.closer_point(*triple), tuple(Fraction(value, denominator) for value in point))
+            self.assertEqual(nrconv.opposing_rect_vertex(*triple),
+                             tuple(Fraction(value, denominator) for value in corner))
+
+
+@unittest.skipIf(numpy is None, "requires numpy")
+class TestCompilePlans(unittest.TestCase):
+    def assertSamePlan(self, expected, actual):
+        self.assertEqual((expected.conv_size, expected.conv_min), (actual.conv_size, actual.conv_min))
+        self.assertEqual(Counter(expected.leaves), Counter(actual.leaves))
+
+    def test_matches_compile_polygon_plan(self):
+        rng = random.Random(8)
+        geometries = [random_convex_polygon(rng, rng.choice([1, 3, 20, 80]), rng.choice([1, 2, 3, 7]))
+                      for _ in range(120)]
+        geometries.append([(Fraction(0), Fraction(0)), (Fraction(3), Fraction(0)),
+                           (Fraction(0), Fraction(3)), (Fraction(3), Fraction(3))])
+        for geometry, plan in zip(geometries, nrconv.compile_plans(geometries)):
+            self.assertSamePlan(compile_polygon_plan(geometry), plan)
+
+    def test_large_numerators(self):
+        # numerators grow beyond int64-safe products during the recursion, and from the start
+        geometries = [[(Fraction(0), Fraction(0)), (Fraction(300 * 997 + 1, 997), Fraction(5)),
+                       (Fraction(9), Fraction(200 * 991 + 3, 991))],
+                      [(Fraction(1, 3), Fraction(0)), (Fraction(40 * 10 ** 6 + 1, 10 ** 6), Fraction(2, 3)),
+                       (Fraction(5, 7), Fraction(50 * 999983 + 2, 999983))]]
+        for geometry, plan in zip(geometries, nrconv.compile_plans(geometries)):
+            self.assertSamePlan(compile_polygon_plan(geometry), plan)
+
+    def test_plan_cache(self):
+        rng = random.Random(9)
+        geometries = [random_convex_polygon(rng, 20, 2) for _ in range(10)]
+        with tempfile.TemporaryDirectory() as directory:
+            plans = PlanCache(directory).plans(geometries + geometries[:3])
+            self.assertEqual(len(plans), 13)
+            cache = PlanCache(directory)
+            for geometry, plan in zip(geometries, plans):
+                self.assertSamePlan(cache.plan(geometry), plan)
+                self.assertEqual(nrconv.execute_plan(list(range(50)), list(range(40)), plan, engine="int64"),
+                                 nrconv.non_rectangular_convolution(list(range(50)), list(range(40)), geometry))
+
+
+if __name__ == '__main__':
+    unittest.main()
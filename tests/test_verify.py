@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+import random
+from fractions import Fraction
+
+import unittest
+
+import nrconv
+from fixtures import POLYGON_13
+
+
+class TestColumnIntervals(unittest.TestCase):
+    def test_column_intervals_triangle(self):
+        triangle = [(Fraction(0, 1), Fraction(0, 1)), (Fraction(7, 2), Fraction(0, 1)), (Fraction(0, 1), Fraction(7, 2))]
+        self.assertEqual(nrconv.column_intervals(triangle), {0: (0, 3), 1: (0, 2), 2: (0, 1), 3: (0, 0)})
+
+    def test_column_intervals_without_lattice_points(self):
+        sliver = [(Fraction(1, 3), Fraction(1, 3)), (Fraction(2, 3), Fraction(1, 3)), (Fraction(1, 2), Fraction(2, 3))]
+        self.assertEqual(nrconv.column_intervals(sliver), {})
+
+
+class TestVerifyConvolution(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        self.list1 = [rng.randint(-50, 50) for _ in range(8)]
+        self.list2 = [rng.randint(-50, 50) for _ in range(8)]
+
+    def test_correct_convolution(self):
+        conv, conv_min = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13, verify=3)
+        nrconv.verify_convolution(self.list1, self.list2, POLYGON_13, conv, conv_min, rng=random.Random(1))
+
+    def test_mismatch_range(self):
+        conv, conv_min = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13)
+        conv[3] += 1
+        conv[6] -= 2
+        with self.assertRaises(nrconv.VerificationError) as context:
+            nrconv.verify_convolution(self.list1, self.list2, POLYGON_13, conv, conv_min, rng=random.Random(2))
+        self.assertEqual(context.exception.index_range, (conv_min + 3, conv_min + 6))
+
+    def test_missing_entry(self):
+        conv, conv_min = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13)
+        with self.assertRaises(nrconv.VerificationError) as context:
+            nrconv.verify_convolution(self.list1, self.list2, POLYGON_13, conv[:-3], conv_min, rng=random.Random(3))
+        self.assertEqual(context.exception.index_range, (conv_min + len(conv) - 3, conv_min + len(conv) - 3))
+
+    def test_wrong_geometry(self):
+        conv, conv_min = nrconv.non_rectangular_convolution(self.list1, self.list2, POLYGON_13)
+        smaller = POLYGON_13[:-1]
+        with self.assertRaises(ValueError):
+            nrconv.verify_convolution(self.list1, self.list2, smaller, conv, conv_min, rng=random.Random(4))
+
+
+if __name__ == '__main__':
+    unittest.main()